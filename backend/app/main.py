@@ -1,8 +1,8 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import JSONResponse
 from app.core.config import settings
+from app.services.static_files import StaticBundle
 import os
 
 # Import des routers
@@ -44,42 +44,29 @@ static_path = os.path.join(os.path.dirname(__file__), "..", "..", "frontend")
 # Vérifier si le dossier frontend existe
 if os.path.exists(static_path):
     print(f"✅ Serving Flutter app from: {static_path}")
-    
-    # Monter les dossiers statiques
-    assets_path = os.path.join(static_path, "assets")
-    if os.path.exists(assets_path):
-        app.mount("/assets", StaticFiles(directory=assets_path), name="assets")
-    
-    # Monter canvaskit si existe
-    canvaskit_path = os.path.join(static_path, "canvaskit")
-    if os.path.exists(canvaskit_path):
-        app.mount("/canvaskit", StaticFiles(directory=canvaskit_path), name="canvaskit")
-    
+
+    # Manifeste construit une fois au démarrage (ETag, variantes .br/.gz)
+    frontend = StaticBundle(static_path)
+
     # Route principale pour servir l'app Flutter
-    @app.get("/")
-    async def serve_app():
-        index_path = os.path.join(static_path, "index.html")
-        if os.path.exists(index_path):
-            return FileResponse(index_path)
-        return {"error": "index.html not found"}
-    
+    @app.api_route("/", methods=["GET", "HEAD"])
+    async def serve_app(request: Request):
+        if frontend.index is None:
+            return {"error": "index.html not found"}
+        return frontend.response(frontend.index, request)
+
     # Catch-all pour le routing Flutter (SPA) - DOIT ÊTRE EN DERNIER
-    @app.get("/{full_path:path}")
-    async def catch_all(full_path: str):
+    @app.api_route("/{full_path:path}", methods=["GET", "HEAD"])
+    async def catch_all(full_path: str, request: Request):
         # NE PAS intercepter les routes API - CORRECTION ICI
         if full_path.startswith("api/") or full_path.startswith("auth/"):
             return {"error": "API route not found"}
-        
-        # Si c'est un fichier qui existe, le servir
-        file_path = os.path.join(static_path, full_path)
-        if os.path.exists(file_path) and os.path.isfile(file_path):
-            return FileResponse(file_path)
-        
-        # Sinon, servir index.html pour le routing côté client
-        index_path = os.path.join(static_path, "index.html")
-        if os.path.exists(index_path):
-            return FileResponse(index_path)
-        return {"error": "Not found"}
+
+        # Fichier du build, sinon index.html pour le routing côté client
+        entry = frontend.resolve(full_path)
+        if entry is None:
+            return JSONResponse({"error": "Not found"}, status_code=404)
+        return frontend.response(entry, request)
 else:
     print(f"⚠️ Flutter build not found at: {static_path}")
     print("Build Flutter locally and copy to frontend/ folder")
@@ -0,0 +1,197 @@
+# app/services/static_files.py
+"""
+Service des fichiers du build Flutter (dossier frontend/).
+
+Au démarrage, on parcourt frontend/ une fois et on garde en mémoire un
+manifeste : chemin -> type MIME, ETag fort (hash du contenu), variantes
+précompressées (.br / .gz, voir scripts/precompress.py) et politique de cache.
+Une requête ne touche plus le disque que pour lire le fichier à envoyer :
+pas de os.path.exists / isfile, et le repli SPA vers index.html se résout dans
+le manifeste.
+
+- la variante envoyée est négociée avec Accept-Encoding (br, puis gzip) ;
+- If-None-Match -> 304 sans corps ;
+- fichiers dont le nom contient un hash de contenu (main.3f2a9c1b.js) : cache
+  d'un an, `immutable` ;
+- les autres (index.html, main.dart.js, canvaskit...) : `no-cache`, le
+  navigateur revalide avec l'ETag et reçoit un 304 tant que le build n'a pas
+  changé. Flutter ne hashe pas ses noms de fichiers par défaut, c'est donc le
+  cas de la plupart des fichiers du build.
+"""
+import hashlib
+import mimetypes
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Optional
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+
+# Types absents de certaines tables mimetypes (images Docker minimales)
+mimetypes.add_type("application/wasm", ".wasm")
+mimetypes.add_type("application/javascript", ".js")
+mimetypes.add_type("application/javascript", ".mjs")
+mimetypes.add_type("application/manifest+json", ".webmanifest")
+mimetypes.add_type("font/otf", ".otf")
+mimetypes.add_type("font/ttf", ".ttf")
+
+# Extension du fichier précompressé -> valeur de Content-Encoding, par préférence
+ENCODINGS = ((".br", "br"), (".gz", "gzip"))
+
+# Nom contenant un hash de contenu : main.3f2a9c1b.js, chunk-5d41402abc4b2a76.js
+HASHED_NAME = re.compile(r"[.-][0-9a-f]{8,}\.[A-Za-z0-9]+$")
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+# Fichiers gardés en mémoire plutôt que relus sur le disque (index.html...)
+MEMORY_MAX_BYTES = 64 * 1024
+
+# Dossiers où un fichier absent est une vraie 404 (pas de repli SPA)
+NO_FALLBACK_PREFIXES = ("assets/", "canvaskit/", "icons/")
+
+
+@dataclass
+class Variant:
+    path: str
+    size: int
+    etag: str
+    encoding: Optional[str] = None
+    body: Optional[bytes] = None
+
+
+@dataclass
+class StaticEntry:
+    media_type: str
+    cache_control: str
+    # encodage (None = identité) -> variante
+    variants: dict = field(default_factory=dict)
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.md5(usedforsecurity=False)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _variant(path: str, etag: str, encoding: Optional[str]) -> Variant:
+    size = os.path.getsize(path)
+    body = None
+    if size <= MEMORY_MAX_BYTES:
+        with open(path, "rb") as f:
+            body = f.read()
+    return Variant(path=path, size=size, etag=etag, encoding=encoding, body=body)
+
+
+def _accepted_encodings(header: str) -> dict:
+    """
+    Accept-Encoding -> {encodage: q}. "gzip;q=0" exclut gzip.
+    """
+    accepted = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[name] = q
+    return accepted
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # Comparaison faible (RFC 9110) : le préfixe W/ est ignoré
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    return etag in candidates
+
+
+class StaticBundle:
+    def __init__(self, root: str) -> None:
+        self.root = os.path.realpath(root)
+        self.files: dict[str, StaticEntry] = {}
+        self._scan()
+        self.index = self.files.get("index.html")
+
+    def _scan(self) -> None:
+        """
+        Construit le manifeste. Une variante .br / .gz plus ancienne que le
+        fichier d'origine (build refait sans relancer la précompression) est
+        ignorée.
+        """
+        suffixes = tuple(ext for ext, _ in ENCODINGS)
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                if name.endswith(suffixes):
+                    continue
+                path = os.path.join(directory, name)
+                relative = os.path.relpath(path, self.root).replace(os.sep, "/")
+                digest = _hash_file(path)
+                mtime = os.path.getmtime(path)
+
+                media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+                entry = StaticEntry(
+                    media_type=media_type,
+                    cache_control=IMMUTABLE if HASHED_NAME.search(name) else REVALIDATE,
+                )
+                entry.variants[None] = _variant(path, f'"{digest}"', None)
+                for ext, encoding in ENCODINGS:
+                    compressed = path + ext
+                    if os.path.isfile(compressed) and os.path.getmtime(compressed) >= mtime:
+                        # ETag forts distincts : chaque encodage est une représentation
+                        entry.variants[encoding] = _variant(compressed, f'"{digest}-{encoding}"', encoding)
+                self.files[relative] = entry
+
+        compressed = sum(1 for entry in self.files.values() if len(entry.variants) > 1)
+        print(f"📦 Frontend : {len(self.files)} fichiers, {compressed} précompressés")
+
+    def resolve(self, path: str) -> Optional[StaticEntry]:
+        """
+        Fichier demandé, ou index.html pour une route côté client (SPA).
+        """
+        path = path.lstrip("/")
+        entry = self.files.get(path)
+        if entry is not None:
+            return entry
+        if path.startswith(NO_FALLBACK_PREFIXES):
+            return None
+        return self.index
+
+    def _negotiate(self, entry: StaticEntry, request: Request) -> Variant:
+        if len(entry.variants) > 1:
+            accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+            for _, encoding in ENCODINGS:
+                if encoding in entry.variants and accepted.get(encoding, accepted.get("*", 0)) > 0:
+                    return entry.variants[encoding]
+        return entry.variants[None]
+
+    def response(self, entry: StaticEntry, request: Request) -> Response:
+        variant = self._negotiate(entry, request)
+        headers = {
+            "ETag": variant.etag,
+            "Cache-Control": entry.cache_control,
+        }
+        if len(entry.variants) > 1:
+            headers["Vary"] = "Accept-Encoding"
+        if variant.encoding:
+            headers["Content-Encoding"] = variant.encoding
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and _etag_matches(if_none_match, variant.etag):
+            return Response(status_code=304, headers=headers)
+
+        if variant.body is not None:
+            body = b"" if request.method == "HEAD" else variant.body
+            headers["Content-Length"] = str(variant.size)
+            return Response(content=body, media_type=entry.media_type, headers=headers)
+        return FileResponse(variant.path, media_type=entry.media_type, headers=headers)
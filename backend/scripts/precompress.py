@@ -0,0 +1,66 @@
+"""
+Précompresse le build Flutter : écrit fichier.gz (et fichier.br si le paquet
+brotli est installé) à côté de chaque fichier compressible de frontend/.
+Le serveur (app/services/static_files.py) les envoie selon Accept-Encoding.
+
+    python scripts/precompress.py ../frontend
+
+À relancer après chaque `flutter build web` : une variante plus ancienne que
+son fichier d'origine est ignorée par le serveur.
+"""
+import gzip
+import os
+import sys
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Déjà compressés : rien à gagner
+SKIP_EXTENSIONS = {".br", ".gz", ".png", ".jpg", ".jpeg", ".gif", ".webp", ".woff", ".woff2", ".zip"}
+
+MIN_SIZE = 1024
+
+# Une variante qui ne gagne pas au moins 10 % n'est pas écrite
+MAX_RATIO = 0.9
+
+
+def _write_if_smaller(path: str, data: bytes, original_size: int) -> bool:
+    if len(data) > original_size * MAX_RATIO:
+        if os.path.exists(path):
+            os.remove(path)
+        return False
+    with open(path, "wb") as f:
+        f.write(data)
+    return True
+
+
+def precompress(root: str) -> None:
+    total = gzipped = brotlied = 0
+    for directory, _, names in os.walk(root):
+        for name in names:
+            if os.path.splitext(name)[1].lower() in SKIP_EXTENSIONS:
+                continue
+            path = os.path.join(directory, name)
+            size = os.path.getsize(path)
+            if size < MIN_SIZE:
+                continue
+
+            with open(path, "rb") as f:
+                data = f.read()
+            total += size
+
+            # mtime fixé à 0 : même entrée, même .gz (builds reproductibles)
+            if _write_if_smaller(path + ".gz", gzip.compress(data, compresslevel=9, mtime=0), size):
+                gzipped += os.path.getsize(path + ".gz")
+            if brotli is not None and _write_if_smaller(path + ".br", brotli.compress(data, quality=11), size):
+                brotlied += os.path.getsize(path + ".br")
+
+    print(f"📦 {total / 1e6:.1f} Mo compressibles -> gzip {gzipped / 1e6:.1f} Mo", end="")
+    print(f", brotli {brotlied / 1e6:.1f} Mo" if brotli is not None else " (brotli absent : pip install brotli)")
+
+
+if __name__ == "__main__":
+    default_root = os.path.join(os.path.dirname(__file__), "..", "..", "frontend")
+    precompress(sys.argv[1] if len(sys.argv) > 1 else default_root)
@@ -0,0 +1,70 @@
+# tests/conftest.py
+"""
+Tests du service des fichiers du build Flutter, sur un faux build écrit dans
+un dossier temporaire.
+
+Lancement (depuis backend/) :
+    python -m pytest -q
+"""
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND))
+sys.path.insert(0, str(BACKEND / "scripts"))
+
+from fastapi import FastAPI, Request  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+# Assez gros pour être précompressé et relu sur le disque (> MEMORY_MAX_BYTES)
+MAIN_JS = b"console.log('flutter');\n" * 4000
+INDEX_HTML = b"<!DOCTYPE html><html><body><script src='main.dart.js'></script></body></html>\n" * 20
+
+
+def write_file(root: Path, relative: str, content: bytes, mtime: float | None = None) -> Path:
+    path = root / relative
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return path
+
+
+@pytest.fixture
+def build_dir(tmp_path) -> Path:
+    """
+    Faux `flutter build web` : index.html, main.dart.js, un fichier hashé,
+    un asset et un module wasm.
+    """
+    root = tmp_path / "frontend"
+    write_file(root, "index.html", INDEX_HTML)
+    write_file(root, "main.dart.js", MAIN_JS)
+    write_file(root, "chunk.3f2a9c1b7d.js", b"export const x = 1;\n")
+    write_file(root, "assets/logo.png", b"\x89PNG fake")
+    write_file(root, "canvaskit/canvaskit.wasm", b"\x00asm fake")
+    return root
+
+
+def make_client(root: Path) -> TestClient:
+    """
+    Mêmes routes que app/main.py, autour d'un StaticBundle sur `root`.
+    """
+    from app.services.static_files import StaticBundle
+
+    frontend = StaticBundle(str(root))
+    app = FastAPI()
+
+    @app.api_route("/{full_path:path}", methods=["GET", "HEAD"])
+    async def catch_all(full_path: str, request: Request):
+        entry = frontend.resolve(full_path)
+        if entry is None:
+            return JSONResponse({"error": "Not found"}, status_code=404)
+        return frontend.response(entry, request)
+
+    client = TestClient(app)
+    client.bundle = frontend
+    return client
@@ -0,0 +1,170 @@
+# tests/test_static_files.py
+import gzip
+import os
+
+from conftest import INDEX_HTML, MAIN_JS, make_client, write_file
+
+
+def _precompress(root) -> None:
+    from precompress import precompress
+
+    precompress(str(root))
+
+
+# --- manifeste ---
+
+def test_manifest_cache_policy_and_types(build_dir):
+    from app.services.static_files import IMMUTABLE, REVALIDATE, StaticBundle
+
+    bundle = StaticBundle(str(build_dir))
+
+    assert set(bundle.files) == {
+        "index.html", "main.dart.js", "chunk.3f2a9c1b7d.js", "assets/logo.png", "canvaskit/canvaskit.wasm",
+    }
+    # Seuls les noms hashés sont immuables ; Flutter ne hashe pas les siens
+    assert bundle.files["chunk.3f2a9c1b7d.js"].cache_control == IMMUTABLE
+    assert bundle.files["main.dart.js"].cache_control == REVALIDATE
+    assert bundle.files["index.html"].cache_control == REVALIDATE
+    assert bundle.files["canvaskit/canvaskit.wasm"].media_type == "application/wasm"
+    assert bundle.files["main.dart.js"].media_type == "application/javascript"
+
+
+def test_precompressed_variants_are_listed_but_not_served_as_files(build_dir):
+    from app.services.static_files import StaticBundle
+
+    _precompress(build_dir)
+    bundle = StaticBundle(str(build_dir))
+
+    assert "main.dart.js.gz" not in bundle.files
+    assert set(bundle.files["main.dart.js"].variants) == {None, "gzip"}
+    # Trop petit pour valoir une variante
+    assert set(bundle.files["chunk.3f2a9c1b7d.js"].variants) == {None}
+
+
+def test_stale_variant_is_ignored(build_dir):
+    from app.services.static_files import StaticBundle
+
+    original = build_dir / "main.dart.js"
+    write_file(build_dir, "main.dart.js.gz", gzip.compress(b"ancien build"), mtime=original.stat().st_mtime - 60)
+
+    bundle = StaticBundle(str(build_dir))
+    assert set(bundle.files["main.dart.js"].variants) == {None}
+
+
+# --- Accept-Encoding ---
+
+def test_gzip_is_negotiated(build_dir):
+    _precompress(build_dir)
+    client = make_client(build_dir)
+
+    response = client.get("/main.dart.js", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    # Décompressé par le client : c'est bien le fichier d'origine
+    assert response.content == MAIN_JS
+
+    plain = client.get("/main.dart.js", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.content == MAIN_JS
+    assert plain.headers["vary"] == "Accept-Encoding"
+
+
+def test_brotli_is_preferred_and_q0_excludes(build_dir):
+    _precompress(build_dir)
+    # Variante .br factice : le serveur l'envoie telle quelle
+    write_file(build_dir, "main.dart.js.br", b"fake brotli payload")
+    client = make_client(build_dir)
+
+    response = client.get("/main.dart.js", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "br"
+    assert response.headers["content-length"] == str(len(b"fake brotli payload"))
+
+    response = client.get("/main.dart.js", headers={"Accept-Encoding": "br;q=0, gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+
+    response = client.get("/main.dart.js", headers={"Accept-Encoding": "br;q=0, gzip;q=0"})
+    assert "content-encoding" not in response.headers
+
+    response = client.get("/main.dart.js", headers={"Accept-Encoding": "*"})
+    assert response.headers["content-encoding"] == "br"
+
+
+# --- ETag / 304 ---
+
+def test_etag_revalidation(build_dir):
+    _precompress(build_dir)
+    client = make_client(build_dir)
+
+    first = client.get("/main.dart.js", headers={"Accept-Encoding": "identity"})
+    etag = first.headers["etag"]
+
+    response = client.get("/main.dart.js", headers={"Accept-Encoding": "identity", "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert response.headers["cache-control"] == "no-cache"
+
+    # Comparaison faible : W/ est ignoré
+    weak = client.get("/main.dart.js", headers={"Accept-Encoding": "identity", "If-None-Match": f"W/{etag}"})
+    assert weak.status_code == 304
+
+    # Chaque encodage a son propre ETag : pas de 304 croisé
+    gzipped = client.get("/main.dart.js", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert gzipped.status_code == 200
+    assert gzipped.headers["etag"] != etag
+
+    other = client.get("/main.dart.js", headers={"Accept-Encoding": "identity", "If-None-Match": '"autre"'})
+    assert other.status_code == 200
+
+
+def test_etag_follows_content(build_dir):
+    before = make_client(build_dir).get("/index.html").headers["etag"]
+    write_file(build_dir, "index.html", INDEX_HTML + b"<!-- nouveau build -->")
+    after = make_client(build_dir).get("/index.html").headers["etag"]
+
+    assert before != after
+
+
+# --- routage ---
+
+def test_spa_fallback_and_real_404s(build_dir):
+    client = make_client(build_dir)
+
+    room = client.get("/room/ABC123")
+    assert room.status_code == 200
+    assert room.content == INDEX_HTML
+    assert room.headers["content-type"].startswith("text/html")
+
+    assert client.get("/assets/missing.png").status_code == 404
+    assert client.get("/canvaskit/missing.wasm").status_code == 404
+    assert client.get("/assets/logo.png").content == b"\x89PNG fake"
+
+
+def test_head_has_headers_but_no_body(build_dir):
+    client = make_client(build_dir)
+
+    response = client.head("/index.html")
+    assert response.status_code == 200
+    assert response.content == b""
+    assert response.headers["content-length"] == str(len(INDEX_HTML))
+
+
+# --- scripts/precompress.py ---
+
+def test_precompress_writes_only_useful_variants(build_dir):
+    write_file(build_dir, "random.bin", os.urandom(4096))
+    # Reste d'un build précédent : supprimé s'il ne gagne plus rien
+    write_file(build_dir, "random.bin.gz", b"ancien")
+
+    _precompress(build_dir)
+
+    assert gzip.decompress((build_dir / "main.dart.js.gz").read_bytes()) == MAIN_JS
+    assert not (build_dir / "chunk.3f2a9c1b7d.js.gz").exists()  # trop petit
+    assert not (build_dir / "assets/logo.png.gz").exists()  # déjà compressé
+    assert not (build_dir / "random.bin.gz").exists()  # incompressible
+
+    # Même entrée, même sortie (mtime gzip fixé)
+    first = (build_dir / "main.dart.js.gz").read_bytes()
+    _precompress(build_dir)
+    assert (build_dir / "main.dart.js.gz").read_bytes() == first
@@ -0,0 +1,12 @@
+# app/api/responses.py
+"""
+Classe de réponse JSON par défaut de l'API : orjson s'il est installé
+(sérialisation en C, dates et UUID natifs), sinon le json de la stdlib.
+"""
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as DefaultJSONResponse
+except ImportError:  # paquet orjson absent : json de la stdlib
+    DefaultJSONResponse = JSONResponse
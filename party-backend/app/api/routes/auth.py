@@ -1,15 +1,21 @@
-from fastapi import APIRouter, Request, Depends
+from fastapi import APIRouter, BackgroundTasks, Request, Depends
 from fastapi.responses import RedirectResponse
-import requests
 import urllib.parse
 import json
+from typing import Union
 
 from app.core.config import settings
+from app.services.spotify_gateway import spotify_gateway
 from app.services.spotify import get_current_user
+from app.services.catalog import schedule_catalog_sync
+from app.services.room_cache import room_cache
+from app.services.tokens import token_expires_at
 from app.db.session import get_session
 from app.models.user import SpotifyUser
+from app.schemas import AuthErrorResponse, ErrorResponse, UserResponse
 
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 router = APIRouter(
     prefix="/auth",
@@ -17,8 +23,8 @@ router = APIRouter(
 )
 
 
-@router.get("/login")
-def login():
+@router.get("/login", response_class=RedirectResponse)
+async def login():
     client_id = settings.SPOTIFY_CLIENT_ID
     redirect_uri = settings.SPOTIFY_REDIRECT_URI
 
@@ -43,10 +49,17 @@ def login():
     return RedirectResponse(auth_url)
 
 
-@router.get("/callback")
-def callback(
+# Succès : redirection vers le frontend ; sinon une erreur JSON
+@router.get(
+    "/callback",
+    response_model=AuthErrorResponse,
+    response_model_exclude_none=True,
+    responses={307: {"description": "Redirection vers le frontend avec le profil"}},
+)
+async def callback(
     request: Request,
-    session: Session = Depends(get_session),
+    background_tasks: BackgroundTasks,
+    session: AsyncSession = Depends(get_session),
 ):
     code = request.query_params.get("code")
     if not code:
@@ -62,7 +75,7 @@ def callback(
         "client_secret": settings.SPOTIFY_CLIENT_SECRET,
     }
 
-    response = requests.post(token_url, data=data)
+    response = await spotify_gateway.post(token_url, data=data)
     tokens = response.json()
 
     print("🎧 TOKENS SPOTIFY :", tokens)
@@ -75,7 +88,7 @@ def callback(
         }
 
     # Profil Spotify
-    user_profile = get_current_user(access_token)
+    user_profile = await get_current_user(access_token)
     print("👤 PROFIL SPOTIFY :", user_profile)
 
     spotify_id = user_profile.get("id")
@@ -84,7 +97,7 @@ def callback(
 
     # Chercher si l'utilisateur existe déjà
     statement = select(SpotifyUser).where(SpotifyUser.spotify_id == spotify_id)
-    existing_user = session.exec(statement).first()
+    existing_user = (await session.exec(statement)).first()
 
     if existing_user:
         # Mise à jour
@@ -95,6 +108,7 @@ def callback(
         existing_user.token_type = tokens.get("token_type")
         existing_user.scope = tokens.get("scope")
         existing_user.expires_in = tokens.get("expires_in")
+        existing_user.expires_at = token_expires_at(tokens.get("expires_in"))
         user = existing_user
     else:
         # Création
@@ -107,11 +121,18 @@ def callback(
             token_type=tokens.get("token_type"),
             scope=tokens.get("scope"),
             expires_in=tokens.get("expires_in"),
+            expires_at=token_expires_at(tokens.get("expires_in")),
         )
         session.add(user)
 
-    session.commit()
-    session.refresh(user)
+    await session.commit()
+    await session.refresh(user)
+
+    # Nouveau token : les rooms dont il est l'hôte doivent le relire
+    room_cache.invalidate_user(user.id)
+
+    # Le catalogue est prêt avant même que l'utilisateur rejoigne une room
+    schedule_catalog_sync(background_tasks, user.id)
 
     # Rediriger vers le frontend avec les infos user
     user_data = {
@@ -129,16 +150,16 @@ def callback(
     return RedirectResponse(url=frontend_url)
 
 
-@router.get("/me")
-def get_me(
+@router.get("/me", response_model=Union[UserResponse, ErrorResponse])
+async def get_me(
     spotify_id: str,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
 ):
     """
     Récupère les infos d'un utilisateur par son spotify_id
     """
     statement = select(SpotifyUser).where(SpotifyUser.spotify_id == spotify_id)
-    user = session.exec(statement).first()
+    user = (await session.exec(statement)).first()
     
     if not user:
         return {"error": "User not found"}
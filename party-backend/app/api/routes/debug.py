@@ -0,0 +1,110 @@
+# app/api/routes/debug.py
+import json
+import secrets
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import Response
+
+from app.core.config import settings
+from app.services import tracing
+from app.services.playback import queue_stats
+from app.services.spotify_gateway import spotify_gateway
+from app.services.sweeper import last_sweep
+
+
+def require_debug_token(authorization: Optional[str] = Header(None)) -> None:
+    """
+    Ces endpoints exposent l'état interne (traces avec requêtes SQL, files de
+    lecture...) : réservés à qui connaît DEBUG_TOKEN.
+    """
+    scheme, _, token = (authorization or "").partition(" ")
+    if (
+        not settings.DEBUG_TOKEN
+        or scheme.lower() != "bearer"
+        or not secrets.compare_digest(token.encode(), settings.DEBUG_TOKEN.encode())
+    ):
+        raise HTTPException(status_code=403, detail="Jeton de debug invalide")
+
+
+router = APIRouter(
+    prefix="/debug",
+    tags=["debug"],
+    dependencies=[Depends(require_debug_token)],
+)
+
+
+@router.get("/spotify")
+async def spotify_gateway_stats():
+    """
+    État de la passerelle Spotify : file d'attente, 429 reçus, retries,
+    disjoncteur et réponses servies depuis le cache.
+    """
+    return spotify_gateway.stats()
+
+
+@router.get("/playback")
+async def playback_queue_stats():
+    """
+    Files de commandes de lecture : appareils actifs, commandes en attente
+    et commandes remplacées avant envoi.
+    """
+    return queue_stats()
+
+
+@router.get("/sweeper")
+async def room_sweeper_report():
+    """
+    Bilan du dernier nettoyage des rooms inactives.
+    """
+    return last_sweep
+
+
+@router.get("/traces")
+async def list_traces(
+    route: Optional[str] = Query(None, description="Gabarit de route, ex : /rooms/{code}/state"),
+    n_plus_one: bool = Query(False, description="Seulement les requêtes signalées N+1"),
+    min_duration_ms: float = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+):
+    """
+    Dernières traces conservées (les plus récentes d'abord), sans leurs spans.
+    """
+    traces = []
+    for trace in tracing.recent_traces():
+        if route and trace.route != route:
+            continue
+        if n_plus_one and not trace.n_plus_one():
+            continue
+        if (trace.response_ms or trace.duration_ms) < min_duration_ms:
+            continue
+        traces.append(trace.summary())
+        if len(traces) >= limit:
+            break
+    return {"traces": traces}
+
+
+@router.get("/traces/export")
+async def export_traces():
+    """
+    Toutes les traces de l'anneau, spans compris, en fichier JSON.
+    """
+    body = json.dumps([trace.to_dict() for trace in tracing.recent_traces()], default=str)
+    filename = f"traces-{datetime.utcnow():%Y%m%d-%H%M%S}.json"
+    return Response(
+        body,
+        media_type="application/json",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/traces/{trace_id}")
+async def get_trace(trace_id: str):
+    """
+    Une trace complète avec son arbre de spans.
+    """
+    trace = tracing.find_trace(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace introuvable (non échantillonnée ou sortie de l'anneau)")
+    return trace.to_dict()
@@ -0,0 +1,34 @@
+# app/api/routes/metrics.py
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from sqlmodel import select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.db.session import get_session
+from app.models.room import Room
+from app.models.room_participant import RoomParticipant
+from app.services import metrics
+
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def prometheus_metrics(session: AsyncSession = Depends(get_session)):
+    """
+    Métriques au format texte Prometheus.
+    Les jauges métier sont relues en base à chaque scrape (deux COUNT indexés).
+    """
+    metrics.active_rooms.set((await session.exec(
+        select(func.count(Room.id)).where(Room.is_active == True)
+    )).one())
+    metrics.participants.set((await session.exec(
+        select(func.count(RoomParticipant.id))
+        .join(Room, Room.id == RoomParticipant.room_id)
+        .where(Room.is_active == True)
+    )).one())
+
+    return PlainTextResponse(
+        metrics.registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -1,19 +1,63 @@
 # app/api/routes/rooms.py
+import asyncio
 import random
 import string
-from typing import List
-
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlmodel import Session, select, func, delete
+from datetime import datetime
+from typing import List, Optional, Union
+
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy import and_, or_, update
+from sqlmodel import select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.db.session import get_session
+from app.api.responses import DefaultJSONResponse
+from app.db.session import async_session, get_session
 from app.models.room import Room
 from app.models.user import SpotifyUser
 from app.models.room_participant import RoomParticipant
 from app.models.vote import Vote
-from app.services.spotify import pick_random_track_from_user
-from app.services.playback import play_track_on_device, pause_playback, resume_playback
-from app.schemas import CreateRoomRequest, JoinRoomRequest
+from app.models.room_round import RoomRound
+from app.services.catalog import pick_track_for_user, schedule_catalog_sync
+from app.services.events import format_sse, room_events
+from app.services.metrics import record_vote
+from app.services.playback import enqueue_playback, playback_state
+from app.services.played_tracks import mark_played, played_tracks_for
+from app.services.prefetch import schedule_prefetch, take_candidate
+from app.services.rounds import close_round
+from app.services.room_cache import find_participant, get_room_context, room_cache
+from app.services.shared_state import shared_state
+from app.services.tokens import get_valid_host_token
+from app.services import vote_writer
+from app.schemas import (
+    CreateRoomRequest,
+    JoinRoomRequest,
+    JoinRoomResponse,
+    NextTrackResponse,
+    NoNextTrackResponse,
+    ParticipantCountResponse,
+    ParticipantListResponse,
+    PlaybackQueuedResponse,
+    PlayQueuedResponse,
+    RoomCreatedResponse,
+    RoomListResponse,
+    RoomResponse,
+    RoomSnapshotResponse,
+    RoomStateResponse,
+    RoundListResponse,
+    TrackChangedResponse,
+    TrackErrorResponse,
+    VoteResponse,
+)
 
 
 router = APIRouter(
@@ -30,10 +74,189 @@ def generate_room_code(length: int = 6) -> str:
     return "".join(random.choice(chars) for _ in range(length))
 
 
-@router.post("/")
-def create_room(
+async def _bump_version(session: AsyncSession, room: Room) -> None:
+    """
+    Incrémente la version de la room dans la transaction en cours.
+    Fait en SQL (version = version + 1) pour rester correct en concurrence.
+    Compte aussi comme activité pour le nettoyage des rooms inactives.
+    """
+    await session.exec(
+        update(Room)
+        .where(Room.id == room.id)
+        .values(version=Room.version + 1, last_activity_at=datetime.utcnow())
+    )
+
+
+async def _count_vote(session: AsyncSession, room_id: int, track_uri: str, is_like: bool) -> Optional[tuple]:
+    """
+    Incrémente le compteur like/dislike du morceau en cours (et la version)
+    dans la transaction du vote, et renvoie les compteurs à jour
+    (likes, dislikes). None si le morceau a changé entre-temps.
+    """
+    return (await session.exec(
+        update(Room)
+        .where(Room.id == room_id, Room.current_track_uri == track_uri)
+        .values(
+            current_likes=Room.current_likes + (1 if is_like else 0),
+            current_dislikes=Room.current_dislikes + (0 if is_like else 1),
+            version=Room.version + 1,
+            last_activity_at=datetime.utcnow(),
+        )
+        .returning(Room.current_likes, Room.current_dislikes)
+    )).first()
+
+
+def _current_tally(room: Room) -> tuple:
+    """
+    (likes, dislikes) du morceau en cours ; en écriture différée, les
+    compteurs mémoire sont en avance sur la base.
+    """
+    tally = vote_writer.current_tally(room.id, room.current_track_uri) if vote_writer.is_enabled() else None
+    return tally or (room.current_likes, room.current_dislikes)
+
+
+async def _room_state(room: Room) -> dict:
+    """
+    État courant de la room (morceau + likes), tel que renvoyé par /state.
+    """
+    likes, dislikes = _current_tally(room)
+    return {
+        "room": {
+            "code": room.code,
+            "like_threshold": room.like_threshold,
+            "is_active": room.is_active,
+            "version": room.version,
+            "round": room.current_round,
+        },
+        "current_track": {
+            "uri": room.current_track_uri,
+            "name": room.current_track_name,
+            "artists": room.current_track_artists,
+            "image_url": room.current_track_image_url,
+        },
+        "likes": likes,
+        "dislikes": dislikes,
+        # Dernière commande de lecture réellement appliquée par Spotify
+        "playback": await playback_state(room.code),
+    }
+
+
+def _participant_data(user: SpotifyUser, participant: RoomParticipant) -> dict:
+    return {
+        "user_id": user.id,
+        "spotify_id": user.spotify_id,
+        "display_name": user.display_name,
+        "email": user.email,
+        "joined_at": participant.joined_at.isoformat() if participant.joined_at else None,
+    }
+
+
+def _participant_row_data(row) -> dict:
+    return {
+        "user_id": row.user_id,
+        "spotify_id": row.spotify_id,
+        "display_name": row.display_name,
+        "email": row.email,
+        "joined_at": row.joined_at.isoformat() if row.joined_at else None,
+    }
+
+
+async def _participant_rows(
+    session: AsyncSession,
+    room_id: int,
+    after: Optional[tuple] = None,
+    limit: Optional[int] = None,
+) -> list:
+    """
+    Participants d'une room en une seule requête (jointure sur spotify_users),
+    triés par (joined_at, id) : l'hôte arrive toujours en premier.
+    `after` = (joined_at, participant_id) pour la pagination par curseur.
+    """
+    statement = (
+        select(
+            RoomParticipant.id.label("participant_id"),
+            RoomParticipant.joined_at,
+            SpotifyUser.id.label("user_id"),
+            SpotifyUser.spotify_id,
+            SpotifyUser.display_name,
+            SpotifyUser.email,
+        )
+        .join(SpotifyUser, SpotifyUser.id == RoomParticipant.user_id)
+        .where(RoomParticipant.room_id == room_id)
+        .order_by(RoomParticipant.joined_at, RoomParticipant.id)
+    )
+    if after is not None:
+        joined_at, participant_id = after
+        statement = statement.where(
+            or_(
+                RoomParticipant.joined_at > joined_at,
+                and_(RoomParticipant.joined_at == joined_at, RoomParticipant.id > participant_id),
+            )
+        )
+    if limit is not None:
+        statement = statement.limit(limit)
+    return (await session.exec(statement)).all()
+
+
+async def _participants_data(session: AsyncSession, room: Room) -> list:
+    return [_participant_row_data(row) for row in await _participant_rows(session, room.id)]
+
+
+def _encode_participant_cursor(row) -> str:
+    return f"{row.joined_at.isoformat()},{row.participant_id}"
+
+
+def _decode_cursor(cursor: str) -> tuple:
+    """
+    Curseur 'horodatage,id' -> (datetime, int).
+    """
+    try:
+        timestamp, row_id = cursor.rsplit(",", 1)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Curseur invalide")
+
+
+async def _room_snapshot(code: str) -> Optional[dict]:
+    """
+    État complet envoyé à un client qui s'abonne au flux de la room.
+    """
+    async with async_session() as session:
+        room = (await session.exec(select(Room).where(Room.code == code))).first()
+        if not room:
+            return None
+        return {
+            "version": room.version,
+            "state": await _room_state(room),
+            "participants": await _participants_data(session, room),
+        }
+
+
+async def _room_version(code: str) -> Optional[int]:
+    """
+    Lit seulement la version de la room (session courte : on ne garde
+    pas de transaction ouverte pendant un long-poll).
+    """
+    async with async_session() as session:
+        return (await session.exec(select(Room.version).where(Room.code == code))).first()
+
+
+def _snapshot_etag(code: str, version: int) -> str:
+    return f'"{code}-{version}"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return etag in candidates or "*" in candidates
+
+
+@router.post("/", response_model=RoomCreatedResponse)
+async def create_room(
     body: CreateRoomRequest,
-    session: Session = Depends(get_session),
+    background_tasks: BackgroundTasks,
+    session: AsyncSession = Depends(get_session),
 ):
     """
     Crée une nouvelle room.
@@ -41,14 +264,14 @@ def create_room(
     print(f"🎉 Création room pour : {body.host_spotify_id}")
     
     statement = select(SpotifyUser).where(SpotifyUser.spotify_id == body.host_spotify_id)
-    host = session.exec(statement).first()
+    host = (await session.exec(statement)).first()
 
     if not host:
         print(f"❌ Hôte introuvable : {body.host_spotify_id}")
         raise HTTPException(status_code=404, detail="Hôte (SpotifyUser) introuvable")
 
     code = generate_room_code()
-    while session.exec(select(Room).where(Room.code == code)).first():
+    while (await session.exec(select(Room).where(Room.code == code))).first():
         code = generate_room_code()
 
     room = Room(
@@ -59,8 +282,8 @@ def create_room(
     )
 
     session.add(room)
-    session.commit()
-    session.refresh(room)
+    await session.commit()
+    await session.refresh(room)
     
     print(f"✅ Room créée : {room.code}")
 
@@ -69,7 +292,9 @@ def create_room(
         user_id=host.id,
     )
     session.add(participant)
-    session.commit()
+    await session.commit()
+
+    schedule_catalog_sync(background_tasks, host.id)
 
     return {
         "id": room.id,
@@ -85,21 +310,76 @@ def create_room(
     }
 
 
-@router.get("/")
-def list_rooms(
-    session: Session = Depends(get_session),
+@router.get("/", response_model=RoomListResponse)
+async def list_rooms(
+    active: Optional[bool] = Query(None, description="true : rooms actives seulement, false : inactives"),
+    limit: int = Query(50, ge=1, le=200),
+    after: Optional[str] = Query(None, description="Curseur 'created_at,id' renvoyé par la page précédente"),
+    session: AsyncSession = Depends(get_session),
 ):
-    rooms = session.exec(select(Room)).all()
-    return rooms
+    """
+    Rooms de la plus récente à la plus ancienne, par pages (curseur sur
+    (created_at, id)), avec seulement les champs utiles à une liste.
+    """
+    participant_count = (
+        select(func.count(RoomParticipant.id))
+        .where(RoomParticipant.room_id == Room.id)
+        .correlate(Room)
+        .scalar_subquery()
+    )
+    statement = (
+        select(
+            Room.id,
+            Room.code,
+            Room.like_threshold,
+            Room.is_active,
+            Room.created_at,
+            Room.current_track_name,
+            participant_count.label("participant_count"),
+        )
+        .order_by(Room.created_at.desc(), Room.id.desc())
+        .limit(limit + 1)
+    )
+    if active is not None:
+        statement = statement.where(Room.is_active == active)
+    if after:
+        created_at, room_id = _decode_cursor(after)
+        statement = statement.where(
+            or_(
+                Room.created_at < created_at,
+                and_(Room.created_at == created_at, Room.id < room_id),
+            )
+        )
+    rows = (await session.exec(statement)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = f"{rows[-1].created_at.isoformat()},{rows[-1].id}"
 
+    return {
+        "rooms": [
+            {
+                "code": row.code,
+                "like_threshold": row.like_threshold,
+                "is_active": row.is_active,
+                "participant_count": row.participant_count,
+                "current_track_name": row.current_track_name,
+                "created_at": row.created_at.isoformat() if row.created_at else None,
+            }
+            for row in rows
+        ],
+        "next_cursor": next_cursor,
+    }
 
-@router.get("/{code}")
-def get_room_by_code(
+
+@router.get("/{code}", response_model=RoomResponse)
+async def get_room_by_code(
     code: str,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
 ):
     statement = select(Room).where(Room.code == code)
-    room = session.exec(statement).first()
+    room = (await session.exec(statement)).first()
 
     if not room:
         raise HTTPException(status_code=404, detail="Room introuvable")
@@ -114,20 +394,24 @@ def get_room_by_code(
     }
 
 
-@router.post("/{code}/join")
-def join_room(
+@router.post("/{code}/join", response_model=JoinRoomResponse)
+async def join_room(
     code: str,
     body: JoinRoomRequest,
-    session: Session = Depends(get_session),
+    background_tasks: BackgroundTasks,
+    session: AsyncSession = Depends(get_session),
 ):
     statement_room = select(Room).where(Room.code == code)
-    room = session.exec(statement_room).first()
+    room = (await session.exec(statement_room)).first()
 
     if not room:
         raise HTTPException(status_code=404, detail="Room introuvable")
 
+    if not room.is_active:
+        raise HTTPException(status_code=410, detail="Room terminée (inactive)")
+
     statement_user = select(SpotifyUser).where(SpotifyUser.spotify_id == body.spotify_id)
-    user = session.exec(statement_user).first()
+    user = (await session.exec(statement_user)).first()
 
     if not user:
         raise HTTPException(status_code=404, detail="Utilisateur Spotify introuvable")
@@ -136,7 +420,7 @@ def join_room(
         RoomParticipant.room_id == room.id,
         RoomParticipant.user_id == user.id,
     )
-    existing = session.exec(statement_participant).first()
+    existing = (await session.exec(statement_participant)).first()
 
     if existing:
         return {
@@ -150,8 +434,16 @@ def join_room(
         user_id=user.id,
     )
     session.add(participant)
-    session.commit()
-    session.refresh(participant)
+    await _bump_version(session, room)
+    await session.commit()
+    await session.refresh(participant)
+
+    # Le catalogue du nouvel arrivant se remplit pendant qu'il vote
+    schedule_catalog_sync(background_tasks, user.id)
+
+    room_cache.add_participant(room.code, user.spotify_id, user.id)
+    await shared_state.add_member(room.code, user.spotify_id, user.id)
+    room_events.publish(room.code, "participant_joined", _participant_data(user, participant))
 
     return {
         "status": "joined",
@@ -160,131 +452,143 @@ def join_room(
     }
 
 
-@router.get("/{code}/participants")
-def list_participants(
+@router.get(
+    "/{code}/participants",
+    response_model=Union[ParticipantListResponse, ParticipantCountResponse],
+)
+async def list_participants(
     code: str,
-    session: Session = Depends(get_session),
+    after: Optional[str] = Query(None, description="Curseur 'joined_at,id' renvoyé par la page précédente"),
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    count_only: bool = Query(False, description="Ne renvoie que le nombre de participants"),
+    session: AsyncSession = Depends(get_session),
 ):
-    statement_room = select(Room).where(Room.code == code)
-    room = session.exec(statement_room).first()
+    ctx = await get_room_context(session, code)
 
-    if not room:
+    if not ctx:
         raise HTTPException(status_code=404, detail="Room introuvable")
 
-    statement_participants = select(RoomParticipant).where(
-        RoomParticipant.room_id == room.id
-    )
-    participants = session.exec(statement_participants).all()
-
-    users_data = []
-    for p in participants:
-        user_stmt = select(SpotifyUser).where(SpotifyUser.id == p.user_id)
-        u = session.exec(user_stmt).first()
-        if u:
-            users_data.append(
-                {
-                    "user_id": u.id,
-                    "spotify_id": u.spotify_id,
-                    "display_name": u.display_name,
-                    "email": u.email,
-                    "joined_at": p.joined_at.isoformat() if p.joined_at else None,
-                }
-            )
+    if count_only:
+        count_stmt = select(func.count(RoomParticipant.id)).where(
+            RoomParticipant.room_id == ctx.room_id
+        )
+        return {
+            "room_code": ctx.code,
+            "count": (await session.exec(count_stmt)).one(),
+        }
+
+    cursor = _decode_cursor(after) if after else None
+    # Une ligne de plus pour savoir s'il reste une page
+    rows = await _participant_rows(session, ctx.room_id, cursor, limit + 1 if limit else None)
+
+    next_cursor = None
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_participant_cursor(rows[-1])
 
     return {
-        "room_code": room.code,
-        "participants": users_data,
+        "room_code": ctx.code,
+        "participants": [_participant_row_data(row) for row in rows],
+        "next_cursor": next_cursor,
     }
 
 
-@router.post("/{code}/vote")
-def vote_on_track(
+@router.post(
+    "/{code}/vote",
+    response_model=VoteResponse,
+    responses={409: {"description": "Le morceau a changé depuis le chargement du contexte"}},
+)
+async def vote_on_track(
     code: str,
     spotify_id: str = Query(...),
     is_like: bool = Query(True),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
 ):
-    room_stmt = select(Room).where(Room.code == code)
-    room = session.exec(room_stmt).first()
-    if not room:
+    ctx = await get_room_context(session, code)
+    if not ctx:
         raise HTTPException(status_code=404, detail="Room introuvable")
 
-    if not room.current_track_uri:
+    if not ctx.current_track_uri:
         raise HTTPException(status_code=400, detail="Aucune musique en cours")
 
-    user_stmt = select(SpotifyUser).where(SpotifyUser.spotify_id == spotify_id)
-    user = session.exec(user_stmt).first()
-    if not user:
+    user_id, is_participant = await find_participant(session, ctx, spotify_id)
+    if user_id is None:
         raise HTTPException(status_code=404, detail="Utilisateur introuvable")
-
-    participant_stmt = select(RoomParticipant).where(
-        RoomParticipant.room_id == room.id,
-        RoomParticipant.user_id == user.id,
-    )
-    participant = session.exec(participant_stmt).first()
-    if not participant:
+    if not is_participant:
         raise HTTPException(status_code=403, detail="Non participant")
 
-    vote = Vote(
-        room_id=room.id,
-        user_id=user.id,
-        track_uri=room.current_track_uri,
-        is_like=is_like,
-    )
-    session.add(vote)
-    session.commit()
-
-    likes_stmt = (
-        select(func.count(Vote.id))
-        .where(
-            Vote.room_id == room.id,
-            Vote.track_uri == room.current_track_uri,
-            Vote.is_like == True,
-        )
-    )
-    likes_count = session.exec(likes_stmt).one()
-
-    should_play = likes_count >= room.like_threshold
+    if vote_writer.is_enabled():
+        # Acquitté sur les compteurs mémoire, écrit en base par lots
+        tally = await vote_writer.submit_vote(session, ctx.room_id, user_id, ctx.current_track_uri, is_like)
+    else:
+        # Compteurs d'abord : le vote n'est inséré que s'il porte sur le morceau en cours
+        tally = await _count_vote(session, ctx.room_id, ctx.current_track_uri, is_like)
+        if tally is not None:
+            session.add(Vote(
+                room_id=ctx.room_id,
+                user_id=user_id,
+                track_uri=ctx.current_track_uri,
+                is_like=is_like,
+            ))
+            await session.commit()
+
+    if tally is None:
+        # Le morceau a changé entre-temps (contexte périmé) : le vote visait
+        # l'ancien morceau, il n'est pas enregistré
+        room_cache.invalidate(code)
+        raise HTTPException(status_code=409, detail="Le morceau a changé, vote ignoré")
+
+    record_vote(is_like)
+
+    likes_count, dislikes_count = tally
+
+    should_play = likes_count >= ctx.like_threshold
+
+    room_events.publish(ctx.code, "vote", {
+        "spotify_id": spotify_id,
+        "is_like": is_like,
+        "track_uri": ctx.current_track_uri,
+        "likes": likes_count,
+        "dislikes": dislikes_count,
+        "like_threshold": ctx.like_threshold,
+        "play": should_play,
+    })
 
     return {
         "status": "vote_registered",
-        "room_code": room.code,
-        "track_uri": room.current_track_uri,
-        "track_name": room.current_track_name,
+        "room_code": ctx.code,
+        "track_uri": ctx.current_track_uri,
+        "track_name": ctx.current_track_name,
         "likes": likes_count,
-        "like_threshold": room.like_threshold,
+        "dislikes": dislikes_count,
+        "like_threshold": ctx.like_threshold,
         "play": should_play,
     }
 
 
-@router.get("/{code}/random-track")
-def get_random_track_for_room(
+@router.get("/{code}/random-track", response_model=Union[TrackChangedResponse, TrackErrorResponse])
+async def get_random_track_for_room(
     code: str,
-    session: Session = Depends(get_session),
+    background_tasks: BackgroundTasks,
+    session: AsyncSession = Depends(get_session),
 ):
     room_stmt = select(Room).where(Room.code == code)
-    room = session.exec(room_stmt).first()
+    room = (await session.exec(room_stmt)).first()
     if not room:
         raise HTTPException(status_code=404, detail="Room introuvable")
 
-    participants_stmt = select(RoomParticipant).where(
-        RoomParticipant.room_id == room.id
-    )
-    participants = session.exec(participants_stmt).all()
-    if not participants:
+    ctx = await get_room_context(session, code)
+    if not ctx.participants:
         raise HTTPException(status_code=400, detail="Aucun participant")
 
-    random_participant = random.choice(participants)
-
-    user_stmt = select(SpotifyUser).where(SpotifyUser.id == random_participant.user_id)
-    user = session.exec(user_stmt).first()
+    user = await session.get(SpotifyUser, random.choice(list(ctx.participants.values())))
     if not user:
         raise HTTPException(status_code=500, detail="Participant sans SpotifyUser")
 
     if not user.access_token:
         raise HTTPException(status_code=500, detail="Pas de token Spotify")
 
-    track_info = pick_random_track_from_user(user.access_token)
+    track_info = await pick_track_for_user(session, user, background_tasks, await played_tracks_for(session, room))
 
     if "error" in track_info:
         return {
@@ -293,14 +597,31 @@ def get_random_track_for_room(
             "error": track_info["error"],
         }
 
+    if vote_writer.is_enabled():
+        # Votes encore en mémoire : en base avant l'archivage, et avant la
+        # première écriture de cette transaction (un seul écrivain SQLite)
+        await vote_writer.flush_votes()
+
+    await close_round(session, room)
+
     room.current_track_uri = track_info["track_uri"]
+    await mark_played(session, room, room.current_track_uri)
     room.current_track_name = track_info["name"]
     room.current_track_artists = track_info["artists"]
     room.current_track_image_url = track_info["image_url"]
+    room.current_likes = 0
+    room.current_dislikes = 0
 
     session.add(room)
-    session.commit()
-    session.refresh(room)
+    await _bump_version(session, room)
+    await session.commit()
+    await session.refresh(room)
+
+    room_cache.invalidate(room.code)
+    vote_writer.reset_tally(room.id)
+    await shared_state.set_track(room.code, room.current_track_uri, room.current_track_name)
+    room_events.publish(room.code, "track_changed", await _room_state(room))
+    schedule_prefetch(background_tasks, room.code)
 
     return {
         "status": "ok",
@@ -309,66 +630,142 @@ def get_random_track_for_room(
     }
 
 
-@router.get("/{code}/state")
-def get_room_state(
+@router.get("/{code}/state", response_model=RoomStateResponse)
+async def get_room_state(
     code: str,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
 ):
     room_stmt = select(Room).where(Room.code == code)
-    room = session.exec(room_stmt).first()
+    room = (await session.exec(room_stmt)).first()
     if not room:
         raise HTTPException(status_code=404, detail="Room introuvable")
 
-    likes_count = 0
-    if room.current_track_uri:
-        likes_stmt = (
-            select(func.count(Vote.id))
-            .where(
-                Vote.room_id == room.id,
-                Vote.track_uri == room.current_track_uri,
-                Vote.is_like == True,
-            )
-        )
-        likes_count = session.exec(likes_stmt).one()
+    return await _room_state(room)
+
+
+@router.get("/{code}/rounds", response_model=RoundListResponse)
+async def list_rounds(
+    code: str,
+    before: Optional[int] = Query(None, description="Numéro de manche : renvoie les manches précédentes"),
+    limit: int = Query(20, ge=1, le=200),
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    Historique des manches terminées, de la plus récente à la plus ancienne.
+    """
+    ctx = await get_room_context(session, code)
+    if not ctx:
+        raise HTTPException(status_code=404, detail="Room introuvable")
+
+    statement = (
+        select(RoomRound)
+        .where(RoomRound.room_id == ctx.room_id)
+        .order_by(RoomRound.round_number.desc())
+        .limit(limit + 1)
+    )
+    if before is not None:
+        statement = statement.where(RoomRound.round_number < before)
+    rounds = (await session.exec(statement)).all()
+
+    next_cursor = None
+    if len(rounds) > limit:
+        rounds = rounds[:limit]
+        next_cursor = rounds[-1].round_number
 
     return {
-        "room": {
-            "code": room.code,
-            "like_threshold": room.like_threshold,
-            "is_active": room.is_active,
-        },
-        "current_track": {
-            "uri": room.current_track_uri,
-            "name": room.current_track_name,
-            "artists": room.current_track_artists,
-            "image_url": room.current_track_image_url,
-        },
-        "likes": likes_count,
+        "room_code": ctx.code,
+        "rounds": [
+            {
+                "round_number": r.round_number,
+                "track_uri": r.track_uri,
+                "track_name": r.track_name,
+                "likes": r.likes,
+                "dislikes": r.dislikes,
+                "voters": r.voters,
+                "started_at": r.started_at.isoformat() if r.started_at else None,
+                "ended_at": r.ended_at.isoformat() if r.ended_at else None,
+                "duration_seconds": r.duration_seconds,
+            }
+            for r in rounds
+        ],
+        "next_cursor": next_cursor,
     }
 
 
-@router.get("/{code}/next-track")
-def get_next_track(
+SNAPSHOT_MAX_WAIT_SECONDS = 30
+
+
+@router.get("/{code}/snapshot", response_model=RoomSnapshotResponse)
+async def get_room_snapshot(
+    code: str,
+    request: Request,
+    wait: float = Query(0, ge=0, le=SNAPSHOT_MAX_WAIT_SECONDS, description="Long-poll : attente max (s) d'un changement"),
+):
+    """
+    État, likes et participants en une seule réponse, avec un ETag basé sur
+    la version de la room. `If-None-Match` à jour → 304 ; avec `wait`, la
+    réponse est retenue jusqu'au prochain changement (ou la fin du délai).
+    """
+    if_none_match = request.headers.get("if-none-match")
+
+    # Abonnement AVANT de lire la version pour ne rater aucun changement
+    queue = room_events.subscribe(code) if wait and if_none_match else None
+    try:
+        version = await _room_version(code)
+        if version is None:
+            raise HTTPException(status_code=404, detail="Room introuvable")
+
+        if queue is not None:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + wait
+            while _etag_matches(if_none_match, _snapshot_etag(code, version)):
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                version = await _room_version(code)
+                if version is None:
+                    raise HTTPException(status_code=404, detail="Room introuvable")
+    finally:
+        if queue is not None:
+            room_events.unsubscribe(code, queue)
+
+    etag = _snapshot_etag(code, version)
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    snapshot = await _room_snapshot(code)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Room introuvable")
+
+    # Réponse construite à la main (ETag) : pas de validation par le modèle,
+    # le dict part directement dans l'encodeur JSON
+    return DefaultJSONResponse(
+        snapshot,
+        headers={
+            "ETag": _snapshot_etag(code, snapshot["version"]),
+            "Cache-Control": "no-cache",
+        },
+    )
+
+
+@router.get("/{code}/next-track", response_model=Union[NextTrackResponse, NoNextTrackResponse])
+async def get_next_track(
     code: str,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
 ):
     room_stmt = select(Room).where(Room.code == code)
-    room = session.exec(room_stmt).first()
+    room = (await session.exec(room_stmt)).first()
     if not room:
         raise HTTPException(status_code=404, detail="Room introuvable")
 
     if not room.current_track_uri:
         return {"ready_to_play": False, "reason": "no_track_selected"}
 
-    likes_stmt = (
-        select(func.count(Vote.id))
-        .where(
-            Vote.room_id == room.id,
-            Vote.track_uri == room.current_track_uri,
-            Vote.is_like == True,
-        )
-    )
-    likes_count = session.exec(likes_stmt).one()
+    likes_count, _ = _current_tally(room)
 
     ready = likes_count >= room.like_threshold
 
@@ -383,38 +780,36 @@ def get_next_track(
     }
 
 
-@router.post("/{code}/next-round")
-def next_round(
+@router.post("/{code}/next-round", response_model=Union[TrackChangedResponse, TrackErrorResponse])
+async def next_round(
     code: str,
-    session: Session = Depends(get_session),
+    background_tasks: BackgroundTasks,
+    session: AsyncSession = Depends(get_session),
 ):
     room_stmt = select(Room).where(Room.code == code)
-    room = session.exec(room_stmt).first()
+    room = (await session.exec(room_stmt)).first()
     if not room:
         raise HTTPException(status_code=404, detail="Room introuvable")
 
-    participants_stmt = select(RoomParticipant).where(
-        RoomParticipant.room_id == room.id
-    )
-    participants = session.exec(participants_stmt).all()
-    if not participants:
+    ctx = await get_room_context(session, code)
+    if not ctx.participants:
         raise HTTPException(status_code=400, detail="Aucun participant")
 
-    delete_stmt = delete(Vote).where(Vote.room_id == room.id)
-    session.exec(delete_stmt)
-    session.commit()
+    # Morceau pré-sélectionné pendant la manche : pas d'appel Spotify ici.
+    # Le tirage passe avant la clôture : s'il échoue, la manche en cours
+    # et son morceau restent intacts.
+    played = await played_tracks_for(session, room)
+    track_info = await take_candidate(session, room.id, room.code, played)
 
-    random_participant = random.choice(participants)
-
-    user_stmt = select(SpotifyUser).where(SpotifyUser.id == random_participant.user_id)
-    user = session.exec(user_stmt).first()
-    if not user:
-        raise HTTPException(status_code=500, detail="Participant sans SpotifyUser")
+    if track_info is None:
+        user = await session.get(SpotifyUser, random.choice(list(ctx.participants.values())))
+        if not user:
+            raise HTTPException(status_code=500, detail="Participant sans SpotifyUser")
 
-    if not user.access_token:
-        raise HTTPException(status_code=500, detail="Pas de token Spotify")
+        if not user.access_token:
+            raise HTTPException(status_code=500, detail="Pas de token Spotify")
 
-    track_info = pick_random_track_from_user(user.access_token)
+        track_info = await pick_track_for_user(session, user, background_tasks, played)
 
     if "error" in track_info:
         return {
@@ -423,14 +818,33 @@ def next_round(
             "error": track_info["error"],
         }
 
+    if vote_writer.is_enabled():
+        # Votes encore en mémoire : en base avant l'archivage, et avant la
+        # première écriture de cette transaction (un seul écrivain SQLite)
+        await vote_writer.flush_votes()
+
+    # Clôture de la manche (votes résumés dans room_rounds puis purgés) et
+    # changement de morceau dans une seule transaction
+    await close_round(session, room)
+
     room.current_track_uri = track_info["track_uri"]
+    await mark_played(session, room, room.current_track_uri)
     room.current_track_name = track_info["name"]
     room.current_track_artists = track_info["artists"]
     room.current_track_image_url = track_info["image_url"]
+    room.current_likes = 0
+    room.current_dislikes = 0
 
     session.add(room)
-    session.commit()
-    session.refresh(room)
+    await _bump_version(session, room)
+    await session.commit()
+    await session.refresh(room)
+
+    room_cache.invalidate(room.code)
+    vote_writer.reset_tally(room.id)
+    await shared_state.set_track(room.code, room.current_track_uri, room.current_track_name)
+    room_events.publish(room.code, "track_changed", await _room_state(room))
+    schedule_prefetch(background_tasks, room.code)
 
     return {
         "status": "next_round_started",
@@ -441,88 +855,157 @@ def next_round(
 
 # 🎵 NOUVELLES ROUTES PLAYBACK
 
-@router.post("/{code}/play")
-def play_track(
+@router.post("/{code}/play", response_model=PlayQueuedResponse)
+async def play_track(
     code: str,
     device_id: str = Query(..., description="Spotify Web Playback SDK device ID"),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
 ):
     """
     Lance la lecture de la musique courante sur le Web Player.
     """
-    room_stmt = select(Room).where(Room.code == code)
-    room = session.exec(room_stmt).first()
-    if not room:
+    ctx = await get_room_context(session, code)
+    if not ctx:
         raise HTTPException(status_code=404, detail="Room introuvable")
     
-    if not room.current_track_uri:
+    if not ctx.current_track_uri:
         raise HTTPException(status_code=400, detail="Aucune musique sélectionnée")
     
-    host_stmt = select(SpotifyUser).where(SpotifyUser.id == room.host_user_id)
-    host = session.exec(host_stmt).first()
-    if not host:
+    if not ctx.host_spotify_id:
         raise HTTPException(status_code=404, detail="Hôte introuvable")
     
-    if not host.access_token:
+    if not ctx.host_access_token:
         raise HTTPException(status_code=401, detail="Token Spotify manquant")
     
-    result = play_track_on_device(host.access_token, device_id, room.current_track_uri)
-    
-    if "error" in result:
-        return {
-            "status": "error",
-            "error": result["error"],
-            "details": result.get("details", "")
-        }
-    
+    access_token = await get_valid_host_token(ctx)
+    if not access_token:
+        raise HTTPException(status_code=500, detail="Pas de token Spotify")
+    # L'état appliqué arrive ensuite par l'événement "playback" et /state
+    result = enqueue_playback(ctx.code, device_id, access_token, "play", ctx.current_track_uri)
+
     return {
-        "status": "playing",
-        "track_uri": room.current_track_uri,
-        "track_name": room.current_track_name,
+        **result,
+        "track_name": ctx.current_track_name,
     }
 
 
-@router.post("/{code}/pause")
-def pause_track(
+@router.post("/{code}/pause", response_model=PlaybackQueuedResponse)
+async def pause_track(
     code: str,
     device_id: str = Query(...),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
 ):
     """
     Met en pause la lecture.
     """
-    room_stmt = select(Room).where(Room.code == code)
-    room = session.exec(room_stmt).first()
-    if not room:
+    ctx = await get_room_context(session, code)
+    if not ctx:
         raise HTTPException(status_code=404, detail="Room introuvable")
     
-    host_stmt = select(SpotifyUser).where(SpotifyUser.id == room.host_user_id)
-    host = session.exec(host_stmt).first()
-    if not host:
+    if not ctx.host_spotify_id:
         raise HTTPException(status_code=404, detail="Hôte introuvable")
     
-    result = pause_playback(host.access_token, device_id)
-    return result
+    access_token = await get_valid_host_token(ctx)
+    if not access_token:
+        raise HTTPException(status_code=500, detail="Pas de token Spotify")
+    return enqueue_playback(ctx.code, device_id, access_token, "pause")
 
 
-@router.post("/{code}/resume")
-def resume_track(
+@router.post("/{code}/resume", response_model=PlaybackQueuedResponse)
+async def resume_track(
     code: str,
     device_id: str = Query(...),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
 ):
     """
     Reprend la lecture.
     """
-    room_stmt = select(Room).where(Room.code == code)
-    room = session.exec(room_stmt).first()
-    if not room:
+    ctx = await get_room_context(session, code)
+    if not ctx:
         raise HTTPException(status_code=404, detail="Room introuvable")
     
-    host_stmt = select(SpotifyUser).where(SpotifyUser.id == room.host_user_id)
-    host = session.exec(host_stmt).first()
-    if not host:
+    if not ctx.host_spotify_id:
         raise HTTPException(status_code=404, detail="Hôte introuvable")
     
-    result = resume_playback(host.access_token, device_id)
-    return result
+    access_token = await get_valid_host_token(ctx)
+    if not access_token:
+        raise HTTPException(status_code=500, detail="Pas de token Spotify")
+    return enqueue_playback(ctx.code, device_id, access_token, "resume")
+
+
+# ⚡ TEMPS RÉEL : WebSocket + fallback SSE
+
+@router.websocket("/{code}/ws")
+async def room_websocket(
+    websocket: WebSocket,
+    code: str,
+):
+    """
+    Flux temps réel de la room : un événement `snapshot` à la connexion,
+    puis chaque vote / arrivée / changement de morceau / lecture.
+    """
+    snapshot = await _room_snapshot(code)
+    if snapshot is None:
+        await websocket.close(code=4404)
+        return
+
+    await websocket.accept()
+    queue = room_events.subscribe(code)
+
+    async def forward_events():
+        while True:
+            event = await queue.get()
+            await websocket.send_json(event)
+
+    sender = asyncio.create_task(forward_events())
+    try:
+        await websocket.send_json({"type": "snapshot", "room_code": code, "data": snapshot})
+        # Le client n'envoie rien : on lit seulement pour détecter la déconnexion
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        room_events.unsubscribe(code, queue)
+
+
+SSE_KEEPALIVE_SECONDS = 15
+
+
+@router.get("/{code}/events", response_class=StreamingResponse)
+async def room_event_stream(
+    code: str,
+    request: Request,
+):
+    """
+    Même flux que le WebSocket, en Server-Sent Events (fallback).
+    """
+    snapshot = await _room_snapshot(code)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Room introuvable")
+
+    queue = room_events.subscribe(code)
+
+    async def stream():
+        try:
+            yield format_sse({"type": "snapshot", "room_code": code, "data": snapshot})
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(event)
+        finally:
+            room_events.unsubscribe(code, queue)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        # "identity" : GZipMiddleware laisse passer le flux tel quel (sinon
+        # les événements restent dans le tampon du compresseur)
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "Content-Encoding": "identity"},
+    )
@@ -1,8 +1,8 @@
-from sqlmodel import Session, select, create_engine
+from sqlmodel import Session, select
+from app.db.session import engine
 from app.models.user import SpotifyUser
 
-# Connexion à la base de données
-engine = create_engine('sqlite:///./spotify_party.db')
+# Connexion à la base de données (même moteur que l'API, via DATABASE_URL)
 session = Session(engine)
 
 # Récupérer tous les utilisateurs
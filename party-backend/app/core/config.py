@@ -10,6 +10,101 @@ class Settings:
         self.SPOTIFY_CLIENT_SECRET: str | None = os.getenv("SPOTIFY_CLIENT_SECRET")
         self.SPOTIFY_REDIRECT_URI: str | None = os.getenv("SPOTIFY_REDIRECT_URI")
 
+        # Base de données (SQLite par défaut, Postgres possible)
+        self.DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./spotify_party.db")
+        self.DB_ECHO: bool = os.getenv("DB_ECHO", "false").lower() == "true"
+        self.DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+        self.DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+        self.DB_POOL_TIMEOUT_SECONDS: float = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+        self.DB_POOL_RECYCLE_SECONDS: int = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+        self.SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+        self.SQLITE_MMAP_SIZE: int = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+        # Catalogue local des morceaux : délai minimum entre deux synchros d'un user
+        self.CATALOG_SYNC_INTERVAL_SECONDS: int = int(os.getenv("CATALOG_SYNC_INTERVAL_SECONDS", "600"))
+
+        # Tirage direct dans la bibliothèque Spotify (catalogue pas encore prêt) :
+        # requêtes envoyées en parallèle
+        self.SPOTIFY_SAMPLE_CONCURRENCY: int = int(os.getenv("SPOTIFY_SAMPLE_CONCURRENCY", "4"))
+
+        # Morceaux déjà joués par room : combien on en retient, et combien de
+        # tirages avant d'accepter une répétition (au moins 1 retenu : le
+        # morceau en cours, et l'offset de purge reste positif)
+        self.PLAYED_TRACKS_MAX: int = max(1, int(os.getenv("PLAYED_TRACKS_MAX", "500")))
+        self.PLAYED_TRACKS_RESAMPLE: int = int(os.getenv("PLAYED_TRACKS_RESAMPLE", "5"))
+
+        # Cache mémoire du contexte des rooms (room, hôte, participants)
+        self.ROOM_CACHE_SIZE: int = int(os.getenv("ROOM_CACHE_SIZE", "1024"))
+        self.ROOM_CACHE_TTL_SECONDS: float = float(os.getenv("ROOM_CACHE_TTL_SECONDS", "60"))
+
+        # Rafraîchissement des tokens Spotify en tâche de fond
+        self.TOKEN_REFRESH_MARGIN_SECONDS: int = int(os.getenv("TOKEN_REFRESH_MARGIN_SECONDS", "600"))
+        self.TOKEN_REFRESH_INTERVAL_SECONDS: int = int(os.getenv("TOKEN_REFRESH_INTERVAL_SECONDS", "60"))
+        self.TOKEN_REFRESH_MAX_FAILURES: int = int(os.getenv("TOKEN_REFRESH_MAX_FAILURES", "5"))
+        # Avec Redis, un bail limite déjà la tâche à un worker à la fois
+        self.TOKEN_REFRESH_ENABLED: bool = os.getenv("TOKEN_REFRESH_ENABLED", "true").lower() == "true"
+
+        # Pré-sélection du morceau suivant : durée de vie d'un candidat
+        self.PREFETCH_TTL_SECONDS: float = float(os.getenv("PREFETCH_TTL_SECONDS", "600"))
+
+        # Client HTTP partagé (appels Spotify)
+        self.HTTP_HTTP2: bool = os.getenv("HTTP_HTTP2", "true").lower() == "true"
+        self.HTTP_TIMEOUT_SECONDS: float = float(os.getenv("HTTP_TIMEOUT_SECONDS", "10"))
+        self.HTTP_CONNECT_TIMEOUT_SECONDS: float = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "5"))
+        self.HTTP_MAX_CONNECTIONS: int = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+        self.HTTP_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+        self.HTTP_KEEPALIVE_EXPIRY_SECONDS: float = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", "30"))
+
+        # Passerelle Spotify : quotas (requêtes/s), retries et disjoncteur
+        self.SPOTIFY_GLOBAL_RATE: float = float(os.getenv("SPOTIFY_GLOBAL_RATE", "20"))
+        self.SPOTIFY_GLOBAL_BURST: float = float(os.getenv("SPOTIFY_GLOBAL_BURST", "40"))
+        self.SPOTIFY_USER_RATE: float = float(os.getenv("SPOTIFY_USER_RATE", "5"))
+        self.SPOTIFY_USER_BURST: float = float(os.getenv("SPOTIFY_USER_BURST", "10"))
+        self.SPOTIFY_USER_BUCKETS_MAX: int = int(os.getenv("SPOTIFY_USER_BUCKETS_MAX", "4096"))
+        self.SPOTIFY_MAX_RETRIES: int = int(os.getenv("SPOTIFY_MAX_RETRIES", "3"))
+        self.SPOTIFY_BACKOFF_BASE_SECONDS: float = float(os.getenv("SPOTIFY_BACKOFF_BASE_SECONDS", "0.2"))
+        self.SPOTIFY_RETRY_AFTER_MAX_SECONDS: float = float(os.getenv("SPOTIFY_RETRY_AFTER_MAX_SECONDS", "30"))
+        self.SPOTIFY_BREAKER_FAILURES: int = int(os.getenv("SPOTIFY_BREAKER_FAILURES", "5"))
+        self.SPOTIFY_BREAKER_RESET_SECONDS: float = float(os.getenv("SPOTIFY_BREAKER_RESET_SECONDS", "30"))
+        self.SPOTIFY_CACHE_SIZE: int = int(os.getenv("SPOTIFY_CACHE_SIZE", "256"))
+
+        # Écriture différée des votes (compteurs en mémoire + écriture par lots)
+        self.VOTE_WRITE_BEHIND: bool = os.getenv("VOTE_WRITE_BEHIND", "false").lower() == "true"
+        self.VOTE_FLUSH_INTERVAL_MS: int = int(os.getenv("VOTE_FLUSH_INTERVAL_MS", "20"))
+        self.VOTE_FLUSH_BATCH_SIZE: int = int(os.getenv("VOTE_FLUSH_BATCH_SIZE", "200"))
+        self.VOTE_MAX_PENDING: int = int(os.getenv("VOTE_MAX_PENDING", "2000"))
+
+        # Nettoyage des rooms inactives (aucun vote / arrivée / changement de morceau)
+        self.ROOM_IDLE_TIMEOUT_SECONDS: int = int(os.getenv("ROOM_IDLE_TIMEOUT_SECONDS", str(6 * 3600)))
+        self.ROOM_SWEEP_INTERVAL_SECONDS: int = int(os.getenv("ROOM_SWEEP_INTERVAL_SECONDS", "300"))
+        self.ROOM_SWEEP_BATCH_SIZE: int = int(os.getenv("ROOM_SWEEP_BATCH_SIZE", "500"))
+
+        # Compression gzip des réponses d'au moins GZIP_MIN_SIZE octets (0 : désactivée)
+        self.GZIP_MIN_SIZE: int = int(os.getenv("GZIP_MIN_SIZE", "1024"))
+        self.GZIP_LEVEL: int = int(os.getenv("GZIP_LEVEL", "6"))
+
+        # Endpoint /metrics (format Prometheus)
+        self.METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+        # Endpoints /debug/* : montés seulement si DEBUG_TOKEN est défini,
+        # et appelés avec l'en-tête `Authorization: Bearer <DEBUG_TOKEN>`
+        self.DEBUG_TOKEN: str = os.getenv("DEBUG_TOKEN", "")
+
+        # Traces par requête (/debug/traces)
+        self.TRACE_ENABLED: bool = os.getenv("TRACE_ENABLED", "false").lower() == "true"
+        self.TRACE_SAMPLE_RATE: float = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))
+        self.TRACE_RING_SIZE: int = int(os.getenv("TRACE_RING_SIZE", "200"))
+        self.TRACE_SLOW_MS: float = float(os.getenv("TRACE_SLOW_MS", "500"))
+        self.TRACE_N_PLUS_ONE_THRESHOLD: int = int(os.getenv("TRACE_N_PLUS_ONE_THRESHOLD", "5"))
+        self.TRACE_SERVER_TIMING: bool = os.getenv("TRACE_SERVER_TIMING", "true").lower() == "true"
+
+        # Redis (optionnel) : état des rooms et événements partagés entre workers
+        self.REDIS_URL: str = os.getenv("REDIS_URL", "")
+        self.REDIS_KEY_PREFIX: str = os.getenv("REDIS_KEY_PREFIX", "party")
+        self.REDIS_ROOM_TTL_SECONDS: int = int(os.getenv("REDIS_ROOM_TTL_SECONDS", str(6 * 3600)))
+        self.REDIS_MAX_CONNECTIONS: int = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+        self.REDIS_TIMEOUT_SECONDS: float = float(os.getenv("REDIS_TIMEOUT_SECONDS", "2"))
+
         if not self.SPOTIFY_CLIENT_ID or not self.SPOTIFY_CLIENT_SECRET:
             print("⚠️  SPOTIFY_CLIENT_ID ou SPOTIFY_CLIENT_SECRET manquant dans .env")
 
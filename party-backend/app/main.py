@@ -1,15 +1,29 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from sqlmodel import SQLModel
+from fastapi.middleware.gzip import GZipMiddleware
 
-from app.db.session import engine
+from app.api.responses import DefaultJSONResponse
+from app.core.config import settings
+from app.db.session import async_engine, init_db
+from app.services.events import room_events
+from app.services.http_client import close_http_client, get_http_client
+from app.services.playback import stop_playback_queues
+from app.services.room_cache import room_cache
+from app.services.shared_state import shared_state
+from app.services import metrics, tracing
+from app.services.tokens import start_token_refresher, stop_token_refresher
+from app.services.vote_writer import start_vote_writer, stop_vote_writer
+from app.services.sweeper import start_room_sweeper, stop_room_sweeper
 from app.api.routes.auth import router as auth_router
 from app.api.routes.rooms import router as rooms_router
+from app.api.routes.debug import router as debug_router
+from app.api.routes.metrics import router as metrics_router
 
 
 app = FastAPI(
     title="Spotify Party Backend",
     version="0.1.0",
+    default_response_class=DefaultJSONResponse,
 )
 
 # 🔥 CORS Configuration - IMPORTANT
@@ -22,19 +36,50 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Trace-Id"],
 )
 
+# 🗜️ Compression des grosses réponses (listes, snapshots)
+if settings.GZIP_MIN_SIZE > 0:
+    app.add_middleware(GZipMiddleware, minimum_size=settings.GZIP_MIN_SIZE, compresslevel=settings.GZIP_LEVEL)
+
+# 📈 Métriques Prometheus (/metrics)
+if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+    metrics.instrument_engine(async_engine.sync_engine)
+
+# 🔎 Traces par requête (/debug/traces, en-tête Server-Timing)
+if settings.TRACE_ENABLED:
+    app.add_middleware(tracing.TracingMiddleware)
+    tracing.instrument_engine(async_engine.sync_engine)
+
 
 @app.on_event("startup")
-def on_startup():
-    SQLModel.metadata.create_all(bind=engine)
+async def on_startup():
+    await init_db()
     print("✅ Base de données initialisée")
+    get_http_client()
+    await shared_state.start(room_events, room_cache)
+    start_token_refresher()
+    start_vote_writer()
+    start_room_sweeper()
     print("📍 Routes enregistrées:")
     for route in app.routes:
         if hasattr(route, 'methods'):
             print(f"  {list(route.methods)[0]} {route.path}")
 
 
+@app.on_event("shutdown")
+async def on_shutdown():
+    await stop_room_sweeper()
+    await stop_vote_writer()
+    await stop_token_refresher()
+    await stop_playback_queues()
+    await close_http_client()
+    await shared_state.stop()
+    await async_engine.dispose()
+
+
 @app.get("/")
 def root():
     return {"message": "Backend Party - ça tourne 🎉"}
@@ -43,6 +88,10 @@ def root():
 # 🔥 IMPORTANT : Bien inclure les routers
 app.include_router(auth_router)
 app.include_router(rooms_router)
+if settings.DEBUG_TOKEN:
+    app.include_router(debug_router)
+if settings.METRICS_ENABLED:
+    app.include_router(metrics_router)
 
 # Debug : afficher toutes les routes au démarrage
 print("\n📋 Liste des routes disponibles:")
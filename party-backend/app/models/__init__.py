@@ -2,5 +2,18 @@ from .user import SpotifyUser
 from .room import Room
 from .room_participant import RoomParticipant
 from .vote import Vote
+from .catalog_playlist import CatalogPlaylist
+from .catalog_track import CatalogTrack
+from .room_round import RoomRound
+from .room_played_track import RoomPlayedTrack
 
-__all__ = ["SpotifyUser", "Room", "RoomParticipant", "Vote"]
+__all__ = [
+    "SpotifyUser",
+    "Room",
+    "RoomParticipant",
+    "Vote",
+    "CatalogPlaylist",
+    "CatalogTrack",
+    "RoomRound",
+    "RoomPlayedTrack",
+]
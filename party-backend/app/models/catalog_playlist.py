@@ -0,0 +1,21 @@
+# app/models/catalog_playlist.py
+from typing import Optional
+from datetime import datetime
+from sqlmodel import SQLModel, Field
+
+
+class CatalogPlaylist(SQLModel, table=True):
+    __tablename__ = "catalog_playlists"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+
+    user_id: int = Field(index=True)
+    spotify_playlist_id: str = Field(index=True)
+
+    name: Optional[str] = None
+    # Identifiant de version fourni par Spotify : s'il n'a pas bougé,
+    # les morceaux stockés sont toujours à jour.
+    snapshot_id: Optional[str] = None
+    track_count: int = 0
+
+    synced_at: datetime = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,25 @@
+# app/models/catalog_track.py
+from typing import Optional
+from sqlalchemy import Index
+from sqlmodel import SQLModel, Field
+
+
+class CatalogTrack(SQLModel, table=True):
+    __tablename__ = "catalog_tracks"
+    __table_args__ = (
+        # Tirage aléatoire : (playlist, position) -> un seul morceau
+        Index("ix_catalog_tracks_playlist_position", "playlist_id", "position", unique=True),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+
+    playlist_id: int = Field(index=True)  # -> catalog_playlists.id
+    user_id: int = Field(index=True)
+    position: int  # 0..track_count-1, sans trou
+
+    track_id: Optional[str] = None
+    track_uri: str
+    name: Optional[str] = None
+    artists: Optional[str] = None
+    album: Optional[str] = None
+    image_url: Optional[str] = None
@@ -1,11 +1,17 @@
 # app/models/room.py
 from typing import Optional
 from datetime import datetime
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field
 
 
 class Room(SQLModel, table=True):
     __tablename__ = "rooms"
+    # Liste des rooms : tri (created_at, id), filtrée ou non sur is_active
+    __table_args__ = (
+        Index("ix_rooms_active_created", "is_active", "created_at", "id"),
+        Index("ix_rooms_created", "created_at", "id"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
 
@@ -17,8 +23,22 @@ class Room(SQLModel, table=True):
 
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+    # Dernier vote / arrivée / changement de morceau (nettoyage des rooms inactives)
+    last_activity_at: Optional[datetime] = Field(default=None, index=True)
+
+    # Incrémenté à chaque modification (join, vote, changement de morceau)
+    version: int = 0
+
     # 🔽 Nouveau : infos sur la musique en cours de vote
     current_track_uri: Optional[str] = Field(default=None, index=True)
     current_track_name: Optional[str] = None
     current_track_artists: Optional[str] = None
     current_track_image_url: Optional[str] = None
+
+    # Compteurs du morceau en cours, tenus à jour dans la transaction du vote
+    current_likes: int = 0
+    current_dislikes: int = 0
+
+    # Manche en cours (archivée dans room_rounds quand elle se termine)
+    current_round: int = 0
+    round_started_at: Optional[datetime] = None
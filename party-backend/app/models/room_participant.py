@@ -1,11 +1,16 @@
 # app/models/room_participant.py
 from typing import Optional
 from datetime import datetime
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field
 
 
 class RoomParticipant(SQLModel, table=True):
     __tablename__ = "room_participants"
+    __table_args__ = (
+        # Liste paginée des participants : WHERE room_id ORDER BY joined_at, id
+        Index("ix_room_participants_room_joined", "room_id", "joined_at", "id"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
 
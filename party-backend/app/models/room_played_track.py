@@ -0,0 +1,23 @@
+# app/models/room_played_track.py
+from typing import Optional
+from datetime import datetime
+from sqlalchemy import Index
+from sqlmodel import SQLModel, Field
+
+
+class RoomPlayedTrack(SQLModel, table=True):
+    """
+    Morceau déjà joué dans une room (voir services/played_tracks.py).
+    """
+    __tablename__ = "room_played_tracks"
+    __table_args__ = (
+        Index("ix_room_played_tracks_room_uri", "room_id", "track_uri", unique=True),
+        # Ordre de passage : les plus récents ont l'id le plus grand
+        Index("ix_room_played_tracks_room_id", "room_id", "id"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+
+    room_id: int  # -> rooms.id
+    track_uri: str
+    played_at: datetime = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,32 @@
+# app/models/room_round.py
+from typing import Optional
+from datetime import datetime
+from sqlalchemy import Index
+from sqlmodel import SQLModel, Field
+
+
+class RoomRound(SQLModel, table=True):
+    """
+    Manche terminée : les votes bruts sont résumés en une ligne puis purgés.
+    """
+    __tablename__ = "room_rounds"
+    __table_args__ = (
+        Index("ix_room_rounds_room_number", "room_id", "round_number", unique=True),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+
+    room_id: int
+    round_number: int
+
+    track_uri: str
+    track_name: Optional[str] = None
+
+    likes: int = 0
+    dislikes: int = 0
+    # Nombre de participants distincts ayant voté
+    voters: int = 0
+
+    started_at: Optional[datetime] = None
+    ended_at: datetime = Field(default_factory=datetime.utcnow)
+    duration_seconds: Optional[float] = None
@@ -1,5 +1,6 @@
 # app/models/user.py
 from typing import Optional
+from datetime import datetime
 from sqlmodel import SQLModel, Field
 
 
@@ -17,3 +18,5 @@ class SpotifyUser(SQLModel, table=True):
     token_type: Optional[str] = None
     scope: Optional[str] = None
     expires_in: Optional[int] = None
+    # Date absolue d'expiration de l'access_token (UTC)
+    expires_at: Optional[datetime] = Field(default=None, index=True)
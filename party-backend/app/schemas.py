@@ -1,4 +1,6 @@
 # app/schemas.py
+from typing import List, Optional
+
 from pydantic import BaseModel
 
 
@@ -14,3 +16,210 @@ class JoinRoomRequest(BaseModel):
 class VoteRequest(BaseModel):
     spotify_id: str
     is_like: bool = True
+
+
+# --- Réponses ---
+# Les routes renvoient des dicts : FastAPI les valide contre ces modèles et les
+# sérialise avec pydantic-core, sans passer par jsonable_encoder.
+# Les dates restent des chaînes ISO, comme dans les événements temps réel.
+
+
+class ErrorResponse(BaseModel):
+    error: str
+
+
+class RoomCreatedResponse(BaseModel):
+    id: int
+    code: str
+    host_user_id: int
+    like_threshold: int
+    is_active: bool
+    created_at: Optional[str]
+    current_track_uri: Optional[str]
+    current_track_name: Optional[str]
+    current_track_artists: Optional[str]
+    current_track_image_url: Optional[str]
+
+
+class RoomResponse(BaseModel):
+    id: int
+    code: str
+    host_user_id: int
+    like_threshold: int
+    is_active: bool
+    created_at: Optional[str]
+
+
+class RoomListItem(BaseModel):
+    code: str
+    like_threshold: int
+    is_active: bool
+    participant_count: int
+    current_track_name: Optional[str]
+    created_at: Optional[str]
+
+
+class RoomListResponse(BaseModel):
+    rooms: List[RoomListItem]
+    next_cursor: Optional[str]
+
+
+class JoinRoomResponse(BaseModel):
+    status: str  # "joined" | "already_in_room"
+    room_code: str
+    user_id: int
+
+
+class Participant(BaseModel):
+    user_id: int
+    spotify_id: str
+    display_name: Optional[str]
+    email: Optional[str]
+    joined_at: Optional[str]
+
+
+class ParticipantListResponse(BaseModel):
+    room_code: str
+    participants: List[Participant]
+    next_cursor: Optional[str]
+
+
+class ParticipantCountResponse(BaseModel):
+    room_code: str
+    count: int
+
+
+class VoteResponse(BaseModel):
+    status: str
+    room_code: str
+    track_uri: str
+    track_name: Optional[str]
+    likes: int
+    dislikes: int
+    like_threshold: int
+    play: bool
+
+
+class TrackPlaylist(BaseModel):
+    id: Optional[str] = None
+    name: Optional[str] = None
+
+
+class Track(BaseModel):
+    track_id: Optional[str] = None
+    track_uri: str
+    name: Optional[str] = None
+    artists: Optional[str] = None
+    album: Optional[str] = None
+    image_url: Optional[str] = None
+    playlist: Optional[TrackPlaylist] = None
+
+
+class TrackChangedResponse(BaseModel):
+    status: str  # "ok" | "next_round_started"
+    room_code: str
+    track: Track
+
+
+class TrackErrorResponse(BaseModel):
+    status: str  # "error"
+    room_code: str
+    error: str
+
+
+class RoomSummary(BaseModel):
+    code: str
+    like_threshold: int
+    is_active: bool
+    version: int
+    round: int
+
+
+class CurrentTrack(BaseModel):
+    uri: Optional[str]
+    name: Optional[str]
+    artists: Optional[str]
+    image_url: Optional[str]
+
+
+class PlaybackState(BaseModel):
+    status: str  # "playing" | "paused" | "error"
+    action: str
+    command_id: int
+    device_id: str
+    track_uri: Optional[str] = None
+    applied_at: str
+    error: Optional[str] = None
+    status_code: Optional[int] = None
+
+
+class RoomStateResponse(BaseModel):
+    room: RoomSummary
+    current_track: CurrentTrack
+    likes: int
+    dislikes: int
+    playback: Optional[PlaybackState]
+
+
+class RoomSnapshotResponse(BaseModel):
+    version: int
+    state: RoomStateResponse
+    participants: List[Participant]
+
+
+class RoundSummary(BaseModel):
+    round_number: int
+    track_uri: str
+    track_name: Optional[str]
+    likes: int
+    dislikes: int
+    voters: int
+    started_at: Optional[str]
+    ended_at: Optional[str]
+    duration_seconds: Optional[float]
+
+
+class RoundListResponse(BaseModel):
+    room_code: str
+    rounds: List[RoundSummary]
+    next_cursor: Optional[int]
+
+
+class NextTrackResponse(BaseModel):
+    ready_to_play: bool
+    track_uri: Optional[str]
+    name: Optional[str]
+    artists: Optional[str]
+    image_url: Optional[str]
+    likes: int
+    threshold: int
+
+
+class NoNextTrackResponse(BaseModel):
+    ready_to_play: bool
+    reason: str
+
+
+class PlaybackQueuedResponse(BaseModel):
+    status: str  # "queued"
+    action: str
+    command_id: int
+    track_uri: Optional[str]
+
+
+class PlayQueuedResponse(PlaybackQueuedResponse):
+    track_name: Optional[str]
+
+
+class UserResponse(BaseModel):
+    id: int
+    spotify_id: str
+    display_name: Optional[str]
+    email: Optional[str]
+    access_token: Optional[str]
+
+
+class AuthErrorResponse(ErrorResponse):
+    # Réponse brute de Spotify, pour comprendre l'échec
+    raw: Optional[dict] = None
+    profile: Optional[dict] = None
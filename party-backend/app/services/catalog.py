@@ -0,0 +1,225 @@
+# app/services/catalog.py
+"""
+Catalogue local des morceaux de chaque participant.
+
+Les playlists et leurs morceaux sont recopiés en base. La synchro tourne en
+arrière-plan et ne recharge que les playlists dont le `snapshot_id` Spotify a
+changé : le tirage d'un morceau se fait ensuite sans aucun appel réseau.
+"""
+import random
+import time
+from datetime import datetime
+from typing import Optional
+
+from fastapi import BackgroundTasks
+from sqlalchemy import insert
+from sqlmodel import select, delete
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.db.session import async_session
+from app.models.user import SpotifyUser
+from app.models.catalog_playlist import CatalogPlaylist
+from app.models.catalog_track import CatalogTrack
+from app.services.spotify import (
+    SpotifyAPIError,
+    extract_track_info,
+    iter_playlist_tracks,
+    iter_user_playlists,
+    pick_random_track_from_user,
+)
+from app.services.played_tracks import PlayedTracks
+from app.services.tokens import get_valid_access_token
+from app.services.tracing import traced
+
+
+# Une seule synchro à la fois par utilisateur, mais par worker : avec
+# plusieurs workers, deux synchros du même utilisateur peuvent se croiser.
+# Travail en double, et l'une peut échouer sur l'index unique des morceaux ;
+# le catalogue reste celui de l'autre, repris à la synchro suivante.
+_syncing: set[int] = set()
+_last_sync: dict[int, float] = {}
+
+
+@traced("catalog.sync")
+async def sync_user_catalog(user_id: int) -> dict:
+    """
+    Met à jour le catalogue d'un utilisateur.
+    Pensé pour tourner en tâche de fond (BackgroundTasks).
+    """
+    if user_id in _syncing:
+        return {"status": "already_running"}
+    _syncing.add(user_id)
+
+    try:
+        async with async_session() as session:
+            result = await _sync_user_catalog(session, user_id)
+        print(f"📚 Catalogue user {user_id} : {result}")
+        return result
+    finally:
+        _syncing.discard(user_id)
+        _last_sync[user_id] = time.monotonic()
+
+
+async def _sync_user_catalog(session: AsyncSession, user_id: int) -> dict:
+    user = await session.get(SpotifyUser, user_id)
+    access_token = await get_valid_access_token(user) if user else None
+    if not access_token:
+        return {"status": "error", "error": "no_token"}
+
+    stored = {
+        p.spotify_playlist_id: p
+        for p in (await session.exec(
+            select(CatalogPlaylist).where(CatalogPlaylist.user_id == user_id)
+        )).all()
+    }
+
+    try:
+        remote_playlists = [p async for p in iter_user_playlists(access_token)]
+    except SpotifyAPIError as e:
+        return {"status": "error", "error": "playlists_unavailable", "status_code": e.status_code}
+
+    seen = set()
+    resynced = 0
+
+    for item in remote_playlists:
+        spotify_playlist_id = item.get("id")
+        if not spotify_playlist_id:
+            continue
+        seen.add(spotify_playlist_id)
+
+        playlist = stored.get(spotify_playlist_id)
+        if playlist and playlist.snapshot_id == item.get("snapshot_id"):
+            continue  # Rien n'a changé depuis la dernière synchro
+
+        try:
+            tracks = [
+                extract_track_info(t["track"])
+                async for t in iter_playlist_tracks(access_token, spotify_playlist_id)
+                if t.get("track") and (t["track"].get("uri") or "").startswith("spotify:track:")
+            ]
+        except SpotifyAPIError:
+            # On garde l'ancienne version, elle sera retentée à la prochaine synchro
+            continue
+
+        if playlist is None:
+            playlist = CatalogPlaylist(user_id=user_id, spotify_playlist_id=spotify_playlist_id)
+            session.add(playlist)
+            await session.flush()
+        else:
+            await session.exec(delete(CatalogTrack).where(CatalogTrack.playlist_id == playlist.id))
+
+        playlist.name = item.get("name")
+        playlist.snapshot_id = item.get("snapshot_id")
+        playlist.track_count = len(tracks)
+        playlist.synced_at = datetime.utcnow()
+        session.add(playlist)
+        if tracks:
+            # Un seul INSERT en executemany plutôt qu'un par objet ajouté à la session
+            await session.exec(
+                insert(CatalogTrack),
+                params=[
+                    {"playlist_id": playlist.id, "user_id": user_id, "position": position, **track}
+                    for position, track in enumerate(tracks)
+                ],
+            )
+        # Un commit par playlist pour ne pas garder le verrou d'écriture trop longtemps
+        await session.commit()
+        resynced += 1
+
+    removed = [p for spotify_playlist_id, p in stored.items() if spotify_playlist_id not in seen]
+    for playlist in removed:
+        await session.exec(delete(CatalogTrack).where(CatalogTrack.playlist_id == playlist.id))
+        await session.delete(playlist)
+    await session.commit()
+
+    return {
+        "status": "ok",
+        "playlists": len(seen),
+        "resynced": resynced,
+        "removed": len(removed),
+    }
+
+
+def schedule_catalog_sync(background_tasks: BackgroundTasks, user_id: int) -> None:
+    """
+    Programme une synchro du catalogue si la dernière est trop ancienne.
+    """
+    last = _last_sync.get(user_id)
+    if last is not None and time.monotonic() - last < settings.CATALOG_SYNC_INTERVAL_SECONDS:
+        return
+    background_tasks.add_task(sync_user_catalog, user_id)
+
+
+async def pick_random_track_from_catalog(session: AsyncSession, user_id: int) -> Optional[dict]:
+    """
+    Tire un morceau au hasard dans le catalogue local d'un utilisateur.
+    Chaque playlist est pondérée par son nombre de morceaux, ce qui donne un
+    tirage uniforme sur tout le catalogue ; le morceau est ensuite lu par
+    (playlist_id, position) sur l'index.
+    Renvoie None si le catalogue est vide.
+    """
+    playlists = (await session.exec(
+        select(CatalogPlaylist).where(
+            CatalogPlaylist.user_id == user_id,
+            CatalogPlaylist.track_count > 0,
+        )
+    )).all()
+    if not playlists:
+        return None
+
+    playlist = random.choices(playlists, weights=[p.track_count for p in playlists])[0]
+    position = random.randrange(playlist.track_count)
+
+    track = (await session.exec(
+        select(CatalogTrack).where(
+            CatalogTrack.playlist_id == playlist.id,
+            CatalogTrack.position == position,
+        )
+    )).first()
+    if not track:
+        return None
+
+    return {
+        "track_id": track.track_id,
+        "track_uri": track.track_uri,
+        "name": track.name,
+        "artists": track.artists,
+        "album": track.album,
+        "image_url": track.image_url,
+        "playlist": {
+            "id": playlist.spotify_playlist_id,
+            "name": playlist.name,
+        },
+    }
+
+
+@traced("catalog.pick_track")
+async def pick_track_for_user(
+    session: AsyncSession,
+    user: SpotifyUser,
+    background_tasks: BackgroundTasks,
+    played: Optional[PlayedTracks] = None,
+) -> dict:
+    """
+    Choisit un morceau pour un participant : catalogue local d'abord,
+    appel direct à Spotify seulement si le catalogue n'est pas encore prêt.
+
+    Un morceau déjà joué dans la room (`played`) est retiré, jusqu'à
+    PLAYED_TRACKS_RESAMPLE fois : au-delà (petite bibliothèque), on accepte
+    la répétition plutôt que de laisser la room sans morceau.
+    """
+    schedule_catalog_sync(background_tasks, user.id)
+    attempts = max(1, settings.PLAYED_TRACKS_RESAMPLE)
+
+    track_info = None
+    for _ in range(attempts if played else 1):
+        track_info = await pick_random_track_from_catalog(session, user.id)
+        if track_info is None or not played or track_info["track_uri"] not in played:
+            break
+
+    if track_info is None:
+        track_info = await pick_random_track_from_user(
+            await get_valid_access_token(user), exclude=played, attempts=attempts
+        )
+    return track_info
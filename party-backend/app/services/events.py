@@ -0,0 +1,71 @@
+# app/services/events.py
+"""
+Hub d'événements des rooms (votes, arrivées, changement de morceau, lecture).
+
+Chaque client abonné (WebSocket ou SSE) reçoit une file asyncio ; les routes
+qui modifient une room publient un événement qui est recopié dans toutes les
+files de la room. Une room sans activité ne coûte donc aucune requête SQL.
+"""
+import asyncio
+import json
+from typing import Any, Callable, Optional
+
+
+# Au-delà, un client trop lent perd les événements les plus anciens
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class RoomEventHub:
+    def __init__(self) -> None:
+        self._subscribers: dict[str, set[asyncio.Queue]] = {}
+        # Relais vers les autres workers (branché par shared_state si REDIS_URL)
+        self.forward: Optional[Callable[[dict], None]] = None
+
+    def subscribe(self, room_code: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.setdefault(room_code, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, room_code: str, queue: asyncio.Queue) -> None:
+        queues = self._subscribers.get(room_code)
+        if not queues:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[room_code]
+
+    def subscriber_count(self, room_code: str) -> int:
+        return len(self._subscribers.get(room_code, ()))
+
+    def publish(self, room_code: str, event_type: str, data: dict[str, Any]) -> None:
+        """
+        Diffuse un événement à tous les abonnés de la room (sans attendre),
+        et aux autres workers quand le relais Redis est actif.
+        """
+        event = {"type": event_type, "room_code": room_code, "data": data}
+        if self.forward is not None:
+            self.forward(event)
+        self.deliver(event)
+
+    def deliver(self, event: dict) -> None:
+        """
+        Recopie un événement dans les files des abonnés locaux de sa room.
+        """
+        queues = self._subscribers.get(event["room_code"])
+        if not queues:
+            return
+
+        for queue in queues:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+
+def format_sse(event: dict) -> str:
+    """
+    Sérialise un événement au format text/event-stream.
+    """
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+room_events = RoomEventHub()
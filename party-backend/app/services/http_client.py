@@ -0,0 +1,59 @@
+# app/services/http_client.py
+"""
+Client HTTP asynchrone partagé par tous les appels sortants (Spotify).
+
+Une seule instance `httpx.AsyncClient` pour tout le process : les connexions
+TLS sont réutilisées (keep-alive, HTTP/2 si `h2` est installé) au lieu
+d'être rouvertes à chaque requête.
+"""
+from typing import Optional
+
+import httpx
+
+from app.core.config import settings
+
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Renvoie le client partagé (créé au premier appel).
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        http2 = settings.HTTP_HTTP2 and _http2_available()
+        if settings.HTTP_HTTP2 and not http2:
+            print("⚠️  Paquet h2 absent : client HTTP en HTTP/1.1")
+
+        _client = httpx.AsyncClient(
+            http2=http2,
+            timeout=httpx.Timeout(
+                settings.HTTP_TIMEOUT_SECONDS,
+                connect=settings.HTTP_CONNECT_TIMEOUT_SECONDS,
+            ),
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+            ),
+        )
+    return _client
+
+
+async def close_http_client() -> None:
+    """
+    Ferme proprement les connexions (à l'arrêt de l'app).
+    """
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,356 @@
+# app/services/metrics.py
+"""
+Métriques au format Prometheus (texte 0.0.4), collectées en mémoire.
+
+Compteurs, jauges et histogrammes minimalistes : une incrémentation coûte un
+accès dict, un histogramme une recherche dichotomique dans ses bornes.
+Rien n'est calculé avant que /metrics ne soit lu.
+
+- requêtes HTTP : latence par route (gabarit, pas le chemin réel), statut,
+  requêtes en cours ;
+- base : nombre et durée des requêtes SQL par type (événements SQLAlchemy) ;
+- Spotify : latence et statut des appels sortants par endpoint (passerelle) ;
+- métier : rooms actives, participants, votes par seconde.
+"""
+import re
+import time
+from bisect import bisect_left
+from typing import Callable, Optional
+
+from sqlalchemy import event
+from starlette.routing import Match
+
+
+# Bornes en secondes : de la requête SQL (ms) à l'appel Spotify lent
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def render(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+            *self._samples(),
+        ]
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def _samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self.values.items())
+        ]
+
+
+class Gauge(_Metric):
+    """
+    Jauge : valeur posée à la main, ou lue au moment du scrape via `function`.
+    """
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple = (),
+        function: Optional[Callable[[], float]] = None,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.values: dict[tuple, float] = {}
+        self.function = function
+
+    def set(self, value: float, **labels) -> None:
+        self.values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def _samples(self) -> list[str]:
+        if self.function is not None:
+            return [f"{self.name} {_format_value(self.function())}"]
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self.values.items())
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple = (),
+        buckets: tuple = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # clé -> [comptes par borne (non cumulés) + dépassement, somme]
+        self.values: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        state = self.values.get(key)
+        if state is None:
+            state = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    def _samples(self) -> list[str]:
+        lines = []
+        for key, (counts, total) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class RateMeter:
+    """
+    Événements par seconde sur une fenêtre glissante (une case par seconde).
+    """
+
+    def __init__(self, window_seconds: int = 60) -> None:
+        self.window = window_seconds
+        self.slots = [0] * window_seconds
+        self.stamps = [0] * window_seconds
+
+    def mark(self, count: int = 1) -> None:
+        now = int(time.monotonic())
+        index = now % self.window
+        if self.stamps[index] != now:
+            self.stamps[index] = now
+            self.slots[index] = 0
+        self.slots[index] += count
+
+    def rate(self) -> float:
+        now = int(time.monotonic())
+        # La seconde en cours n'est pas finie : on ne la compte pas
+        total = sum(
+            count for count, stamp in zip(self.slots, self.stamps)
+            if now - self.window < stamp < now
+        )
+        return total / (self.window - 1)
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: list[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# --- HTTP ---
+
+http_requests_total = registry.register(Counter(
+    "http_requests_total", "Requêtes HTTP traitées.", ("method", "route", "status"),
+))
+http_request_duration_seconds = registry.register(Histogram(
+    "http_request_duration_seconds", "Durée des requêtes HTTP.", ("method", "route"),
+))
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "Requêtes HTTP en cours.", ("method", "route"),
+))
+
+# --- Base de données ---
+
+db_queries_total = registry.register(Counter(
+    "db_queries_total", "Requêtes SQL exécutées.", ("operation",),
+))
+db_query_duration_seconds = registry.register(Histogram(
+    "db_query_duration_seconds", "Durée des requêtes SQL.", ("operation",),
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+))
+
+# --- Spotify ---
+
+spotify_requests_total = registry.register(Counter(
+    "spotify_requests_total", "Appels sortants vers Spotify.", ("method", "endpoint", "status"),
+))
+spotify_request_duration_seconds = registry.register(Histogram(
+    "spotify_request_duration_seconds", "Durée des appels sortants vers Spotify.", ("method", "endpoint"),
+))
+
+# --- Métier ---
+
+active_rooms = registry.register(Gauge(
+    "party_active_rooms", "Rooms actives.",
+))
+participants = registry.register(Gauge(
+    "party_participants", "Participants des rooms actives.",
+))
+votes_total = registry.register(Counter(
+    "party_votes_total", "Votes enregistrés.", ("is_like",),
+))
+_votes_rate = RateMeter()
+votes_per_second = registry.register(Gauge(
+    "party_votes_per_second", "Votes par seconde (moyenne sur la dernière minute).",
+    function=_votes_rate.rate,
+))
+
+
+def record_vote(is_like: bool) -> None:
+    votes_total.inc(is_like="true" if is_like else "false")
+    _votes_rate.mark()
+
+
+# --- Middleware HTTP ---
+
+def route_template(scope) -> str:
+    """
+    Gabarit de la route qui va traiter la requête (`/rooms/{code}/vote`).
+    """
+    for route in scope["app"].router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI : latence, statut et requêtes en cours par route.
+
+    La route est le gabarit (`/rooms/{code}/vote`) : un chemin par room ferait
+    exploser le nombre de séries. Les chemins inconnus tombent dans "unmatched".
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        route = route_template(scope)
+        status = ["500"]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = str(message["status"])
+            await send(message)
+
+        http_requests_in_flight.inc(method=method, route=route)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_request_duration_seconds.observe(time.perf_counter() - start, method=method, route=route)
+            http_requests_total.inc(method=method, route=route, status=status[0])
+            http_requests_in_flight.dec(method=method, route=route)
+
+
+# --- SQLAlchemy ---
+
+def _operation(statement: str) -> str:
+    keyword = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return keyword if keyword in ("SELECT", "INSERT", "UPDATE", "DELETE") else "OTHER"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    started = getattr(context, "_metrics_started", None)
+    operation = _operation(statement)
+    db_queries_total.inc(operation=operation)
+    if started is not None:
+        db_query_duration_seconds.observe(time.perf_counter() - started, operation=operation)
+
+
+def instrument_engine(engine) -> None:
+    """
+    Branche les compteurs SQL sur un moteur synchrone
+    (`async_engine.sync_engine` pour le moteur asynchrone).
+    """
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# --- Spotify ---
+
+# Segments suivis d'un identifiant dans l'API Spotify
+_ID_PARENTS = {"playlists", "users", "albums", "artists", "tracks", "shows", "episodes", "audiobooks"}
+_SPOTIFY_ID = re.compile(r"^[0-9A-Za-z]{22}$")
+
+
+def spotify_endpoint(url: str) -> str:
+    """
+    Gabarit de l'endpoint appelé : /v1/playlists/{id}/tracks plutôt que l'URL réelle.
+    """
+    path = url.split("://", 1)[-1]
+    path = "/" + path.split("/", 1)[1] if "/" in path else "/"
+    path = path.split("?", 1)[0]
+    segments = path.split("/")
+    for i in range(1, len(segments)):
+        if segments[i - 1] in _ID_PARENTS or _SPOTIFY_ID.match(segments[i]):
+            segments[i] = "{id}"
+    return "/".join(segments)
+
+
+def record_spotify_call(method: str, endpoint: str, status: str, duration: Optional[float]) -> None:
+    spotify_requests_total.inc(method=method, endpoint=endpoint, status=status)
+    if duration is not None:
+        spotify_request_duration_seconds.observe(duration, method=method, endpoint=endpoint)
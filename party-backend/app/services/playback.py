@@ -1,7 +1,31 @@
 # app/services/playback.py
-import requests
+"""
+Commandes de lecture Spotify (play / pause / resume).
 
-def play_track_on_device(access_token: str, device_id: str, track_uri: str) -> dict:
+Les routes ne parlent plus à Spotify directement : elles déposent la commande
+dans la file de l'appareil et répondent tout de suite. Une tâche par appareil
+envoie les commandes une à une ; une commande pas encore partie est remplacée
+par la suivante (seule la dernière intention compte : pause, resume, pause
+n'envoie que la première pause puis la dernière). L'état réellement appliqué
+est publié (événement "playback") et exposé dans l'état de la room.
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import update
+
+from app.db.session import async_session
+from app.models.room import Room
+from app.services.events import room_events
+from app.services.shared_state import shared_state
+from app.services import tracing
+from app.services.spotify_gateway import spotify_gateway
+
+
+async def play_track_on_device(access_token: str, device_id: str, track_uri: str) -> dict:
     """
     Lance la lecture d'une musique sur un appareil Spotify spécifique.
     """
@@ -15,7 +39,7 @@ def play_track_on_device(access_token: str, device_id: str, track_uri: str) -> d
         "position_ms": 0
     }
     
-    response = requests.put(
+    response = await spotify_gateway.put(
         f"https://api.spotify.com/v1/me/player/play?device_id={device_id}",
         headers=headers,
         json=data
@@ -31,7 +55,7 @@ def play_track_on_device(access_token: str, device_id: str, track_uri: str) -> d
         }
 
 
-def pause_playback(access_token: str, device_id: str) -> dict:
+async def pause_playback(access_token: str, device_id: str) -> dict:
     """
     Met en pause la lecture sur un appareil.
     """
@@ -39,7 +63,7 @@ def pause_playback(access_token: str, device_id: str) -> dict:
         "Authorization": f"Bearer {access_token}"
     }
     
-    response = requests.put(
+    response = await spotify_gateway.put(
         f"https://api.spotify.com/v1/me/player/pause?device_id={device_id}",
         headers=headers
     )
@@ -50,7 +74,7 @@ def pause_playback(access_token: str, device_id: str) -> dict:
         return {"error": "pause_failed", "status_code": response.status_code}
 
 
-def resume_playback(access_token: str, device_id: str) -> dict:
+async def resume_playback(access_token: str, device_id: str) -> dict:
     """
     Reprend la lecture sur un appareil.
     """
@@ -58,7 +82,7 @@ def resume_playback(access_token: str, device_id: str) -> dict:
         "Authorization": f"Bearer {access_token}"
     }
     
-    response = requests.put(
+    response = await spotify_gateway.put(
         f"https://api.spotify.com/v1/me/player/play?device_id={device_id}",
         headers=headers
     )
@@ -66,4 +90,161 @@ def resume_playback(access_token: str, device_id: str) -> dict:
     if response.status_code == 204:
         return {"status": "playing"}
     else:
-        return {"error": "resume_failed", "status_code": response.status_code}
\ No newline at end of file
+        return {"error": "resume_failed", "status_code": response.status_code}
+
+
+@dataclass
+class PlaybackCommand:
+    room_code: str
+    device_id: str
+    access_token: str
+    action: str  # "play" | "pause" | "resume"
+    track_uri: Optional[str] = None
+    command_id: int = 0
+    queued_at: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class _DeviceQueue:
+    pending: Optional[PlaybackCommand] = None
+    task: Optional[asyncio.Task] = None
+
+
+# File par appareil, propre à chaque worker : avec plusieurs workers, deux
+# commandes pour le même appareil arrivées sur des workers différents ne se
+# remplacent pas et partent toutes les deux. Seul l'état appliqué est partagé
+# (shared_state.set_playback).
+_queues: dict[str, _DeviceQueue] = {}
+_next_command_id = 0
+
+# Commandes remplacées avant d'être envoyées (exposé sur /debug/playback)
+_coalesced = 0
+
+# room_code -> dernier état appliqué (voir playback_state)
+_applied: dict[str, dict] = {}
+
+
+def enqueue_playback(
+    room_code: str,
+    device_id: str,
+    access_token: str,
+    action: str,
+    track_uri: Optional[str] = None,
+) -> dict:
+    """
+    Dépose une commande dans la file de l'appareil et rend la main aussitôt.
+    Une commande encore en attente pour cet appareil est remplacée.
+    """
+    global _next_command_id, _coalesced
+    _next_command_id += 1
+    command = PlaybackCommand(room_code, device_id, access_token, action, track_uri, _next_command_id)
+
+    queue = _queues.setdefault(device_id, _DeviceQueue())
+    if queue.pending is not None:
+        _coalesced += 1
+    queue.pending = command
+    if queue.task is None or queue.task.done():
+        # Hors de la trace de la requête : la file lui survit
+        queue.task = tracing.create_task(_drain(device_id, queue))
+
+    return {
+        "status": "queued",
+        "action": action,
+        "command_id": command.command_id,
+        "track_uri": track_uri,
+    }
+
+
+async def _drain(device_id: str, queue: _DeviceQueue) -> None:
+    """
+    Envoie les commandes de l'appareil une par une, jusqu'à ce que la file
+    soit vide.
+    """
+    try:
+        while queue.pending is not None:
+            command, queue.pending = queue.pending, None
+            try:
+                result = await _send(command)
+            except Exception as e:
+                result = {"error": "playback_failed", "details": str(e)}
+            await _record_applied(command, result)
+    finally:
+        if _queues.get(device_id) is queue and queue.pending is None:
+            del _queues[device_id]
+
+
+async def _send(command: PlaybackCommand) -> dict:
+    if command.action == "play":
+        return await play_track_on_device(command.access_token, command.device_id, command.track_uri)
+    if command.action == "pause":
+        return await pause_playback(command.access_token, command.device_id)
+    return await resume_playback(command.access_token, command.device_id)
+
+
+async def _record_applied(command: PlaybackCommand, result: dict) -> None:
+    """
+    Garde l'état obtenu, le publie aux clients de la room et bumpe la version
+    de la room (les ETag de /snapshot changent).
+    """
+    state = {
+        "status": "error" if "error" in result else result["status"],
+        "action": command.action,
+        "command_id": command.command_id,
+        "device_id": command.device_id,
+        "track_uri": command.track_uri if command.action == "play" else None,
+        "applied_at": datetime.utcnow().isoformat(),
+    }
+    if "error" in result:
+        state["error"] = result["error"]
+        state["status_code"] = result.get("status_code")
+    elif state["track_uri"] is None:
+        # pause / resume gardent le morceau lancé par le dernier play
+        state["track_uri"] = (_applied.get(command.room_code) or {}).get("track_uri")
+
+    _applied[command.room_code] = state
+    await shared_state.set_playback(command.room_code, state)
+
+    try:
+        async with async_session() as session:
+            await session.exec(
+                update(Room).where(Room.code == command.room_code).values(version=Room.version + 1)
+            )
+            await session.commit()
+    except Exception as e:
+        print(f"💥 Erreur version room {command.room_code} : {e}")
+
+    room_events.publish(command.room_code, "playback", state)
+
+
+async def playback_state(room_code: str) -> Optional[dict]:
+    """
+    Dernier état de lecture appliqué pour la room (tous workers confondus
+    avec Redis), ou None si aucune commande n'a encore abouti.
+    """
+    return await shared_state.playback(room_code) or _applied.get(room_code)
+
+
+def forget_playback(room_code: str) -> None:
+    _applied.pop(room_code, None)
+
+
+def queue_stats() -> dict:
+    return {
+        "devices": len(_queues),
+        "pending": sum(1 for q in _queues.values() if q.pending is not None),
+        "coalesced": _coalesced,
+        "rooms_with_state": len(_applied),
+    }
+
+
+async def stop_playback_queues(timeout: float = 2.0) -> None:
+    """
+    À l'arrêt : laisse partir les commandes en cours, puis abandonne le reste.
+    """
+    tasks = [q.task for q in _queues.values() if q.task is not None and not q.task.done()]
+    if not tasks:
+        return
+    _, still_running = await asyncio.wait(tasks, timeout=timeout)
+    for task in still_running:
+        task.cancel()
+    await asyncio.gather(*still_running, return_exceptions=True)
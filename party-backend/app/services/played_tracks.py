@@ -0,0 +1,118 @@
+# app/services/played_tracks.py
+"""
+Morceaux déjà joués dans chaque room, pour ne pas reproposer le même titre.
+
+Les votes d'une manche sont purgés à la manche suivante : l'historique ne
+permet pas de savoir ce qui est déjà passé. On garde donc, par room, les
+PLAYED_TRACKS_MAX derniers morceaux (ensemble borné, le plus ancien sort en
+premier), une ligne par morceau dans `room_played_tracks`. La ligne `rooms`,
+relue par /state, /snapshot et /next-track, n'en porte rien, et un changement
+de morceau n'écrit qu'une ligne.
+
+Les morceaux d'une room ne sont relus que si sa manche a changé depuis la
+dernière lecture (changement de morceau ici ou sur un autre worker) : sinon
+le test d'appartenance est un simple accès à un set.
+"""
+from collections import OrderedDict
+from typing import Optional
+
+from sqlmodel import select, delete
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.models.room import Room
+from app.models.room_played_track import RoomPlayedTrack
+
+
+# Au-delà, les rooms les moins récemment consultées sont oubliées (relues en base)
+MAX_CACHED_ROOMS = 4096
+
+
+class PlayedTracks:
+    """
+    Ensemble des N derniers morceaux joués, dans l'ordre de passage.
+    """
+
+    def __init__(self, uris=(), max_size: Optional[int] = None) -> None:
+        self.max_size = max_size or settings.PLAYED_TRACKS_MAX
+        # dict ordonné : appartenance en O(1) et ordre de passage
+        self._uris: dict[str, None] = {}
+        for uri in uris:
+            self.add(uri)
+
+    def __contains__(self, uri: object) -> bool:
+        return uri in self._uris
+
+    def __len__(self) -> int:
+        return len(self._uris)
+
+    def add(self, uri: str) -> None:
+        # Un morceau rejoué repasse en dernière position
+        self._uris.pop(uri, None)
+        self._uris[uri] = None
+        while len(self._uris) > self.max_size:
+            del self._uris[next(iter(self._uris))]
+
+
+# room_id -> (manche lors de la lecture, ensemble)
+_cache: OrderedDict[int, tuple[int, PlayedTracks]] = OrderedDict()
+
+
+async def played_tracks_for(session: AsyncSession, room: Room) -> PlayedTracks:
+    """
+    Morceaux déjà joués dans la room, relus en base si la manche a changé.
+    """
+    cached = _cache.get(room.id)
+    if cached is not None and cached[0] == room.current_round:
+        _cache.move_to_end(room.id)
+        return cached[1]
+
+    uris = (await session.exec(
+        select(RoomPlayedTrack.track_uri)
+        .where(RoomPlayedTrack.room_id == room.id)
+        .order_by(RoomPlayedTrack.id.desc())
+        .limit(settings.PLAYED_TRACKS_MAX)
+    )).all()
+    played = PlayedTracks(reversed(uris))
+
+    _cache[room.id] = (room.current_round, played)
+    while len(_cache) > MAX_CACHED_ROOMS:
+        _cache.popitem(last=False)
+    return played
+
+
+async def mark_played(session: AsyncSession, room: Room, track_uri: Optional[str]) -> None:
+    """
+    Note le morceau comme joué, dans la transaction de l'appelant (même
+    commit que le changement de morceau).
+    """
+    if not track_uri:
+        return
+    # Un morceau rejoué repasse en dernière position
+    await session.exec(delete(RoomPlayedTrack).where(
+        RoomPlayedTrack.room_id == room.id,
+        RoomPlayedTrack.track_uri == track_uri,
+    ))
+    session.add(RoomPlayedTrack(room_id=room.id, track_uri=track_uri))
+    await session.flush()
+
+    # Au-delà de PLAYED_TRACKS_MAX, les plus anciens sortent
+    oldest_kept = (await session.exec(
+        select(RoomPlayedTrack.id)
+        .where(RoomPlayedTrack.room_id == room.id)
+        .order_by(RoomPlayedTrack.id.desc())
+        .offset(settings.PLAYED_TRACKS_MAX - 1)
+        .limit(1)
+    )).first()
+    if oldest_kept is not None:
+        await session.exec(delete(RoomPlayedTrack).where(
+            RoomPlayedTrack.room_id == room.id,
+            RoomPlayedTrack.id < oldest_kept,
+        ))
+
+    # Relu au prochain tirage, avec la nouvelle manche
+    _cache.pop(room.id, None)
+
+
+def forget_played(room_id: int) -> None:
+    _cache.pop(room_id, None)
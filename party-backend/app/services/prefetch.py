@@ -0,0 +1,135 @@
+# app/services/prefetch.py
+"""
+Pré-sélection du morceau de la manche suivante.
+
+Pendant que la room vote, on choisit déjà le prochain morceau (métadonnées et
+pochette comprises) en arrière-plan. `/next-round` n'a plus qu'à l'échanger
+avec le morceau courant, puis relance la pré-sélection suivante.
+Un candidat dont le propriétaire a quitté la room est écarté, de même qu'un
+candidat plus vieux que PREFETCH_TTL_SECONDS (choisi avec un token ou un
+catalogue qui ont pu changer depuis) ou déjà joué entre-temps.
+"""
+import random
+import time
+from typing import Optional
+
+from fastapi import BackgroundTasks
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.db.session import async_session
+from app.models.room import Room
+from app.models.room_participant import RoomParticipant
+from app.models.user import SpotifyUser
+from app.services.catalog import pick_track_for_user
+from app.services.played_tracks import PlayedTracks, played_tracks_for
+from app.services.room_cache import get_room_context
+
+
+# room_code -> {"user_id", "track", "prefetched_at"}
+# Propre à chaque worker, même avec REDIS_URL : un /next-round servi par un
+# autre worker ne trouve pas le candidat et choisit le morceau lui-même.
+_candidates: dict[str, dict] = {}
+
+# Une seule pré-sélection à la fois par room
+_prefetching: set[str] = set()
+
+
+def _fresh(candidate: dict) -> bool:
+    return time.monotonic() - candidate["prefetched_at"] < settings.PREFETCH_TTL_SECONDS
+
+
+async def prefetch_next_candidate(room_code: str) -> None:
+    """
+    Choisit et garde en mémoire le candidat de la prochaine manche.
+    Pensé pour tourner en tâche de fond (BackgroundTasks).
+    """
+    if room_code in _prefetching or room_code in _candidates:
+        return
+    _prefetching.add(room_code)
+
+    try:
+        async with async_session() as session:
+            ctx = await get_room_context(session, room_code)
+            if ctx is None or not ctx.is_active or not ctx.participants:
+                return
+
+            user = await session.get(SpotifyUser, random.choice(list(ctx.participants.values())))
+            if not user or not user.access_token:
+                return
+
+            # Le morceau en cours est déjà dans les morceaux joués de la room
+            room = await session.get(Room, ctx.room_id)
+            played = await played_tracks_for(session, room) if room else None
+
+            # Les synchros de catalogue déclenchées par le tirage tournent ici aussi
+            tasks = BackgroundTasks()
+            track_info = await pick_track_for_user(session, user, tasks, played)
+
+        await tasks()
+
+        if "error" in track_info:
+            print(f"⚠️  Pré-sélection impossible pour {room_code} : {track_info['error']}")
+            return
+
+        _candidates[room_code] = {
+            "user_id": user.id,
+            "track": track_info,
+            "prefetched_at": time.monotonic(),
+        }
+    except Exception as e:
+        print(f"💥 Erreur pré-sélection {room_code} : {e}")
+    finally:
+        _prefetching.discard(room_code)
+
+
+def schedule_prefetch(background_tasks: BackgroundTasks, room_code: str) -> None:
+    """
+    Programme la pré-sélection du prochain morceau après la réponse.
+    Un candidat périmé est remplacé.
+    """
+    candidate = _candidates.get(room_code)
+    if candidate is not None and not _fresh(candidate):
+        _candidates.pop(room_code, None)
+        candidate = None
+    if room_code in _prefetching or candidate is not None:
+        return
+    background_tasks.add_task(prefetch_next_candidate, room_code)
+
+
+async def take_candidate(
+    session: AsyncSession,
+    room_id: int,
+    room_code: str,
+    played: Optional[PlayedTracks] = None,
+) -> Optional[dict]:
+    """
+    Retire et renvoie le morceau pré-sélectionné, ou None s'il n'y en a pas,
+    s'il est périmé, s'il a été joué depuis ou si son propriétaire n'est plus
+    dans la room.
+    """
+    candidate = _candidates.pop(room_code, None)
+    if candidate is None or not _fresh(candidate):
+        return None
+    if played and candidate["track"]["track_uri"] in played:
+        return None
+
+    still_member = (await session.exec(
+        select(RoomParticipant.id).where(
+            RoomParticipant.room_id == room_id,
+            RoomParticipant.user_id == candidate["user_id"],
+        )
+    )).first() is not None
+    if not still_member:
+        return None
+
+    return candidate["track"]
+
+
+def invalidate_candidate(room_code: str) -> None:
+    """
+    Oublie le candidat d'une room. Le départ de son propriétaire n'a pas
+    besoin d'appel ici : take_candidate revérifie l'appartenance.
+    """
+    _candidates.pop(room_code, None)
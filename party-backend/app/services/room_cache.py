@@ -0,0 +1,187 @@
+# app/services/room_cache.py
+"""
+Cache en mémoire du contexte des rooms (room, hôte + token, participants).
+
+Les routes les plus appelées (vote, play/pause/resume) n'ont plus besoin de
+relire Room, SpotifyUser et RoomParticipant à chaque requête : le contrôle
+d'appartenance et la recherche de l'hôte deviennent des accès dictionnaire.
+
+Taille bornée (LRU) et durée de vie courte ; les routes qui modifient une
+room mettent le cache à jour ou l'invalident.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Optional
+
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.models.room import Room
+from app.models.room_participant import RoomParticipant
+from app.models.user import SpotifyUser
+from app.services.shared_state import shared_state
+
+
+@dataclass
+class RoomContext:
+    room_id: int
+    code: str
+    like_threshold: int
+    is_active: bool
+
+    current_track_uri: Optional[str]
+    current_track_name: Optional[str]
+
+    host_user_id: int
+    host_spotify_id: Optional[str]
+    host_access_token: Optional[str]
+    host_token_expires_at: Optional[datetime]
+
+    # spotify_id -> user_id des participants
+    participants: dict[str, int] = field(default_factory=dict)
+
+    loaded_at: float = field(default_factory=time.monotonic)
+
+
+class RoomContextCache:
+    def __init__(self, max_size: int, ttl_seconds: float) -> None:
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._items: OrderedDict[str, RoomContext] = OrderedDict()
+        self._lock = threading.Lock()
+        # Prévient les autres workers (branché par shared_state si REDIS_URL)
+        self.on_invalidate: Optional[Callable[[str, Optional[str]], None]] = None
+
+    def get(self, code: str) -> Optional[RoomContext]:
+        with self._lock:
+            ctx = self._items.get(code)
+            if ctx is None:
+                return None
+            if time.monotonic() - ctx.loaded_at > self.ttl_seconds:
+                del self._items[code]
+                return None
+            self._items.move_to_end(code)
+            return ctx
+
+    def put(self, ctx: RoomContext) -> None:
+        with self._lock:
+            self._items[ctx.code] = ctx
+            self._items.move_to_end(ctx.code)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def add_participant(self, code: str, spotify_id: str, user_id: int) -> None:
+        with self._lock:
+            ctx = self._items.get(code)
+            if ctx is not None:
+                ctx.participants[spotify_id] = user_id
+
+    def invalidate(self, code: str, broadcast: bool = True) -> None:
+        with self._lock:
+            self._items.pop(code, None)
+        if broadcast and self.on_invalidate is not None:
+            self.on_invalidate("room", code)
+
+    def invalidate_user(self, user_id: int, broadcast: bool = True) -> None:
+        """
+        Oublie les rooms dont l'utilisateur est l'hôte (ex : nouveau token).
+        """
+        with self._lock:
+            for code in [c for c, ctx in self._items.items() if ctx.host_user_id == user_id]:
+                del self._items[code]
+        if broadcast and self.on_invalidate is not None:
+            self.on_invalidate("user", str(user_id))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+room_cache = RoomContextCache(
+    max_size=settings.ROOM_CACHE_SIZE,
+    ttl_seconds=settings.ROOM_CACHE_TTL_SECONDS,
+)
+
+
+async def _load_room_context(session: AsyncSession, code: str) -> Optional[RoomContext]:
+    room = (await session.exec(select(Room).where(Room.code == code))).first()
+    if not room:
+        return None
+
+    host = await session.get(SpotifyUser, room.host_user_id)
+
+    members = (await session.exec(
+        select(SpotifyUser.spotify_id, RoomParticipant.user_id)
+        .join(SpotifyUser, SpotifyUser.id == RoomParticipant.user_id)
+        .where(RoomParticipant.room_id == room.id)
+    )).all()
+
+    return RoomContext(
+        room_id=room.id,
+        code=room.code,
+        like_threshold=room.like_threshold,
+        is_active=room.is_active,
+        current_track_uri=room.current_track_uri,
+        current_track_name=room.current_track_name,
+        host_user_id=room.host_user_id,
+        host_spotify_id=host.spotify_id if host else None,
+        host_access_token=host.access_token if host else None,
+        host_token_expires_at=host.expires_at if host else None,
+        participants={spotify_id: user_id for spotify_id, user_id in members},
+    )
+
+
+async def get_room_context(session: AsyncSession, code: str) -> Optional[RoomContext]:
+    """
+    Contexte de la room depuis le cache, chargé depuis la base si absent.
+    """
+    ctx = room_cache.get(code)
+    if ctx is not None and shared_state.enabled:
+        # Un autre worker a pu changer de morceau : Redis fait foi
+        track_uri = await shared_state.current_track(code)
+        if track_uri is not None and track_uri != (ctx.current_track_uri or ""):
+            room_cache.invalidate(code, broadcast=False)
+            ctx = None
+
+    if ctx is None:
+        ctx = await _load_room_context(session, code)
+        if ctx is not None:
+            room_cache.put(ctx)
+            await shared_state.load_members(ctx.code, ctx.participants)
+    return ctx
+
+
+async def find_participant(session: AsyncSession, ctx: RoomContext, spotify_id: str) -> tuple[Optional[int], bool]:
+    """
+    Renvoie (user_id, est_participant). Un participant absent du cache est
+    cherché dans Redis puis revérifié en base : il a pu rejoindre la room via
+    un autre worker.
+    """
+    user_id = ctx.participants.get(spotify_id)
+    if user_id is not None:
+        return user_id, True
+
+    user_id = await shared_state.member(ctx.code, spotify_id)
+    if user_id is not None:
+        room_cache.add_participant(ctx.code, spotify_id, user_id)
+        return user_id, True
+
+    user_id = (await session.exec(
+        select(SpotifyUser.id).where(SpotifyUser.spotify_id == spotify_id)
+    )).first()
+    if user_id is None:
+        return None, False
+
+    is_member = (await session.exec(
+        select(RoomParticipant.id).where(
+            RoomParticipant.room_id == ctx.room_id,
+            RoomParticipant.user_id == user_id,
+        )
+    )).first() is not None
+    if is_member:
+        room_cache.add_participant(ctx.code, spotify_id, user_id)
+    return user_id, is_member
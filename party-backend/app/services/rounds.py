@@ -0,0 +1,71 @@
+# app/services/rounds.py
+"""
+Archive des manches.
+
+À la fin d'une manche, ses votes sont résumés en une ligne `room_rounds`
+(likes, dislikes, votants, durée) puis supprimés d'un seul DELETE : la table
+`votes` ne contient plus que la manche en cours et l'historique reste
+consultable par room.
+"""
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import case
+from sqlmodel import select, func, delete
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models.room import Room
+from app.models.room_round import RoomRound
+from app.models.vote import Vote
+from app.services.tracing import traced
+
+
+@traced("rounds.close")
+async def close_round(session: AsyncSession, room: Room) -> Optional[RoomRound]:
+    """
+    Archive la manche en cours, purge ses votes et ouvre la suivante, dans
+    la transaction de l'appelant. Renvoie la ligne d'archive (None si aucun
+    morceau n'était en cours).
+    Les votes en écriture différée doivent avoir été écrits avant
+    (vote_writer.flush_votes), hors de cette transaction.
+    """
+    now = datetime.utcnow()
+    archived = None
+
+    if room.current_track_uri:
+        likes, dislikes, voters = (await session.exec(
+            select(
+                func.count(case((Vote.is_like == True, 1))),
+                func.count(case((Vote.is_like == False, 1))),
+                func.count(func.distinct(Vote.user_id)),
+            ).where(
+                Vote.room_id == room.id,
+                Vote.track_uri == room.current_track_uri,
+            )
+        )).one()
+
+        # Rooms créées avant l'archive : leur manche en cours devient la n°1
+        room.current_round = room.current_round or 1
+        archived = RoomRound(
+            room_id=room.id,
+            round_number=room.current_round,
+            track_uri=room.current_track_uri,
+            track_name=room.current_track_name,
+            likes=likes,
+            dislikes=dislikes,
+            voters=voters,
+            started_at=room.round_started_at,
+            ended_at=now,
+            duration_seconds=(
+                (now - room.round_started_at).total_seconds()
+                if room.round_started_at else None
+            ),
+        )
+        session.add(archived)
+
+    await session.exec(delete(Vote).where(Vote.room_id == room.id))
+
+    room.current_round += 1
+    room.round_started_at = now
+    session.add(room)
+    return archived
@@ -0,0 +1,344 @@
+# app/services/shared_state.py
+"""
+État des rooms partagé entre workers via Redis (optionnel, REDIS_URL).
+
+Sans Redis, caches, compteurs et diffusion des événements vivent dans le
+process : un seul worker uvicorn possible. Avec REDIS_URL :
+
+- état chaud par room : morceau en cours, état de lecture appliqué et membres
+  (spotify_id -> user_id) ;
+- pub/sub : les événements publiés par un worker (votes, arrivées, lecture)
+  atteignent les WebSocket / SSE ouverts sur tous les autres, et les
+  invalidations du cache de contexte sont relayées ;
+- la base (SQLite / Postgres) reste la référence : tout ce qui est dans Redis
+  peut disparaître (TTL, redémarrage) et se reconstruit depuis la base ;
+- baux (`acquire_lease`) : les tâches périodiques (rafraîchissement des
+  tokens, nettoyage des rooms) ne tournent que sur le worker qui tient le bail.
+
+Reste propre à chaque worker, même avec Redis : candidats pré-sélectionnés
+(prefetch), files de commandes par appareil (playback, donc pas de
+regroupement entre workers) et synchros de catalogue en cours (catalog).
+Ce sont des optimisations : un autre worker refait le travail sans erreur.
+L'écriture différée des votes (vote_writer) garde ses compteurs en mémoire :
+elle est refusée quand REDIS_URL est défini.
+
+Si Redis ne répond pas, on retombe sur le comportement d'un seul worker
+(état local + base) plutôt que de refuser les requêtes.
+"""
+import asyncio
+import json
+import time
+import uuid
+from typing import Optional
+
+from app.core.config import settings
+
+try:
+    import redis.asyncio as aioredis
+    from redis.exceptions import RedisError
+except ImportError:  # paquet redis absent : mode un seul worker
+    aioredis = None
+    RedisError = Exception
+
+
+# Au-delà, les événements les plus anciens en attente d'envoi sont perdus
+OUTBOX_SIZE = 10_000
+
+
+class SharedRoomState:
+    def __init__(self) -> None:
+        self.worker_id = uuid.uuid4().hex[:12]
+        self._redis = None
+        # Connexion dédiée à l'abonnement : sans délai de lecture, elle attend
+        self._subscriber = None
+        self._outbox: Optional[asyncio.Queue] = None
+        self._publisher_task: Optional[asyncio.Task] = None
+        self._listener_task: Optional[asyncio.Task] = None
+        self._hub = None
+        self._cache = None
+        self._last_warning = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self._redis is not None
+
+    # --- clés ---
+
+    def _key(self, *parts) -> str:
+        return ":".join([settings.REDIS_KEY_PREFIX, *map(str, parts)])
+
+    @property
+    def _channel(self) -> str:
+        return self._key("events")
+
+    def warn(self, message: str) -> None:
+        # Une alerte par minute au plus : Redis en panne ne doit pas noyer les logs
+        now = time.monotonic()
+        if now - self._last_warning > 60:
+            self._last_warning = now
+            print(f"⚠️  Redis : {message} (repli sur l'état local)")
+
+    # --- cycle de vie ---
+
+    async def start(self, hub, cache) -> None:
+        """
+        Se connecte à Redis et branche le relais des événements et des
+        invalidations. Sans REDIS_URL, ne fait rien.
+        """
+        if not settings.REDIS_URL:
+            return
+        if aioredis is None:
+            print("⚠️  REDIS_URL défini mais paquet redis absent : un seul worker")
+            return
+
+        pool = aioredis.BlockingConnectionPool.from_url(
+            settings.REDIS_URL,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            timeout=settings.REDIS_TIMEOUT_SECONDS,
+            socket_timeout=settings.REDIS_TIMEOUT_SECONDS,
+            decode_responses=True,
+        )
+        client = aioredis.Redis(connection_pool=pool)
+        try:
+            await client.ping()
+        except (RedisError, OSError) as e:
+            print(f"💥 Redis injoignable ({e}) : état local, un seul worker")
+            await client.aclose()
+            return
+
+        self._redis = client
+        self._subscriber = aioredis.Redis.from_url(
+            settings.REDIS_URL,
+            socket_connect_timeout=settings.REDIS_TIMEOUT_SECONDS,
+            health_check_interval=30,
+            decode_responses=True,
+        )
+        self._hub = hub
+        self._cache = cache
+        self._outbox = asyncio.Queue(maxsize=OUTBOX_SIZE)
+        hub.forward = self._forward_event
+        cache.on_invalidate = self._forward_invalidation
+        self._publisher_task = asyncio.create_task(self._publisher_loop())
+        self._listener_task = asyncio.create_task(self._listener_loop())
+        print(f"✅ Redis connecté : état partagé entre workers (worker {self.worker_id})")
+
+    async def stop(self) -> None:
+        if self._redis is None:
+            return
+        self._hub.forward = None
+        self._cache.on_invalidate = None
+
+        # Les derniers événements partent avant la fermeture
+        if self._outbox is not None and not self._outbox.empty():
+            try:
+                await asyncio.wait_for(self._outbox.join(), timeout=2)
+            except asyncio.TimeoutError:
+                pass
+
+        for task in (self._publisher_task, self._listener_task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._publisher_task = self._listener_task = None
+
+        await self._subscriber.aclose()
+        await self._redis.aclose()
+        self._redis = self._subscriber = None
+
+    # --- pub/sub ---
+
+    def _enqueue(self, message: dict) -> None:
+        message["origin"] = self.worker_id
+        if self._outbox.full():
+            self._outbox.get_nowait()
+            self._outbox.task_done()
+        self._outbox.put_nowait(message)
+
+    def _forward_event(self, event: dict) -> None:
+        self._enqueue({"kind": "event", "event": event})
+
+    def _forward_invalidation(self, scope: str, key: str) -> None:
+        self._enqueue({"kind": "invalidate", "scope": scope, "key": key})
+
+    async def _publisher_loop(self) -> None:
+        """
+        Envoie les messages dans l'ordre de publication, en un pipeline par
+        rafale.
+        """
+        while True:
+            batch = [await self._outbox.get()]
+            while not self._outbox.empty():
+                batch.append(self._outbox.get_nowait())
+            try:
+                async with self._redis.pipeline(transaction=False) as pipe:
+                    for message in batch:
+                        pipe.publish(self._channel, json.dumps(message, default=str))
+                    await pipe.execute()
+            except (RedisError, OSError) as e:
+                self.warn(f"publication impossible ({e})")
+            finally:
+                for _ in batch:
+                    self._outbox.task_done()
+
+    async def _listener_loop(self) -> None:
+        while True:
+            pubsub = self._subscriber.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self._channel)
+                # Des messages ont pu être perdus pendant la coupure
+                self._cache.clear()
+                async for message in pubsub.listen():
+                    self._handle(message)
+            except asyncio.CancelledError:
+                raise
+            except (RedisError, OSError) as e:
+                self.warn(f"abonnement perdu ({e}), reconnexion")
+                await asyncio.sleep(1)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except (RedisError, OSError):
+                    pass
+
+    def _handle(self, message: dict) -> None:
+        if message.get("type") != "message":
+            return
+        try:
+            payload = json.loads(message["data"])
+        except (TypeError, ValueError):
+            return
+        if payload.get("origin") == self.worker_id:
+            return  # déjà livré localement
+
+        if payload.get("kind") == "event":
+            self._hub.deliver(payload["event"])
+        elif payload.get("kind") == "invalidate":
+            if payload.get("scope") == "user":
+                self._cache.invalidate_user(int(payload["key"]), broadcast=False)
+            else:
+                self._cache.invalidate(payload["key"], broadcast=False)
+
+    # --- morceau en cours ---
+
+    async def set_track(self, code: str, track_uri: Optional[str], track_name: Optional[str]) -> None:
+        """
+        Nouveau morceau pour la room : les autres workers le voient au
+        prochain accès.
+        """
+        if self._redis is None:
+            return
+        room_key = self._key("room", code)
+        try:
+            async with self._redis.pipeline(transaction=True) as pipe:
+                pipe.hset(room_key, mapping={"track_uri": track_uri or "", "track_name": track_name or ""})
+                pipe.expire(room_key, settings.REDIS_ROOM_TTL_SECONDS)
+                await pipe.execute()
+        except (RedisError, OSError) as e:
+            self.warn(f"écriture du morceau impossible ({e})")
+
+    async def current_track(self, code: str) -> Optional[str]:
+        """
+        Morceau en cours d'après Redis : "" si aucun, None si inconnu.
+        """
+        if self._redis is None:
+            return None
+        try:
+            return await self._redis.hget(self._key("room", code), "track_uri")
+        except (RedisError, OSError) as e:
+            self.warn(f"lecture du morceau impossible ({e})")
+            return None
+
+    # --- lecture ---
+
+    async def set_playback(self, code: str, state: dict) -> None:
+        if self._redis is None:
+            return
+        room_key = self._key("room", code)
+        try:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                pipe.hset(room_key, "playback", json.dumps(state))
+                pipe.expire(room_key, settings.REDIS_ROOM_TTL_SECONDS)
+                await pipe.execute()
+        except (RedisError, OSError) as e:
+            self.warn(f"écriture de l'état de lecture impossible ({e})")
+
+    async def playback(self, code: str) -> Optional[dict]:
+        if self._redis is None:
+            return None
+        try:
+            state = await self._redis.hget(self._key("room", code), "playback")
+        except (RedisError, OSError) as e:
+            self.warn(f"lecture de l'état de lecture impossible ({e})")
+            return None
+        return json.loads(state) if state else None
+
+    # --- membres ---
+
+    async def load_members(self, code: str, members: dict[str, int]) -> None:
+        if self._redis is None or not members:
+            return
+        key = self._key("members", code)
+        try:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                pipe.hset(key, mapping=members)
+                pipe.expire(key, settings.REDIS_ROOM_TTL_SECONDS)
+                await pipe.execute()
+        except (RedisError, OSError) as e:
+            self.warn(f"écriture des membres impossible ({e})")
+
+    async def add_member(self, code: str, spotify_id: str, user_id: int) -> None:
+        await self.load_members(code, {spotify_id: user_id})
+
+    async def member(self, code: str, spotify_id: str) -> Optional[int]:
+        if self._redis is None:
+            return None
+        try:
+            user_id = await self._redis.hget(self._key("members", code), spotify_id)
+        except (RedisError, OSError) as e:
+            self.warn(f"lecture des membres impossible ({e})")
+            return None
+        return int(user_id) if user_id is not None else None
+
+    # --- baux des tâches périodiques ---
+
+    async def acquire_lease(self, name: str, ttl: float) -> bool:
+        """
+        Vrai si ce worker tient (ou vient de prendre) le bail `name` pour
+        `ttl` secondes : une seule tâche périodique de ce nom tourne alors
+        sur l'ensemble des workers. Sans Redis (un seul worker) ou si Redis
+        ne répond pas, chaque worker fait le travail lui-même.
+        """
+        if self._redis is None:
+            return True
+        key = self._key("lease", name)
+        ttl_ms = max(1, int(ttl * 1000))
+        try:
+            if await self._redis.set(key, self.worker_id, nx=True, px=ttl_ms):
+                return True
+            if await self._redis.get(key) == self.worker_id:
+                # Déjà à nous : on le prolonge
+                await self._redis.pexpire(key, ttl_ms)
+                return True
+            return False
+        except (RedisError, OSError) as e:
+            self.warn(f"bail {name} illisible ({e})")
+            return True
+
+    # --- fermeture ---
+
+    async def drop_room(self, code: str) -> None:
+        """
+        Oublie l'état d'une room fermée.
+        """
+        if self._redis is None:
+            return
+        try:
+            await self._redis.delete(self._key("room", code), self._key("members", code))
+        except (RedisError, OSError) as e:
+            self.warn(f"suppression impossible ({e})")
+
+
+shared_state = SharedRoomState()
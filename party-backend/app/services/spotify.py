@@ -1,8 +1,32 @@
 # app/services/spotify.py
-import requests
+import asyncio
+import bisect
 import random
+from typing import Optional
 
-def get_current_user(access_token: str) -> dict:
+from app.core.config import settings
+from app.services.spotify_gateway import spotify_gateway
+
+
+class SpotifyAPIError(Exception):
+    """
+    Erreur renvoyée par l'API Spotify pendant un parcours paginé.
+    """
+    def __init__(self, status_code: int, details: str = ""):
+        super().__init__(f"Spotify API error {status_code}")
+        self.status_code = status_code
+        self.details = details
+
+
+# Champs demandés pour un morceau de playlist
+TRACK_FIELDS = "items(track(id,uri,name,artists(name),album(name,images)))"
+
+# Tirages supplémentaires quand des positions tombent sur un morceau
+# inutilisable (local, supprimé, épisode)
+SAMPLE_REDRAW_ROUNDS = 3
+
+
+async def get_current_user(access_token: str) -> dict:
     """
     Appelle l'endpoint /me de Spotify pour récupérer le profil de l'utilisateur
     """
@@ -10,7 +34,7 @@ def get_current_user(access_token: str) -> dict:
         "Authorization": f"Bearer {access_token}"
     }
 
-    response = requests.get("https://api.spotify.com/v1/me", headers=headers)
+    response = await spotify_gateway.get("https://api.spotify.com/v1/me", headers=headers)
 
     if response.status_code != 200:
         # 🔥 CORRECTION : Gérer les réponses vides
@@ -28,80 +52,186 @@ def get_current_user(access_token: str) -> dict:
     return response.json()
 
 
-def get_user_playlists(access_token: str, limit: int = 20) -> dict:
+async def refresh_access_token(refresh_token: str) -> dict:
     """
-    Récupère les playlists de l'utilisateur connecté.
-    Pour l'instant, on ne gère pas la pagination avancée.
+    Échange le refresh_token contre un nouvel access_token.
+    Spotify peut renvoyer un nouveau refresh_token (sinon on garde l'ancien).
     """
-    headers = {
-        "Authorization": f"Bearer {access_token}"
+    data = {
+        "grant_type": "refresh_token",
+        "refresh_token": refresh_token,
+        "client_id": settings.SPOTIFY_CLIENT_ID,
+        "client_secret": settings.SPOTIFY_CLIENT_SECRET,
     }
 
-    params = {
-        "limit": limit
-    }
+    response = await spotify_gateway.post("https://accounts.spotify.com/api/token", data=data)
 
-    response = requests.get(
-        "https://api.spotify.com/v1/me/playlists",
-        headers=headers,
-        params=params
-    )
+    if response.status_code != 200:
+        return {
+            "error": "refresh_failed",
+            "status_code": response.status_code,
+            "details": response.text,
+        }
 
     return response.json()
 
 
-def get_playlist_tracks(access_token: str, playlist_id: str, limit: int = 100) -> dict:
+async def pick_random_track_from_user(access_token: str, exclude=None, attempts: int = 1) -> dict:
     """
-    Récupère les morceaux d'une playlist.
+    Choisit une musique aléatoire dans les playlists de l'utilisateur.
+    Renvoie un dict avec les infos principales du morceau.
+
+    Avec `exclude` (URI déjà jouées), on tire `attempts` candidats et on garde
+    le premier absent de `exclude` ; s'ils y sont tous, on accepte la répétition.
+    """
+    try:
+        candidates = await sample_user_tracks(access_token, attempts if exclude else 1)
+    except SpotifyAPIError as e:
+        return {"error": "spotify_api_error", "status_code": e.status_code}
+
+    if candidates is None:
+        return {"error": "no_playlists"}
+    if not candidates:
+        return {"error": "no_tracks_in_playlist"}
+    if exclude:
+        return next((c for c in candidates if c["track_uri"] not in exclude), candidates[0])
+    return candidates[0]
+
+
+async def list_user_playlists(access_token: str, concurrency: int, page_size: int = 50) -> list[dict]:
+    """
+    Toutes les playlists de l'utilisateur : la première page donne le total,
+    les suivantes sont demandées en parallèle (`concurrency` à la fois).
     """
     headers = {
         "Authorization": f"Bearer {access_token}"
     }
+    semaphore = asyncio.Semaphore(concurrency)
 
-    params = {
-        "limit": limit
-    }
+    async def fetch(offset: int) -> dict:
+        async with semaphore:
+            response = await spotify_gateway.get(
+                "https://api.spotify.com/v1/me/playlists",
+                headers=headers,
+                params={"limit": page_size, "offset": offset}
+            )
+        if response.status_code != 200:
+            raise SpotifyAPIError(response.status_code, response.text)
+        return response.json()
 
-    response = requests.get(
-        f"https://api.spotify.com/v1/playlists/{playlist_id}/tracks",
-        headers=headers,
-        params=params
-    )
+    first = await fetch(0)
+    pages = [first]
+    total = first.get("total")
+    if total is not None:
+        pages += await asyncio.gather(*(fetch(offset) for offset in range(page_size, total, page_size)))
+    elif first.get("next"):
+        # Pas de total annoncé : on suit les liens `next` après la première
+        # page, déjà lue
+        pages.append({"items": [p async for p in iter_user_playlists(access_token, page_size, offset=page_size)]})
 
-    return response.json()
+    return [p for page in pages for p in page.get("items", []) if p and p.get("id")]
 
 
-def pick_random_track_from_user(access_token: str) -> dict:
+async def sample_user_tracks(
+    access_token: str,
+    k: int,
+    concurrency: Optional[int] = None,
+) -> Optional[list[dict]]:
     """
-    Choisit une musique aléatoire dans les playlists de l'utilisateur.
-    Renvoie un dict avec les infos principales du morceau.
+    Tire jusqu'à k morceaux au hasard dans toute la bibliothèque de l'utilisateur.
+
+    Les playlists mises bout à bout forment une liste de N positions ; on tire
+    k positions distinctes uniformément dans [0, N) et on lit le seul morceau
+    de chaque position (limit=1), `concurrency` requêtes à la fois. Chaque
+    morceau de la bibliothèque a donc la même chance d'être tiré, quelle que
+    soit la taille de sa playlist. Une playlist dont le total n'est pas
+    annoncé est d'abord comptée (fields=total) : O(P + k) appels pour P
+    playlists, au lieu d'un parcours de toute la bibliothèque. Une position qui tombe sur un morceau inutilisable est
+    retirée ailleurs, SAMPLE_REDRAW_ROUNDS fois au plus.
+
+    Renvoie None si l'utilisateur n'a aucune playlist ; lève SpotifyAPIError
+    si la liste des playlists ne peut pas être lue.
     """
-    playlists_data = get_user_playlists(access_token)
+    concurrency = concurrency or settings.SPOTIFY_SAMPLE_CONCURRENCY
+    headers = {
+        "Authorization": f"Bearer {access_token}"
+    }
+    semaphore = asyncio.Semaphore(concurrency)
 
-    items = playlists_data.get("items", [])
-    if not items:
-        return {"error": "no_playlists"}
+    playlists = await list_user_playlists(access_token, concurrency)
+    if not playlists:
+        return None
 
-    # Playlist aléatoire
-    playlist = random.choice(items)
-    playlist_id = playlist["id"]
+    async def fetch(playlist_id: str, params: dict) -> Optional[dict]:
+        async with semaphore:
+            response = await spotify_gateway.get(
+                f"https://api.spotify.com/v1/playlists/{playlist_id}/tracks",
+                headers=headers,
+                params=params,
+            )
+        # Une playlist illisible ne doit pas priver la room de morceau
+        return response.json() if response.status_code == 200 else None
 
-    tracks_data = get_playlist_tracks(access_token, playlist_id)
-    tracks_items = tracks_data.get("items", [])
+    async def count(playlist: dict) -> int:
+        total = (playlist.get("tracks") or {}).get("total")
+        if total is None:
+            data = await fetch(playlist["id"], {"limit": 1, "fields": "total"})
+            total = (data or {}).get("total")
+        return total or 0
 
-    if not tracks_items:
-        return {"error": "no_tracks_in_playlist"}
+    totals = await asyncio.gather(*(count(p) for p in playlists))
+
+    # starts[i] : première position globale de la playlist i
+    starts, size = [], 0
+    for total in totals:
+        starts.append(size)
+        size += total
+    if not size:
+        return []
+
+    async def read(position: int) -> Optional[dict]:
+        index = bisect.bisect_right(starts, position) - 1
+        playlist = playlists[index]
+        data = await fetch(playlist["id"], {
+            "limit": 1,
+            "offset": position - starts[index],
+            "fields": TRACK_FIELDS,
+        })
+        items = (data or {}).get("items") or [{}]
+        track = items[0].get("track")
+        if not track or not track.get("uri"):
+            return None
+        track_info = extract_track_info(track)
+        track_info["playlist"] = {
+            "id": playlist["id"],
+            "name": playlist.get("name"),
+        }
+        return track_info
+
+    tracks: list[dict] = []
+    drawn: set[int] = set()
+    for _ in range(1 + SAMPLE_REDRAW_ROUNDS):
+        wanted = min(k - len(tracks), size - len(drawn))
+        if wanted <= 0:
+            break
+        positions = []
+        while len(positions) < wanted:
+            position = random.randrange(size)
+            if position not in drawn:
+                drawn.add(position)
+                positions.append(position)
+        tracks += [t for t in await asyncio.gather(*(read(p) for p in positions)) if t]
 
-    track_item = random.choice(tracks_items)
+    return tracks
 
-    track = track_item.get("track")
-    if not track:
-        return {"error": "invalid_track_data"}
 
-    # On extrait les infos utiles
+def extract_track_info(track: dict) -> dict:
+    """
+    Extrait les infos utiles d'un objet `track` Spotify.
+    """
     artists = ", ".join(a["name"] for a in track.get("artists", []))
 
-    images = track.get("album", {}).get("images", [])
+    images = (track.get("album") or {}).get("images", [])
     image_url = images[0]["url"] if images else None
 
     return {
@@ -109,10 +239,65 @@ def pick_random_track_from_user(access_token: str) -> dict:
         "track_uri": track.get("uri"),
         "name": track.get("name"),
         "artists": artists,
-        "album": track.get("album", {}).get("name"),
+        "album": (track.get("album") or {}).get("name"),
         "image_url": image_url,
-        "playlist": {
-            "id": playlist_id,
-            "name": playlist.get("name"),
-        },
-    }
\ No newline at end of file
+    }
+
+
+async def iter_user_playlists(access_token: str, page_size: int = 50, offset: int = 0):
+    """
+    Parcourt toutes les playlists de l'utilisateur, page par page, à partir
+    de `offset`. Chaque item contient notamment `id`, `name` et `snapshot_id`.
+    """
+    headers = {
+        "Authorization": f"Bearer {access_token}"
+    }
+
+    while True:
+        response = await spotify_gateway.get(
+            "https://api.spotify.com/v1/me/playlists",
+            headers=headers,
+            params={"limit": page_size, "offset": offset}
+        )
+        if response.status_code != 200:
+            raise SpotifyAPIError(response.status_code, response.text)
+
+        data = response.json()
+        for item in data.get("items", []):
+            yield item
+
+        if not data.get("next"):
+            return
+        offset += page_size
+
+
+async def iter_playlist_tracks(access_token: str, playlist_id: str, page_size: int = 100):
+    """
+    Parcourt tous les morceaux d'une playlist, page par page.
+    On ne demande que les champs utiles pour alléger les réponses.
+    """
+    headers = {
+        "Authorization": f"Bearer {access_token}"
+    }
+
+    offset = 0
+    while True:
+        response = await spotify_gateway.get(
+            f"https://api.spotify.com/v1/playlists/{playlist_id}/tracks",
+            headers=headers,
+            params={
+                "limit": page_size,
+                "offset": offset,
+                "fields": f"next,{TRACK_FIELDS}",
+            }
+        )
+        if response.status_code != 200:
+            raise SpotifyAPIError(response.status_code, response.text)
+
+        data = response.json()
+        for item in data.get("items", []):
+            yield item
+
+        if not data.get("next"):
+            return
+        offset += page_size
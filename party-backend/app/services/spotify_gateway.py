@@ -0,0 +1,318 @@
+# app/services/spotify_gateway.py
+"""
+Passerelle unique pour tous les appels sortants vers Spotify.
+
+- seau à jetons global + un par utilisateur (token) pour rester sous le quota ;
+- respect de `Retry-After` sur les 429 (pause globale) ;
+- GET rejoués avec un backoff exponentiel « jittered » sur 5xx / erreurs réseau ;
+- disjoncteur : après plusieurs échecs on répond tout de suite, avec la
+  dernière réponse connue pour les GET quand elle existe. Un disjoncteur
+  pour l'API et un pour accounts.spotify.com (tokens) : une panne de l'un
+  ne coupe pas l'autre.
+
+L'API imite celle de httpx (get/put/post renvoient un `httpx.Response`) pour
+que les services n'aient rien d'autre à changer.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import httpx
+
+from app.core.config import settings
+from app.services.http_client import get_http_client
+from app.services.metrics import record_spotify_call, spotify_endpoint
+from app.services.tracing import record_spotify_span
+
+
+ACCOUNTS_URL = "https://accounts.spotify.com/"
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def reserve(self) -> float:
+        """
+        Prend un jeton et renvoie le temps à attendre avant de s'en servir.
+        Le solde peut devenir négatif : les appels suivants attendent leur
+        tour, dans l'ordre d'arrivée.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, reset_seconds: float) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        # Un appel de test est en cours (état half_open)
+        self.probing = False
+
+    def allow(self) -> bool:
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_seconds:
+                return False
+            self.state = "half_open"
+        if self.state == "half_open":
+            # Un seul appel de test à la fois : les autres sont refusés
+            # jusqu'à son verdict
+            if self.probing:
+                return False
+            self.probing = True
+        return True
+
+    def end_probe(self) -> None:
+        """
+        Fin de l'appel de test, quelle qu'en soit l'issue. Sans verdict
+        (429, annulation), l'appel suivant refera le test.
+        """
+        self.probing = False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.state = "closed"
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+
+class SpotifyGateway:
+    def __init__(self) -> None:
+        self.global_bucket = TokenBucket(settings.SPOTIFY_GLOBAL_RATE, settings.SPOTIFY_GLOBAL_BURST)
+        self.user_buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+        self.breaker = CircuitBreaker(settings.SPOTIFY_BREAKER_FAILURES, settings.SPOTIFY_BREAKER_RESET_SECONDS)
+        self.accounts_breaker = CircuitBreaker(settings.SPOTIFY_BREAKER_FAILURES, settings.SPOTIFY_BREAKER_RESET_SECONDS)
+
+        # Dernière réponse 200 de chaque GET, servie quand Spotify est en panne
+        self.cache: OrderedDict[str, tuple[bytes, str]] = OrderedDict()
+
+        # Pause globale imposée par un 429 (Retry-After)
+        self.blocked_until = 0.0
+
+        self.counters = {
+            "requests": 0,
+            "in_flight": 0,
+            "queued": 0,
+            "throttled": 0,
+            "retries": 0,
+            "server_errors": 0,
+            "transport_errors": 0,
+            "breaker_rejections": 0,
+            "served_from_cache": 0,
+        }
+
+    # --- API façon httpx ---
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def put(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("PUT", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        user_key = self._user_key(kwargs.get("headers"))
+        cache_key = self._cache_key(url, kwargs.get("params"), user_key) if method == "GET" else None
+
+        breaker = self._breaker_for(url)
+        if not breaker.allow():
+            self.counters["breaker_rejections"] += 1
+            record_spotify_call(method, spotify_endpoint(url), "circuit_open", None)
+            return self._fallback(method, url, cache_key, None)
+
+        probe = breaker.probing
+        try:
+            response = await self._send(method, url, user_key, **kwargs)
+            # Un seul verdict par appel, une fois les essais épuisés : les
+            # rejeux d'un même appel ne comptent pas comme autant d'échecs
+            if response is None or response.status_code >= 500:
+                breaker.record_failure()
+            elif response.status_code != 429:
+                breaker.record_success()
+        finally:
+            if probe:
+                breaker.end_probe()
+
+        if response is None or response.status_code >= 500:
+            return self._fallback(method, url, cache_key, response)
+        if cache_key and response.status_code == 200:
+            self._store(cache_key, response)
+        return response
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            "breaker_state": self.breaker.state,
+            "accounts_breaker_state": self.accounts_breaker.state,
+            "paused_for_seconds": round(max(0.0, self.blocked_until - time.monotonic()), 2),
+            "user_buckets": len(self.user_buckets),
+            "cached_responses": len(self.cache),
+        }
+
+    # --- interne ---
+
+    def _breaker_for(self, url: str) -> CircuitBreaker:
+        return self.accounts_breaker if url.startswith(ACCOUNTS_URL) else self.breaker
+
+    async def _send(self, method: str, url: str, user_key: Optional[str], **kwargs) -> Optional[httpx.Response]:
+        """
+        Envoie la requête, avec les rejeux. Renvoie la dernière réponse
+        obtenue (None si Spotify n'a jamais répondu).
+        """
+        # Seuls les GET sont rejoués : ils sont idempotents
+        attempts = settings.SPOTIFY_MAX_RETRIES + 1 if method == "GET" else 1
+        response: Optional[httpx.Response] = None
+        endpoint = spotify_endpoint(url)
+
+        for attempt in range(attempts):
+            if attempt:
+                self.counters["retries"] += 1
+
+            await self._acquire(user_key)
+
+            self.counters["requests"] += 1
+            self.counters["in_flight"] += 1
+            started = time.perf_counter()
+            try:
+                response = await get_http_client().request(method, url, **kwargs)
+                self._record(method, endpoint, str(response.status_code), started)
+            except httpx.TransportError:
+                self._record(method, endpoint, "transport_error", started)
+                self.counters["transport_errors"] += 1
+                response = None
+                if attempt + 1 < attempts:
+                    await asyncio.sleep(self._backoff(attempt))
+                continue
+            finally:
+                self.counters["in_flight"] -= 1
+
+            if response.status_code == 429:
+                self.counters["throttled"] += 1
+                self._pause(response)
+                continue  # _acquire attendra la fin de la pause
+
+            if response.status_code >= 500:
+                self.counters["server_errors"] += 1
+                if attempt + 1 < attempts:
+                    await asyncio.sleep(self._backoff(attempt))
+                continue
+
+            return response
+
+        return response
+
+    async def _acquire(self, user_key: Optional[str]) -> None:
+        wait = max(
+            self.global_bucket.reserve(),
+            self._user_bucket(user_key).reserve() if user_key else 0.0,
+            self.blocked_until - time.monotonic(),
+        )
+        if wait <= 0:
+            return
+
+        self.counters["queued"] += 1
+        try:
+            await asyncio.sleep(wait)
+        finally:
+            self.counters["queued"] -= 1
+
+    @staticmethod
+    def _record(method: str, endpoint: str, status: str, started: float) -> None:
+        # Métriques agrégées + span de la trace en cours
+        ended = time.perf_counter()
+        record_spotify_call(method, endpoint, status, ended - started)
+        record_spotify_span(method, endpoint, status, started, ended)
+
+    def _user_bucket(self, user_key: str) -> TokenBucket:
+        bucket = self.user_buckets.get(user_key)
+        if bucket is None:
+            bucket = TokenBucket(settings.SPOTIFY_USER_RATE, settings.SPOTIFY_USER_BURST)
+            self.user_buckets[user_key] = bucket
+            while len(self.user_buckets) > settings.SPOTIFY_USER_BUCKETS_MAX:
+                self.user_buckets.popitem(last=False)
+        else:
+            self.user_buckets.move_to_end(user_key)
+        return bucket
+
+    def _pause(self, response: httpx.Response) -> None:
+        try:
+            delay = float(response.headers.get("Retry-After", "1"))
+        except ValueError:
+            delay = 1.0
+        delay = min(delay, settings.SPOTIFY_RETRY_AFTER_MAX_SECONDS)
+        self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        # Full jitter : uniforme entre 0 et base * 2^attempt
+        return random.uniform(0, settings.SPOTIFY_BACKOFF_BASE_SECONDS * (2 ** attempt))
+
+    @staticmethod
+    def _user_key(headers: Optional[dict]) -> Optional[str]:
+        authorization = (headers or {}).get("Authorization")
+        if not authorization:
+            return None
+        return hashlib.sha1(authorization.encode()).hexdigest()
+
+    @staticmethod
+    def _cache_key(url: str, params: Optional[dict], user_key: Optional[str]) -> str:
+        return json.dumps([url, sorted((params or {}).items()), user_key], default=str)
+
+    def _store(self, cache_key: str, response: httpx.Response) -> None:
+        self.cache[cache_key] = (response.content, response.headers.get("content-type", "application/json"))
+        self.cache.move_to_end(cache_key)
+        while len(self.cache) > settings.SPOTIFY_CACHE_SIZE:
+            self.cache.popitem(last=False)
+
+    def _fallback(
+        self,
+        method: str,
+        url: str,
+        cache_key: Optional[str],
+        response: Optional[httpx.Response],
+    ) -> httpx.Response:
+        """
+        Spotify indisponible : dernière réponse connue pour un GET, sinon
+        la dernière erreur reçue, sinon un 503.
+        """
+        if cache_key and cache_key in self.cache:
+            self.counters["served_from_cache"] += 1
+            content, content_type = self.cache[cache_key]
+            return httpx.Response(
+                200,
+                content=content,
+                headers={"content-type": content_type, "x-served-from-cache": "true"},
+                request=httpx.Request(method, url),
+            )
+        if response is not None:
+            return response
+        return httpx.Response(
+            503,
+            json={"error": {"status": 503, "message": "Spotify indisponible (circuit ouvert)"}},
+            request=httpx.Request(method, url),
+        )
+
+
+spotify_gateway = SpotifyGateway()
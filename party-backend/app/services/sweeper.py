@@ -0,0 +1,175 @@
+# app/services/sweeper.py
+"""
+Nettoyage des rooms inactives.
+
+Une tâche de fond marque inactive toute room sans activité (vote, arrivée,
+changement de morceau) depuis ROOM_IDLE_TIMEOUT_SECONDS : sa manche en cours
+est archivée, puis ses participants, votes et morceaux joués restants sont
+supprimés par lots de ROOM_SWEEP_BATCH_SIZE lignes, une transaction courte
+par lot, pour ne jamais garder le verrou d'écriture longtemps. Avec Redis,
+seul le worker qui tient le bail "room_sweeper" fait le passage.
+"""
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import update
+from sqlmodel import select, func, delete, or_, and_
+
+from app.core.config import settings
+from app.db.session import async_session
+from app.models.room import Room
+from app.models.room_participant import RoomParticipant
+from app.models.room_played_track import RoomPlayedTrack
+from app.models.vote import Vote
+from app.services import vote_writer
+from app.services.events import room_events
+from app.services.playback import forget_playback
+from app.services.played_tracks import forget_played
+from app.services.prefetch import invalidate_candidate
+from app.services.room_cache import room_cache
+from app.services.rounds import close_round
+from app.services.shared_state import shared_state
+
+
+_sweeper_task: Optional[asyncio.Task] = None
+_stop: Optional[asyncio.Event] = None
+
+# Bilan du dernier passage (exposé sur /debug/sweeper)
+last_sweep: dict = {}
+
+
+async def _deactivate_idle_rooms(cutoff: datetime) -> list[str]:
+    """
+    Désactive les rooms inactives, un lot à la fois. Renvoie leurs codes.
+    """
+    codes = []
+    while True:
+        if vote_writer.is_enabled():
+            # Votes en mémoire écrits avant la sélection (ils comptent comme
+            # activité) et hors de la transaction du lot
+            await vote_writer.flush_votes()
+
+        async with async_session() as session:
+            rooms = (await session.exec(
+                select(Room)
+                .where(
+                    Room.is_active == True,
+                    or_(
+                        Room.last_activity_at < cutoff,
+                        and_(Room.last_activity_at == None, Room.created_at < cutoff),
+                    ),
+                )
+                .limit(settings.ROOM_SWEEP_BATCH_SIZE)
+            )).all()
+            if not rooms:
+                return codes
+
+            for room in rooms:
+                # La manche en cours rejoint l'historique avant la purge
+                await close_round(session, room)
+                room.is_active = False
+                session.add(room)
+                await session.exec(
+                    update(Room).where(Room.id == room.id).values(version=Room.version + 1)
+                )
+            await session.commit()
+
+        for room in rooms:
+            codes.append(room.code)
+            room_cache.invalidate(room.code)
+            invalidate_candidate(room.code)
+            vote_writer.reset_tally(room.id)
+            forget_playback(room.code)
+            forget_played(room.id)
+            await shared_state.drop_room(room.code)
+            room_events.publish(room.code, "room_closed", {"reason": "inactive"})
+
+        # Laisse passer les requêtes entre deux lots
+        await asyncio.sleep(0)
+
+
+async def _purge_in_batches(model, room_column) -> int:
+    """
+    Supprime les lignes de `model` rattachées à une room inactive, par lots.
+    """
+    inactive_rooms = select(Room.id).where(Room.is_active == False)
+    purged = 0
+    while True:
+        async with async_session() as session:
+            batch = (
+                select(model.id)
+                .where(room_column.in_(inactive_rooms))
+                .limit(settings.ROOM_SWEEP_BATCH_SIZE)
+            )
+            result = await session.exec(delete(model).where(model.id.in_(batch)))
+            await session.commit()
+
+        if not result.rowcount:
+            return purged
+        purged += result.rowcount
+        await asyncio.sleep(0)
+
+
+async def sweep_inactive_rooms() -> dict:
+    """
+    Un passage complet du nettoyage. Renvoie ce qui a été récupéré.
+    """
+    started = datetime.utcnow()
+    cutoff = started - timedelta(seconds=settings.ROOM_IDLE_TIMEOUT_SECONDS)
+
+    codes = await _deactivate_idle_rooms(cutoff)
+    participants = await _purge_in_batches(RoomParticipant, RoomParticipant.room_id)
+    votes = await _purge_in_batches(Vote, Vote.room_id)
+    played_tracks = await _purge_in_batches(RoomPlayedTrack, RoomPlayedTrack.room_id)
+
+    async with async_session() as session:
+        active_rooms = (await session.exec(
+            select(func.count(Room.id)).where(Room.is_active == True)
+        )).one()
+
+    report = {
+        "rooms_deactivated": len(codes),
+        "participants_purged": participants,
+        "votes_purged": votes,
+        "played_tracks_purged": played_tracks,
+        "active_rooms": active_rooms,
+        "swept_at": started.isoformat(),
+        "duration_ms": round((datetime.utcnow() - started).total_seconds() * 1000, 1),
+    }
+    last_sweep.clear()
+    last_sweep.update(report)
+    return report
+
+
+async def _sweeper_loop() -> None:
+    while not _stop.is_set():
+        try:
+            # Avec plusieurs workers, seul le détenteur du bail nettoie
+            if await shared_state.acquire_lease("room_sweeper", settings.ROOM_SWEEP_INTERVAL_SECONDS * 2):
+                report = await sweep_inactive_rooms()
+                if any(report[key] for key in ("rooms_deactivated", "participants_purged", "votes_purged", "played_tracks_purged")):
+                    print(f"🧹 Rooms inactives nettoyées : {report}")
+        except Exception as e:
+            print(f"💥 Erreur nettoyage des rooms : {e}")
+        try:
+            await asyncio.wait_for(_stop.wait(), timeout=settings.ROOM_SWEEP_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start_room_sweeper() -> None:
+    global _sweeper_task, _stop
+    if _sweeper_task is None:
+        _stop = asyncio.Event()
+        _sweeper_task = asyncio.create_task(_sweeper_loop())
+
+
+async def stop_room_sweeper() -> None:
+    global _sweeper_task
+    if _sweeper_task is not None:
+        # Pas de cancel : annulé au milieu d'une requête, aiosqlite journalise
+        # "Exception during reset" ; le passage en cours (lots courts) se termine
+        _stop.set()
+        await _sweeper_task
+        _sweeper_task = None
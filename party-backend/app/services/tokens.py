@@ -0,0 +1,221 @@
+# app/services/tokens.py
+"""
+Rafraîchissement des tokens Spotify.
+
+Une tâche de fond renouvelle, avant leur expiration, les tokens des
+participants des rooms actives. Les routes obtiennent donc un token valide
+sans payer l'aller-retour vers Spotify. Les rafraîchissements simultanés
+d'un même utilisateur sont regroupés en un seul appel.
+
+Un refresh_token refusé n'est pas retenté à chaque passage : les essais
+s'espacent (backoff exponentiel) et s'arrêtent après
+TOKEN_REFRESH_MAX_FAILURES échecs, jusqu'à ce qu'une nouvelle connexion
+apporte un autre refresh_token.
+
+Chaque worker uvicorn lance sa propre tâche, mais avec Redis seul le
+détenteur du bail "token_refresher" fait le passage ; TOKEN_REFRESH_ENABLED=false
+la coupe complètement sur un worker.
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlmodel import select, or_
+
+from app.core.config import settings
+from app.db.session import async_session
+from app.models.room import Room
+from app.models.room_participant import RoomParticipant
+from app.models.user import SpotifyUser
+from app.services.room_cache import room_cache
+from app.services.shared_state import shared_state
+from app.services.spotify import refresh_access_token
+
+
+# En dessous de cette marge, on rafraîchit dans la requête (dernier recours)
+INLINE_REFRESH_MARGIN = timedelta(seconds=60)
+
+# Durée de vie d'un access_token Spotify, quand la réponse ne la donne pas
+DEFAULT_TOKEN_LIFETIME_SECONDS = 3600
+
+# Rafraîchissements en cours, par user_id
+_inflight: dict[int, asyncio.Task] = {}
+
+# user_id -> (refresh_token refusé, échecs consécutifs, prochain essai en time.monotonic())
+_failures: dict[int, tuple[str, int, float]] = {}
+
+# Écart maximal entre deux essais d'un refresh_token refusé
+REFRESH_BACKOFF_MAX_SECONDS = 3600
+
+_refresher_task: Optional[asyncio.Task] = None
+_stop: Optional[asyncio.Event] = None
+
+
+def token_expires_at(expires_in: Optional[int]) -> datetime:
+    """
+    Date d'expiration du token. Jamais None : un utilisateur sans date
+    serait repris par la tâche de fond à chaque passage.
+    """
+    return datetime.utcnow() + timedelta(seconds=expires_in or DEFAULT_TOKEN_LIFETIME_SECONDS)
+
+
+def _backing_off(user_id: int, refresh_token: str) -> bool:
+    """
+    Vrai si ce refresh_token a échoué récemment (ou trop souvent) : on ne
+    le renvoie pas à Spotify pour l'instant.
+    """
+    failure = _failures.get(user_id)
+    if failure is None or failure[0] != refresh_token:
+        return False
+    _, count, retry_at = failure
+    return count >= settings.TOKEN_REFRESH_MAX_FAILURES or time.monotonic() < retry_at
+
+
+def _record_failure(user_id: int, refresh_token: str, status_code) -> None:
+    failure = _failures.get(user_id)
+    count = failure[1] + 1 if failure and failure[0] == refresh_token else 1
+    delay = min(settings.TOKEN_REFRESH_INTERVAL_SECONDS * 2 ** (count - 1), REFRESH_BACKOFF_MAX_SECONDS)
+    _failures[user_id] = (refresh_token, count, time.monotonic() + delay)
+
+    if count >= settings.TOKEN_REFRESH_MAX_FAILURES:
+        print(f"🚫 Refresh du token abandonné pour user {user_id} après {count} échecs ({status_code})")
+    else:
+        print(f"⚠️  Refresh du token impossible pour user {user_id} : {status_code}, nouvel essai dans {delay} s")
+
+
+async def _load_refresh_token(user_id: int) -> Optional[str]:
+    async with async_session() as session:
+        user = await session.get(SpotifyUser, user_id)
+        return user.refresh_token if user else None
+
+
+async def _store_tokens(user_id: int, tokens: dict) -> None:
+    async with async_session() as session:
+        user = await session.get(SpotifyUser, user_id)
+        user.access_token = tokens["access_token"]
+        user.expires_in = tokens.get("expires_in")
+        user.expires_at = token_expires_at(tokens.get("expires_in"))
+        if tokens.get("refresh_token"):
+            user.refresh_token = tokens["refresh_token"]
+        session.add(user)
+        await session.commit()
+
+
+async def _refresh(user_id: int) -> Optional[str]:
+    refresh_token = await _load_refresh_token(user_id)
+    if not refresh_token or _backing_off(user_id, refresh_token):
+        return None
+
+    tokens = await refresh_access_token(refresh_token)
+    if "error" in tokens or not tokens.get("access_token"):
+        _record_failure(user_id, refresh_token, tokens.get("status_code"))
+        return None
+    _failures.pop(user_id, None)
+
+    await _store_tokens(user_id, tokens)
+
+    room_cache.invalidate_user(user_id)
+    return tokens["access_token"]
+
+
+async def refresh_user_token(user_id: int) -> Optional[str]:
+    """
+    Rafraîchit le token d'un utilisateur ; si un rafraîchissement est déjà
+    en cours pour lui, on attend celui-là au lieu d'en lancer un second.
+    """
+    task = _inflight.get(user_id)
+    if task is None:
+        task = asyncio.create_task(_refresh(user_id))
+        _inflight[user_id] = task
+        task.add_done_callback(lambda _: _inflight.pop(user_id, None))
+    return await asyncio.shield(task)
+
+
+def _needs_refresh(expires_at: Optional[datetime], margin: timedelta) -> bool:
+    return expires_at is not None and expires_at - margin <= datetime.utcnow()
+
+
+async def get_valid_access_token(user: SpotifyUser) -> Optional[str]:
+    """
+    Token utilisable tout de suite. Normalement déjà renouvelé par la tâche
+    de fond ; sinon (token sur le point d'expirer) on le rafraîchit ici.
+    """
+    if _needs_refresh(user.expires_at, INLINE_REFRESH_MARGIN) and user.refresh_token:
+        return await refresh_user_token(user.id) or user.access_token
+    return user.access_token
+
+
+async def get_valid_host_token(ctx) -> Optional[str]:
+    """
+    Même chose pour le token de l'hôte gardé dans le contexte de room.
+    """
+    if _needs_refresh(ctx.host_token_expires_at, INLINE_REFRESH_MARGIN):
+        return await refresh_user_token(ctx.host_user_id) or ctx.host_access_token
+    return ctx.host_access_token
+
+
+async def _expiring_users(limit: datetime) -> list[tuple[int, str]]:
+    async with async_session() as session:
+        return (await session.exec(
+            select(SpotifyUser.id, SpotifyUser.refresh_token)
+            .distinct()
+            .join(RoomParticipant, RoomParticipant.user_id == SpotifyUser.id)
+            .join(Room, Room.id == RoomParticipant.room_id)
+            .where(
+                Room.is_active == True,
+                SpotifyUser.refresh_token != None,
+                or_(SpotifyUser.expires_at == None, SpotifyUser.expires_at <= limit),
+            )
+        )).all()
+
+
+async def refresh_expiring_tokens() -> int:
+    """
+    Rafraîchit les tokens des participants de rooms actives qui expirent
+    dans moins de TOKEN_REFRESH_MARGIN_SECONDS. Renvoie le nombre traité.
+    Un token sans date d'expiration (compte antérieur à la colonne) est
+    repris une fois : le rafraîchissement lui en donne une.
+    """
+    limit = datetime.utcnow() + timedelta(seconds=settings.TOKEN_REFRESH_MARGIN_SECONDS)
+    users = await _expiring_users(limit)
+
+    user_ids = [user_id for user_id, refresh_token in users if not _backing_off(user_id, refresh_token)]
+    if user_ids:
+        await asyncio.gather(*(refresh_user_token(user_id) for user_id in user_ids))
+    return len(user_ids)
+
+
+async def _refresher_loop() -> None:
+    while not _stop.is_set():
+        try:
+            # Avec plusieurs workers, seul le détenteur du bail rafraîchit
+            if await shared_state.acquire_lease("token_refresher", settings.TOKEN_REFRESH_INTERVAL_SECONDS * 2):
+                count = await refresh_expiring_tokens()
+                if count:
+                    print(f"🔑 Tokens Spotify rafraîchis : {count}")
+        except Exception as e:
+            print(f"💥 Erreur refresh des tokens : {e}")
+        try:
+            await asyncio.wait_for(_stop.wait(), timeout=settings.TOKEN_REFRESH_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start_token_refresher() -> None:
+    global _refresher_task, _stop
+    if not settings.TOKEN_REFRESH_ENABLED:
+        print("⏸️  Rafraîchissement des tokens désactivé sur ce worker")
+        return
+    if _refresher_task is None:
+        _stop = asyncio.Event()
+        _refresher_task = asyncio.create_task(_refresher_loop())
+
+
+async def stop_token_refresher() -> None:
+    global _refresher_task
+    if _refresher_task is not None:
+        # Pas de cancel : on laisse le passage en cours terminer ses écritures
+        _stop.set()
+        await _refresher_task
+        _refresher_task = None
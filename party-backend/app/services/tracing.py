@@ -0,0 +1,344 @@
+# app/services/tracing.py
+"""
+Traces par requête : arbre de spans HTTP / SQL / Spotify.
+
+- le middleware ouvre une trace par requête HTTP et ajoute l'en-tête
+  `Server-Timing` (temps total, base, Spotify) ;
+- chaque requête SQL (événements curseur SQLAlchemy) et chaque appel Spotify
+  (passerelle) devient un span, rattaché au span courant ;
+- une requête qui exécute plus de TRACE_N_PLUS_ONE_THRESHOLD fois la même
+  forme de requête SQL (valeurs retirées) est signalée comme N+1 ;
+- seule une fraction des traces (TRACE_SAMPLE_RATE) garde son arbre complet,
+  mais les traces lentes ou N+1 sont toujours conservées ;
+- les dernières traces restent dans un anneau de TRACE_RING_SIZE entrées,
+  consultable sur /debug/traces.
+
+Le contexte passe par des ContextVar : les spans suivent la requête à travers
+les `await`. Le travail qui continue après la réponse n'est pas compté dans la
+requête :
+- les BackgroundTasks de FastAPI (synchro du catalogue, préchargement...)
+  s'exécutent dans une trace à part, liée à la requête par `background_of` ;
+- les tâches asyncio lancées depuis une requête passent par `create_task`,
+  qui les démarre hors de toute trace.
+"""
+import asyncio
+import contextvars
+import random
+import re
+import time
+import uuid
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from functools import lru_cache, wraps
+from typing import Optional
+
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.services.metrics import route_template
+
+
+class Span:
+    __slots__ = ("name", "kind", "start", "end", "attributes", "children")
+
+    def __init__(self, name: str, kind: str, start: float, attributes: Optional[dict] = None) -> None:
+        self.name = name
+        self.kind = kind
+        self.start = start
+        self.end: Optional[float] = None
+        self.attributes = attributes or {}
+        self.children: list["Span"] = []
+
+    def to_dict(self, origin: float) -> dict:
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round(((self.end or self.start) - self.start) * 1000, 3),
+            **({"attributes": self.attributes} if self.attributes else {}),
+            **({"children": [child.to_dict(origin) for child in self.children]} if self.children else {}),
+        }
+
+
+class Trace:
+    def __init__(self, method: str, path: str, route: str, sampled: bool, background_of: Optional[str] = None) -> None:
+        self.id = uuid.uuid4().hex[:16]
+        self.method = method
+        self.path = path
+        self.route = route
+        self.sampled = sampled
+        # Trace des tâches de fond : id de la requête qui les a lancées
+        self.background_of = background_of
+        self.started_at = datetime.utcnow()
+        name = f"{method} {route}" + (" (tâches de fond)" if background_of else "")
+        self.root = Span(name, "background" if background_of else "http", time.perf_counter())
+        self.status: Optional[int] = None
+        # Temps jusqu'à l'envoi de la réponse (hors tâches de fond)
+        self.response_ms: Optional[float] = None
+        # Totaux toujours tenus, même sans arbre (Server-Timing, N+1)
+        self.db_count = 0
+        self.db_seconds = 0.0
+        self.spotify_count = 0
+        self.spotify_seconds = 0.0
+        self.shapes: Counter = Counter()
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.root.end or time.perf_counter()
+        return round((end - self.root.start) * 1000, 3)
+
+    def n_plus_one(self) -> list[dict]:
+        threshold = settings.TRACE_N_PLUS_ONE_THRESHOLD
+        return [
+            {"statement": shape, "count": count}
+            for shape, count in self.shapes.most_common()
+            if count > threshold
+        ]
+
+    def summary(self) -> dict:
+        return {
+            "trace_id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": self.status,
+            "started_at": self.started_at.isoformat(),
+            "response_ms": self.response_ms,
+            "duration_ms": self.duration_ms,
+            "db_queries": self.db_count,
+            "db_ms": round(self.db_seconds * 1000, 3),
+            "spotify_calls": self.spotify_count,
+            "spotify_ms": round(self.spotify_seconds * 1000, 3),
+            "sampled": self.sampled,
+            "background_of": self.background_of,
+            "n_plus_one": self.n_plus_one(),
+        }
+
+    def to_dict(self) -> dict:
+        return {**self.summary(), "spans": self.root.to_dict(self.root.start)}
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+# Dernières traces conservées (les plus récentes à droite)
+_traces: deque = deque(maxlen=settings.TRACE_RING_SIZE)
+
+# (route, forme) déjà signalées dans les logs
+_reported_n_plus_one: set[tuple] = set()
+
+
+def recent_traces() -> list[Trace]:
+    return list(reversed(_traces))
+
+
+def find_trace(trace_id: str) -> Optional[Trace]:
+    return next((trace for trace in _traces if trace.id == trace_id), None)
+
+
+def _keep(trace: Trace) -> None:
+    n_plus_one = trace.n_plus_one()
+    slow = (trace.response_ms or trace.duration_ms) >= settings.TRACE_SLOW_MS
+    if not (trace.sampled or n_plus_one or slow):
+        return
+    _traces.append(trace)
+
+    for shape in n_plus_one:
+        key = (trace.route, shape["statement"])
+        if key in _reported_n_plus_one or len(_reported_n_plus_one) >= 1000:
+            continue
+        _reported_n_plus_one.add(key)
+        print(f"🐢 N+1 sur {trace.root.name} : {shape['count']}× {shape['statement'][:120]}")
+
+
+def _detach() -> None:
+    _current_trace.set(None)
+    _current_span.set(None)
+
+
+def create_task(coro) -> asyncio.Task:
+    """
+    asyncio.create_task hors de la trace courante : une tâche lancée pendant
+    une requête (file de lecture, rafraîchissement de token...) lui survit et
+    ne doit pas lui être comptée.
+    """
+    context = contextvars.copy_context()
+    context.run(_detach)
+    return context.run(asyncio.create_task, coro)
+
+
+# --- spans ---
+
+@contextmanager
+def span(name: str, kind: str = "app", **attributes):
+    """
+    Span applicatif : `with span("catalog.sync", user_id=...)`.
+    Ne coûte presque rien hors trace échantillonnée.
+    """
+    trace = _current_trace.get()
+    parent = _current_span.get()
+    if trace is None or not trace.sampled or parent is None:
+        yield None
+        return
+
+    current = Span(name, kind, time.perf_counter(), attributes)
+    parent.children.append(current)
+    token = _current_span.set(current)
+    try:
+        yield current
+    finally:
+        current.end = time.perf_counter()
+        _current_span.reset(token)
+
+
+def traced(name: str):
+    """
+    Décorateur : exécute la coroutine dans un span `name`.
+    """
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_spotify_span(method: str, endpoint: str, status: str, started: float, ended: float) -> None:
+    """
+    Ajoute un appel Spotify déjà terminé à la trace courante.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    trace.spotify_count += 1
+    trace.spotify_seconds += ended - started
+
+    parent = _current_span.get()
+    if trace.sampled and parent is not None:
+        current = Span(f"spotify {method} {endpoint}", "spotify", started, {"status": status})
+        current.end = ended
+        parent.children.append(current)
+
+
+# --- SQLAlchemy ---
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\$\d+|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def statement_shape(statement: str) -> str:
+    """
+    Forme d'une requête : valeurs et listes IN remplacées par `?`.
+    """
+    shape = _LITERALS.sub("?", statement)
+    shape = _IN_LISTS.sub("(?)", shape)
+    return _SPACES.sub(" ", shape).strip()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if _current_trace.get() is not None:
+        context._trace_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    trace = _current_trace.get()
+    started = getattr(context, "_trace_started", None)
+    if trace is None or started is None:
+        return
+    ended = time.perf_counter()
+    shape = statement_shape(statement)
+    trace.db_count += 1
+    trace.db_seconds += ended - started
+    trace.shapes[shape] += 1
+
+    parent = _current_span.get()
+    if trace.sampled and parent is not None:
+        current = Span("db", "db", started, {"statement": shape[:300]})
+        current.end = ended
+        parent.children.append(current)
+
+
+def instrument_engine(engine) -> None:
+    """
+    Branche les spans SQL sur un moteur synchrone
+    (`async_engine.sync_engine` pour le moteur asynchrone).
+    """
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# --- middleware ---
+
+def _server_timing(trace: Trace) -> bytes:
+    parts = [
+        f'app;dur={trace.response_ms:.1f}',
+        f'db;dur={trace.db_seconds * 1000:.1f};desc="{trace.db_count} SQL"',
+    ]
+    if trace.spotify_count:
+        parts.append(f'spotify;dur={trace.spotify_seconds * 1000:.1f};desc="{trace.spotify_count} appels"')
+    return ", ".join(parts).encode()
+
+
+class TracingMiddleware:
+    """
+    Middleware ASGI : une trace par requête HTTP, en-têtes `Server-Timing`
+    et `X-Trace-Id`.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        trace = Trace(
+            scope["method"],
+            scope["path"],
+            route_template(scope),
+            sampled=random.random() < settings.TRACE_SAMPLE_RATE,
+        )
+
+        background: Optional[Trace] = None
+
+        async def send_with_timing(message):
+            nonlocal background
+            if message["type"] == "http.response.start":
+                trace.status = message["status"]
+                trace.response_ms = round((time.perf_counter() - trace.root.start) * 1000, 3)
+                headers = list(message.get("headers", []))
+                headers.append((b"x-trace-id", trace.id.encode()))
+                if settings.TRACE_SERVER_TIMING:
+                    headers.append((b"server-timing", _server_timing(trace)))
+                message = {**message, "headers": headers}
+            await send(message)
+
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                # Réponse partie : les BackgroundTasks qui suivent s'exécutent
+                # dans la même tâche, on les bascule sur leur propre trace
+                trace.root.end = time.perf_counter()
+                background = Trace(
+                    trace.method, trace.path, trace.route, trace.sampled, background_of=trace.id,
+                )
+                _current_trace.set(background)
+                _current_span.set(background.root)
+
+        trace_token = _current_trace.set(trace)
+        span_token = _current_span.set(trace.root)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            now = time.perf_counter()
+            trace.root.end = trace.root.end or now
+            _current_span.reset(span_token)
+            _current_trace.reset(trace_token)
+            _keep(trace)
+            if background is not None and (background.db_count or background.spotify_count):
+                background.root.end = now
+                _keep(background)
@@ -0,0 +1,225 @@
+# app/services/vote_writer.py
+"""
+Écriture différée des votes (mode optionnel, VOTE_WRITE_BEHIND=true).
+
+Le vote est compté tout de suite dans des compteurs en mémoire et la route
+répond sans attendre la base. Une tâche de fond écrit ensuite les votes par
+lots : toutes les VOTE_FLUSH_INTERVAL_MS millisecondes ou dès
+VOTE_FLUSH_BATCH_SIZE votes, dans une seule transaction. Quand un pic de
+votes arrive, SQLite ne voit plus qu'un écrivain au lieu de dizaines.
+
+Borne de durabilité : au plus VOTE_MAX_PENDING votes non écrits (au-delà, les
+routes attendent le prochain flush) et au plus un intervalle de retard.
+Les votes restants sont écrits à l'arrêt du serveur.
+
+Chaque vote en file garde le morceau et la manche qu'il visait. Un vote
+acquitté juste avant un changement de manche (entre le flush de /next-round
+et la remise à zéro des compteurs) arrive donc en base pour une manche close :
+il est écarté explicitement au lieu d'être inséré, compté dans
+`dropped_votes` et signalé dans les logs.
+
+Les compteurs mémoire sont propres au process : ce mode vise un seul worker.
+"""
+import asyncio
+from collections import defaultdict
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.db.session import async_session
+from app.models.room import Room
+from app.models.vote import Vote
+
+
+# room_id -> [track_uri, manche, likes, dislikes] (compteurs déjà acquittés)
+_tallies: dict[int, list] = {}
+
+# Votes acquittés mais pas encore écrits, avec leur manche
+_pending: list[tuple[Vote, int]] = []
+
+_wakeup: Optional[asyncio.Event] = None
+_flushed: Optional[asyncio.Condition] = None
+_flush_lock: Optional[asyncio.Lock] = None
+_writer_task: Optional[asyncio.Task] = None
+_stopping = False
+
+# Votes écartés à l'écriture parce que leur manche était close
+dropped_votes = 0
+
+
+def is_enabled() -> bool:
+    return settings.VOTE_WRITE_BEHIND and _writer_task is not None
+
+
+async def _seed_tally(session: AsyncSession, room_id: int, track_uri: str) -> Optional[list]:
+    room = await session.get(Room, room_id)
+    if not room or room.current_track_uri != track_uri:
+        return None
+    return [track_uri, room.current_round, room.current_likes, room.current_dislikes]
+
+
+async def submit_vote(
+    session: AsyncSession,
+    room_id: int,
+    user_id: int,
+    track_uri: str,
+    is_like: bool,
+) -> Optional[tuple]:
+    """
+    Compte le vote en mémoire et le met en file d'écriture.
+    Renvoie (likes, dislikes), ou None si le morceau a changé entre-temps.
+    """
+    if len(_pending) >= settings.VOTE_MAX_PENDING:
+        # Trop de votes non écrits : on attend le prochain flush
+        _wakeup.set()
+        async with _flushed:
+            await _flushed.wait_for(lambda: len(_pending) < settings.VOTE_MAX_PENDING)
+
+    tally = _tallies.get(room_id)
+    if tally is None or tally[0] != track_uri:
+        tally = await _seed_tally(session, room_id, track_uri)
+        if tally is None:
+            return None
+        _tallies[room_id] = tally
+
+    if is_like:
+        tally[2] += 1
+    else:
+        tally[3] += 1
+
+    vote = Vote(room_id=room_id, user_id=user_id, track_uri=track_uri, is_like=is_like)
+    _pending.append((vote, tally[1]))
+    if len(_pending) >= settings.VOTE_FLUSH_BATCH_SIZE:
+        _wakeup.set()
+
+    return tally[2], tally[3]
+
+
+def current_tally(room_id: int, track_uri: Optional[str]) -> Optional[tuple]:
+    """
+    Compteurs en mémoire du morceau en cours, plus à jour que la base tant
+    que des votes attendent d'être écrits.
+    """
+    tally = _tallies.get(room_id)
+    if tally is None or track_uri is None or tally[0] != track_uri:
+        return None
+    return tally[2], tally[3]
+
+
+def reset_tally(room_id: int) -> None:
+    """
+    À appeler quand le morceau de la room change.
+    """
+    _tallies.pop(room_id, None)
+
+
+async def _write_batch(batch: list[tuple[Vote, int]]) -> int:
+    """
+    Écrit un lot de votes et les compteurs correspondants en une transaction.
+    Les votes d'une manche close (ou d'un morceau remplacé) ne sont pas
+    insérés ; renvoie leur nombre.
+    """
+    groups: dict[tuple, list[Vote]] = defaultdict(list)
+    for vote, round_number in batch:
+        groups[(vote.room_id, vote.track_uri, round_number)].append(vote)
+
+    dropped = 0
+    async with async_session() as session:
+        for (room_id, track_uri, round_number), votes in groups.items():
+            likes = sum(1 for vote in votes if vote.is_like)
+            result = await session.exec(
+                update(Room)
+                .where(
+                    Room.id == room_id,
+                    Room.current_track_uri == track_uri,
+                    Room.current_round == round_number,
+                )
+                .values(
+                    current_likes=Room.current_likes + likes,
+                    current_dislikes=Room.current_dislikes + len(votes) - likes,
+                    version=Room.version + 1,
+                    last_activity_at=datetime.utcnow(),
+                )
+            )
+            if result.rowcount == 0:
+                # La manche est close depuis l'acquittement : ces votes ne
+                # comptent plus pour personne
+                dropped += len(votes)
+                print(f"🗳️  {len(votes)} vote(s) écarté(s) pour la room {room_id} : manche {round_number} close")
+                continue
+            session.add_all(votes)
+        await session.commit()
+    return dropped
+
+
+async def flush_votes() -> int:
+    """
+    Écrit tous les votes en attente, par lots. Renvoie le nombre écrit.
+    """
+    global dropped_votes
+    if _flush_lock is None:
+        return 0
+
+    written = 0
+    async with _flush_lock:
+        while _pending:
+            batch = _pending[:settings.VOTE_FLUSH_BATCH_SIZE]
+            dropped = await _write_batch(batch)
+            del _pending[:len(batch)]
+            written += len(batch) - dropped
+            dropped_votes += dropped
+
+            async with _flushed:
+                _flushed.notify_all()
+    return written
+
+
+async def _writer_loop() -> None:
+    interval = settings.VOTE_FLUSH_INTERVAL_MS / 1000
+    while not _stopping:
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
+
+        try:
+            await flush_votes()
+        except Exception as e:
+            # Les votes restent en file, on retente au prochain tour
+            print(f"💥 Erreur écriture des votes ({len(_pending)} en attente) : {e}")
+
+
+def start_vote_writer() -> None:
+    global _writer_task, _wakeup, _flushed, _flush_lock, _stopping
+    if not settings.VOTE_WRITE_BEHIND or _writer_task is not None:
+        return
+    if settings.REDIS_URL:
+        # Compteurs et votes en attente vivent dans ce process : avec
+        # plusieurs workers, chacun aurait les siens
+        print("⚠️  VOTE_WRITE_BEHIND ignoré avec REDIS_URL : votes écrits directement")
+        return
+    _stopping = False
+    _wakeup = asyncio.Event()
+    _flushed = asyncio.Condition()
+    _flush_lock = asyncio.Lock()
+    _writer_task = asyncio.create_task(_writer_loop())
+    print(f"🗳️  Écriture différée des votes : {settings.VOTE_FLUSH_INTERVAL_MS} ms / {settings.VOTE_FLUSH_BATCH_SIZE} votes")
+
+
+async def stop_vote_writer() -> None:
+    global _writer_task, _stopping
+    if _writer_task is None:
+        return
+    # Pas de cancel : un lot en cours d'écriture doit se terminer proprement
+    _stopping = True
+    _wakeup.set()
+    await _writer_task
+    _writer_task = None
+
+    written = await flush_votes()
+    if written:
+        print(f"🗳️  Votes écrits à l'arrêt : {written}")
@@ -0,0 +1,379 @@
+# benchmarks/bench_rooms.py
+"""
+Banc de charge des routes /rooms.
+
+Démarre le backend en mémoire (ASGI, sans serveur ni réseau) sur une base
+temporaire, avec un faux Spotify branché sur le client HTTP partagé : la
+passerelle, la synchro du catalogue et la lecture tournent pour de vrai,
+seules les réponses de Spotify sont simulées.
+
+Scénario : N rooms de M participants ; chaque manche = changement de morceau,
+rafale de votes de tous les participants, pendant que chacun interroge /state
+toutes les 3 secondes.
+
+Rapport par route : nombre de requêtes, débit, p50 / p95 / p99 et requêtes SQL
+par requête HTTP ; comparaison possible avec une référence enregistrée.
+
+Usage (depuis party-backend/) :
+    python -m benchmarks.bench_rooms
+    python -m benchmarks.bench_rooms --rooms 50 --participants 20 --rounds 10
+    python -m benchmarks.bench_rooms --save-baseline benchmarks/baseline.json
+    python -m benchmarks.bench_rooms --baseline benchmarks/baseline.json --fail-on-regression
+"""
+import argparse
+import asyncio
+import contextlib
+import contextvars
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+
+# --- base temporaire : doit être en place avant d'importer l'application ---
+
+def _prepare_environment(args) -> None:
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        tmp = tempfile.mkdtemp(prefix="party-bench-")
+        os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/bench.db"
+    os.environ.setdefault("SPOTIFY_CLIENT_ID", "bench")
+    os.environ.setdefault("SPOTIFY_CLIENT_SECRET", "bench")
+    # Pas de quota côté banc : on mesure le backend, pas le rate limiting
+    os.environ.setdefault("SPOTIFY_GLOBAL_RATE", "100000")
+    os.environ.setdefault("SPOTIFY_GLOBAL_BURST", "100000")
+    os.environ.setdefault("SPOTIFY_USER_RATE", "100000")
+    os.environ.setdefault("SPOTIFY_USER_BURST", "100000")
+
+
+# --- faux Spotify ---
+
+PLAYLISTS_PER_USER = 3
+TRACKS_PER_PLAYLIST = 100
+
+
+def fake_spotify(request):
+    import httpx
+
+    path = request.url.path
+    params = dict(request.url.params)
+
+    if path == "/api/token":
+        return httpx.Response(200, json={"access_token": "bench-token", "expires_in": 3600})
+
+    if path.endswith("/me/playlists"):
+        offset, limit = int(params.get("offset", 0)), int(params.get("limit", 50))
+        items = [
+            {"id": f"pl{i}", "name": f"Playlist {i}", "snapshot_id": "s1"}
+            for i in range(offset, min(offset + limit, PLAYLISTS_PER_USER))
+        ]
+        return httpx.Response(200, json={"items": items, "total": PLAYLISTS_PER_USER, "next": None})
+
+    if path.endswith("/tracks"):
+        playlist_id = path.split("/")[-2]
+        offset, limit = int(params.get("offset", 0)), int(params.get("limit", 100))
+        items = [
+            {"track": {
+                "id": f"{playlist_id}t{i}",
+                "uri": f"spotify:track:{playlist_id}t{i}",
+                "name": f"Track {i}",
+                "artists": [{"name": "Artist"}],
+                "album": {"name": "Album", "images": [{"url": "https://i.scdn.co/image/x"}]},
+            }}
+            for i in range(offset, min(offset + limit, TRACKS_PER_PLAYLIST))
+        ]
+        return httpx.Response(200, json={"items": items, "total": TRACKS_PER_PLAYLIST, "next": None})
+
+    if path.startswith("/v1/me/player"):
+        return httpx.Response(204)
+
+    return httpx.Response(200, json={"id": "bench-user", "display_name": "Bench"})
+
+
+# --- mesure : latence et requêtes SQL par route ---
+
+_query_counter: contextvars.ContextVar = contextvars.ContextVar("bench_query_counter", default=None)
+
+
+class Recorder:
+    """
+    Enveloppe ASGI : mesure chaque requête jusqu'au dernier octet de la
+    réponse et compte les requêtes SQL exécutées pendant ce temps.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+        self.samples: dict[str, list[tuple[float, int]]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+        self.routes = {
+            route.endpoint: f"{sorted(getattr(route, 'methods', None) or ['WS'])[0]} {route.path}"
+            for route in app.routes
+            if hasattr(route, "endpoint")
+        }
+
+    def count_query(self, *_) -> None:
+        counter = _query_counter.get()
+        if counter is not None:
+            counter[0] += 1
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        counter = [0]
+        token = _query_counter.set(counter)
+        start = time.perf_counter()
+        status = [0]
+        recorded = [False]
+
+        async def timed_send(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            elif message["type"] == "http.response.body" and not message.get("more_body") and not recorded[0]:
+                recorded[0] = True
+                route = self.routes.get(scope.get("endpoint"), f"{scope['method']} {scope['path']}")
+                self.samples[route].append((time.perf_counter() - start, counter[0]))
+                if status[0] >= 400:
+                    self.errors[route] += 1
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            _query_counter.reset(token)
+
+
+# --- scénario ---
+
+async def seed_users(count: int) -> list[str]:
+    from app.db.session import async_session
+    from app.models.user import SpotifyUser
+
+    spotify_ids = [f"bench-{i}" for i in range(count)]
+    async with async_session() as session:
+        session.add_all(
+            SpotifyUser(spotify_id=spotify_id, display_name=spotify_id, access_token="bench-token")
+            for spotify_id in spotify_ids
+        )
+        await session.commit()
+    return spotify_ids
+
+
+async def warm_catalogs() -> None:
+    """
+    Synchronise les catalogues avant la mesure : on mesure le déroulé d'une
+    partie, pas la première synchro de chaque participant.
+    """
+    from app.db.session import async_session
+    from app.models.user import SpotifyUser
+    from app.services.catalog import sync_user_catalog
+    from sqlmodel import select
+
+    async with async_session() as session:
+        user_ids = (await session.exec(select(SpotifyUser.id))).all()
+    for user_id in user_ids:
+        await sync_user_catalog(user_id)
+
+
+async def run_room(client, members: list[str], args) -> None:
+    host, guests = members[0], members[1:]
+
+    response = await client.post("/rooms/", json={"host_spotify_id": host, "like_threshold": max(1, len(members) // 2)})
+    if response.status_code != 200:
+        # Déjà compté en erreur par le Recorder
+        return
+    code = response.json()["code"]
+    await asyncio.gather(*(client.post(f"/rooms/{code}/join", json={"spotify_id": g}) for g in guests))
+
+    finished = asyncio.Event()
+
+    async def poll() -> None:
+        # Décalage initial pour ne pas synchroniser tous les clients
+        await asyncio.sleep(random.uniform(0, args.poll_interval))
+        while not finished.is_set():
+            await client.get(f"/rooms/{code}/state")
+            try:
+                await asyncio.wait_for(finished.wait(), args.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    pollers = [asyncio.create_task(poll()) for _ in members]
+
+    await client.get(f"/rooms/{code}/random-track")
+    for round_index in range(args.rounds):
+        # Rafale : tout le monde vote en même temps
+        await asyncio.gather(*(
+            client.post(f"/rooms/{code}/vote", params={"spotify_id": m, "is_like": str(random.random() < 0.7).lower()})
+            for m in members
+        ))
+        await client.post(f"/rooms/{code}/play", params={"device_id": "bench-device"})
+        await asyncio.sleep(args.round_seconds)
+        if round_index + 1 < args.rounds:
+            await client.post(f"/rooms/{code}/next-round")
+
+    await client.get("/rooms/", params={"active": "true", "limit": 50})
+    finished.set()
+    await asyncio.gather(*pollers)
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    # Rang le plus proche : ceil(q·n) - 1 (round() arrondirait au pair)
+    index = min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def build_report(recorder: Recorder, elapsed: float, args) -> dict:
+    routes = {}
+    total = 0
+    for route, samples in sorted(recorder.samples.items()):
+        latencies = [s[0] * 1000 for s in samples]
+        queries = [s[1] for s in samples]
+        total += len(samples)
+        routes[route] = {
+            "requests": len(samples),
+            "errors": recorder.errors.get(route, 0),
+            "rps": round(len(samples) / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+            "queries_per_request": round(statistics.mean(queries), 2),
+        }
+    return {
+        "config": {
+            "rooms": args.rooms,
+            "participants": args.participants,
+            "rounds": args.rounds,
+            "round_seconds": args.round_seconds,
+            "poll_interval": args.poll_interval,
+            "cold_catalogs": args.cold_catalogs,
+            "database": os.environ["DATABASE_URL"].split(":", 1)[0],
+        },
+        "duration_s": round(elapsed, 2),
+        "requests": total,
+        "throughput_rps": round(total / elapsed, 1),
+        "routes": routes,
+    }
+
+
+def print_report(report: dict, baseline: dict | None, tolerance: float) -> list[str]:
+    print(f"\n⏱️  {report['requests']} requêtes en {report['duration_s']} s → {report['throughput_rps']} req/s")
+    header = f"{'route':42} {'req':>6} {'err':>4} {'rps':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'sql/req':>8}"
+    if baseline:
+        header += f" {'Δp95':>8}"
+    print(header)
+    print("-" * len(header))
+
+    if baseline and baseline.get("config") != report["config"]:
+        print("⚠️  La référence a été mesurée avec un autre scénario : comparaison indicative")
+
+    regressions = []
+    for route, stats in report["routes"].items():
+        line = (
+            f"{route:42} {stats['requests']:>6} {stats['errors']:>4} {stats['rps']:>7} "
+            f"{stats['p50_ms']:>8} {stats['p95_ms']:>8} {stats['p99_ms']:>8} {stats['queries_per_request']:>8}"
+        )
+        reference = (baseline or {}).get("routes", {}).get(route)
+        if reference:
+            delta = (stats["p95_ms"] - reference["p95_ms"]) / reference["p95_ms"] if reference["p95_ms"] else 0.0
+            line += f" {delta:>+8.0%}"
+            if delta > tolerance:
+                regressions.append(f"{route} : p95 {reference['p95_ms']} → {stats['p95_ms']} ms")
+            if stats["queries_per_request"] > reference["queries_per_request"]:
+                regressions.append(
+                    f"{route} : SQL/req {reference['queries_per_request']} → {stats['queries_per_request']}"
+                )
+        print(line)
+
+    if baseline:
+        if regressions:
+            print("\n⚠️  Régressions par rapport à la référence :")
+            for regression in regressions:
+                print(f"  - {regression}")
+        else:
+            print("\n✅ Pas de régression par rapport à la référence")
+    return regressions
+
+
+async def run(args) -> dict:
+    import httpx
+    from sqlalchemy import event
+
+    import app.services.http_client as http_client
+    from app.db.session import async_engine
+    from app.main import app
+
+    # Faux Spotify à la place du client HTTP partagé
+    http_client._client = httpx.AsyncClient(transport=httpx.MockTransport(fake_spotify))
+
+    recorder = Recorder(app)
+    event.listen(async_engine.sync_engine, "before_cursor_execute", recorder.count_query)
+
+    await app.router.startup()
+    try:
+        spotify_ids = await seed_users(args.rooms * args.participants)
+        if not args.cold_catalogs:
+            await warm_catalogs()
+        transport = httpx.ASGITransport(app=recorder, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            start = time.perf_counter()
+            await asyncio.gather(*(
+                run_room(client, spotify_ids[i * args.participants:(i + 1) * args.participants], args)
+                for i in range(args.rooms)
+            ))
+            elapsed = time.perf_counter() - start
+    finally:
+        await app.router.shutdown()
+
+    return build_report(recorder, elapsed, args)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Banc de charge des routes /rooms")
+    parser.add_argument("--rooms", type=int, default=20)
+    parser.add_argument("--participants", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--round-seconds", type=float, default=3.0)
+    parser.add_argument("--poll-interval", type=float, default=3.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--cold-catalogs", action="store_true", help="Laisse les synchros de catalogue dans la mesure")
+    parser.add_argument("--database-url", help="Par défaut : SQLite dans un dossier temporaire")
+    parser.add_argument("--output", help="Écrit le rapport JSON dans ce fichier")
+    parser.add_argument("--baseline", help="Rapport de référence à comparer")
+    parser.add_argument("--save-baseline", help="Enregistre ce passage comme référence")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Hausse de p95 tolérée (0.5 = +50 %%)")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--verbose", action="store_true", help="Affiche les logs du backend")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    _prepare_environment(args)
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+    # Les logs du backend noieraient le rapport
+    with contextlib.redirect_stdout(sys.stdout if args.verbose else open(os.devnull, "w")):
+        report = asyncio.run(run(args))
+
+    baseline = None
+    if args.baseline and Path(args.baseline).exists():
+        baseline = json.loads(Path(args.baseline).read_text())
+    regressions = print_report(report, baseline, args.tolerance)
+
+    for path in filter(None, [args.output, args.save_baseline]):
+        Path(path).write_text(json.dumps(report, indent=2) + "\n")
+        print(f"💾 Rapport écrit dans {path}")
+
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,239 @@
+# benchmarks/bench_serialization.py
+"""
+Micro-benchmark de la sérialisation des réponses des routes /rooms et /auth.
+
+Pour chaque route, on prend une réponse représentative (construite ici, sans
+base ni réseau) et on mesure seulement ce que FastAPI fait après le handler :
+
+- avant : pas de response_model -> jsonable_encoder, puis JSONResponse (json) ;
+- après : validation / sérialisation par le response_model de la route
+  (pydantic-core), puis la classe de réponse par défaut (orjson si installé).
+
+La compression gzip (GZipMiddleware) est indiquée à part : taille compressée
+et coût, pour les corps au-dessus de GZIP_MIN_SIZE.
+
+Usage (depuis party-backend/) :
+    python -m benchmarks.bench_serialization
+    python -m benchmarks.bench_serialization --participants 200 --rooms 200 --iterations 2000
+"""
+import argparse
+import asyncio
+import gzip
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+
+def _payloads(args) -> dict:
+    """
+    (méthode, gabarit de route) -> réponse du handler, aux tailles demandées.
+    """
+    now = datetime.utcnow()
+    code = "ABC123"
+
+    def iso(minutes: int) -> str:
+        return (now - timedelta(minutes=minutes)).isoformat()
+
+    participants = [
+        {
+            "user_id": i,
+            "spotify_id": f"spotify-user-{i}",
+            "display_name": f"Invité {i}",
+            "email": f"invite{i}@example.com",
+            "joined_at": iso(i),
+        }
+        for i in range(args.participants)
+    ]
+    track = {
+        "track_id": "4uLU6hMCjMI75M1A2tKUQC",
+        "track_uri": "spotify:track:4uLU6hMCjMI75M1A2tKUQC",
+        "name": "Never Gonna Give You Up",
+        "artists": "Rick Astley",
+        "album": "Whenever You Need Somebody",
+        "image_url": "https://i.scdn.co/image/ab67616d0000b273",
+        "playlist": {"id": "37i9dQZF1DXcBWIGoYBM5M", "name": "Soirée"},
+    }
+    state = {
+        "room": {"code": code, "like_threshold": 3, "is_active": True, "version": 1234, "round": 12},
+        "current_track": {
+            "uri": track["track_uri"],
+            "name": track["name"],
+            "artists": track["artists"],
+            "image_url": track["image_url"],
+        },
+        "likes": 7,
+        "dislikes": 2,
+        "playback": {
+            "status": "playing",
+            "action": "play",
+            "command_id": 42,
+            "device_id": "device-1",
+            "track_uri": track["track_uri"],
+            "applied_at": iso(0),
+        },
+    }
+
+    return {
+        ("POST", "/rooms/"): {
+            "id": 1, "code": code, "host_user_id": 1, "like_threshold": 3, "is_active": True,
+            "created_at": iso(0), "current_track_uri": None, "current_track_name": None,
+            "current_track_artists": None, "current_track_image_url": None,
+        },
+        ("GET", "/rooms/"): {
+            "rooms": [
+                {
+                    "code": f"R{i:05d}", "like_threshold": 3, "is_active": True,
+                    "participant_count": 12, "current_track_name": track["name"], "created_at": iso(i),
+                }
+                for i in range(args.rooms)
+            ],
+            "next_cursor": f"{iso(args.rooms)},{args.rooms}",
+        },
+        ("GET", "/rooms/{code}"): {
+            "id": 1, "code": code, "host_user_id": 1, "like_threshold": 3, "is_active": True, "created_at": iso(0),
+        },
+        ("POST", "/rooms/{code}/join"): {"status": "joined", "room_code": code, "user_id": 2},
+        ("GET", "/rooms/{code}/participants"): {
+            "room_code": code, "participants": participants, "next_cursor": None,
+        },
+        ("POST", "/rooms/{code}/vote"): {
+            "status": "vote_registered", "room_code": code, "track_uri": track["track_uri"],
+            "track_name": track["name"], "likes": 7, "dislikes": 2, "like_threshold": 3, "play": True,
+        },
+        ("GET", "/rooms/{code}/random-track"): {"status": "ok", "room_code": code, "track": track},
+        ("GET", "/rooms/{code}/state"): state,
+        ("GET", "/rooms/{code}/rounds"): {
+            "room_code": code,
+            "rounds": [
+                {
+                    "round_number": i, "track_uri": track["track_uri"], "track_name": track["name"],
+                    "likes": 5, "dislikes": 1, "voters": 6, "started_at": iso(i + 1), "ended_at": iso(i),
+                    "duration_seconds": 60.0,
+                }
+                for i in range(20, 0, -1)
+            ],
+            "next_cursor": None,
+        },
+        ("GET", "/rooms/{code}/snapshot"): {"version": 1234, "state": state, "participants": participants},
+        ("GET", "/rooms/{code}/next-track"): {
+            "ready_to_play": True, "track_uri": track["track_uri"], "name": track["name"],
+            "artists": track["artists"], "image_url": track["image_url"], "likes": 7, "threshold": 3,
+        },
+        ("POST", "/rooms/{code}/next-round"): {"status": "next_round_started", "room_code": code, "track": track},
+        ("POST", "/rooms/{code}/play"): {
+            "status": "queued", "action": "play", "command_id": 43, "track_uri": track["track_uri"],
+            "track_name": track["name"],
+        },
+        ("POST", "/rooms/{code}/pause"): {"status": "queued", "action": "pause", "command_id": 44, "track_uri": None},
+        ("GET", "/auth/me"): {
+            "id": 1, "spotify_id": "spotify-user-1", "display_name": "Hôte", "email": "hote@example.com",
+            "access_token": "BQD" + "x" * 200,
+        },
+    }
+
+
+def _time_per_call(func, iterations: int) -> float:
+    """
+    Meilleure moyenne (µs) sur 5 séries : écarte le bruit du reste de la machine.
+    """
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        best = min(best, (time.perf_counter() - start) / iterations)
+    return best * 1e6
+
+
+def _time_per_await(loop, func, iterations: int) -> float:
+    """
+    Idem pour une coroutine, toutes les itérations dans le même tour de boucle.
+    """
+    async def series() -> float:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await func()
+        return (time.perf_counter() - start) / iterations
+
+    return min(loop.run_until_complete(series()) for _ in range(5)) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--participants", type=int, default=50, help="participants dans /participants et /snapshot")
+    parser.add_argument("--rooms", type=int, default=50, help="rooms dans la page de /rooms/")
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    # L'application doit s'importer sans toucher à la vraie base
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+    sys.stdout, stdout = open(os.devnull, "w"), sys.stdout
+    try:
+        from fastapi.encoders import jsonable_encoder
+        from fastapi.responses import JSONResponse
+        from fastapi.routing import APIRoute, serialize_response
+
+        from app.api.responses import DefaultJSONResponse
+        from app.core.config import settings
+        from app.main import app
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    routes = {
+        (method, route.path): route
+        for route in app.routes if isinstance(route, APIRoute)
+        for method in route.methods
+    }
+    loop = asyncio.new_event_loop()
+
+    def before(route, payload):
+        if route.path == "/rooms/{code}/snapshot":
+            # Réponse construite dans le handler : seul l'encodeur s'applique
+            return lambda: JSONResponse(payload)
+        return lambda: JSONResponse(jsonable_encoder(payload))
+
+    def after(route, payload):
+        async def render():
+            if route.path == "/rooms/{code}/snapshot":
+                return DefaultJSONResponse(payload)
+            return DefaultJSONResponse(await serialize_response(
+                field=route.response_field,
+                response_content=payload,
+                exclude_none=route.response_model_exclude_none,
+                is_coroutine=True,
+            ))
+        return render
+
+    print(f"Encodeur par défaut : {DefaultJSONResponse.__name__}")
+    print(f"{'route':<38} {'octets':>8} {'avant µs':>10} {'après µs':>10} {'gain':>6} {'gzip':>14}")
+
+    total_before = total_after = 0.0
+    for (method, path), payload in _payloads(args).items():
+        route = routes[(method, path)]
+        before_us = _time_per_call(before(route, payload), args.iterations)
+        after_us = _time_per_await(loop, after(route, payload), args.iterations)
+        total_before += before_us
+        total_after += after_us
+
+        body = loop.run_until_complete(after(route, payload)()).body
+        gzip_column = "-"
+        if settings.GZIP_MIN_SIZE and len(body) >= settings.GZIP_MIN_SIZE:
+            compressed = gzip.compress(body, compresslevel=settings.GZIP_LEVEL)
+            gzip_us = _time_per_call(lambda: gzip.compress(body, compresslevel=settings.GZIP_LEVEL), args.iterations)
+            gzip_column = f"{len(compressed)} o {gzip_us:.0f}µs"
+
+        print(
+            f"{method + ' ' + path:<38} {len(body):>8} {before_us:>10.1f} {after_us:>10.1f} "
+            f"{before_us / after_us:>5.1f}x {gzip_column:>14}"
+        )
+
+    print(f"{'total':<38} {'':>8} {total_before:>10.1f} {total_after:>10.1f} {total_before / total_after:>5.1f}x")
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# tests/conftest.py
+"""
+Harnais commun des tests : celui du banc de charge (benchmarks/bench_rooms.py).
+
+Base SQLite temporaire et faux Spotify branché sur le client HTTP partagé :
+l'application tourne pour de vrai, en mémoire (ASGI, sans serveur ni réseau).
+Chaque test démarre et arrête l'application dans sa propre boucle.
+
+Lancement (depuis party-backend/) :
+    python -m pytest -q
+"""
+import argparse
+import asyncio
+import itertools
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.bench_rooms import _prepare_environment, fake_spotify  # noqa: E402
+
+# Doit précéder tout import de l'application (settings lus à l'import)
+_prepare_environment(argparse.Namespace(database_url=None))
+
+import httpx  # noqa: E402
+
+_user_ids = itertools.count()
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+class FakeSpotify:
+    """
+    Faux Spotify du banc, avec la liste des requêtes reçues et un délai
+    optionnel sur les commandes de lecture (/v1/me/player).
+    """
+
+    def __init__(self) -> None:
+        self.requests: list[httpx.Request] = []
+        self.player_delay = 0.0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if request.url.path.startswith("/v1/me/player") and self.player_delay:
+            await asyncio.sleep(self.player_delay)
+        return fake_spotify(request)
+
+    def player_calls(self) -> list[httpx.Request]:
+        return [r for r in self.requests if r.url.path.startswith("/v1/me/player")]
+
+
+@pytest.fixture
+def spotify() -> FakeSpotify:
+    return FakeSpotify()
+
+
+@pytest.fixture
+async def client(spotify):
+    import app.services.http_client as http_client
+    from app.main import app
+
+    http_client._client = httpx.AsyncClient(transport=httpx.MockTransport(spotify))
+    await app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=10) as test_client:
+            yield test_client
+    finally:
+        # Ferme aussi le moteur : ses connexions appartiennent à la boucle du test
+        await app.router.shutdown()
+
+
+async def seed_users(count: int) -> list[str]:
+    """
+    Crée `count` utilisateurs Spotify (identifiants uniques sur toute la session).
+    """
+    from app.db.session import async_session
+    from app.models.user import SpotifyUser
+
+    spotify_ids = [f"test-{next(_user_ids)}" for _ in range(count)]
+    async with async_session() as session:
+        session.add_all(
+            SpotifyUser(spotify_id=spotify_id, display_name=spotify_id, access_token="bench-token")
+            for spotify_id in spotify_ids
+        )
+        await session.commit()
+    return spotify_ids
+
+
+async def create_room(client: httpx.AsyncClient, participants: int = 1, like_threshold: int = 1) -> tuple[str, list[str]]:
+    """
+    Room de `participants` membres (l'hôte compris). Renvoie (code, spotify_ids).
+    """
+    members = await seed_users(participants)
+    response = await client.post("/rooms/", json={"host_spotify_id": members[0], "like_threshold": like_threshold})
+    assert response.status_code == 200, response.text
+    code = response.json()["code"]
+    for guest in members[1:]:
+        response = await client.post(f"/rooms/{code}/join", json={"spotify_id": guest})
+        assert response.status_code == 200, response.text
+    return code, members
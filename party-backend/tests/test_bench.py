@@ -0,0 +1,40 @@
+# tests/test_bench.py
+import json
+from pathlib import Path
+
+from benchmarks.bench_rooms import percentile, print_report
+
+BASELINE = Path(__file__).resolve().parent.parent / "benchmarks" / "baseline.json"
+
+
+def _report(p95_ms: float, queries: float) -> dict:
+    route = {
+        "requests": 10, "errors": 0, "rps": 1.0,
+        "p50_ms": 1.0, "p95_ms": p95_ms, "p99_ms": p95_ms, "queries_per_request": queries,
+    }
+    return {"config": {}, "duration_s": 1.0, "requests": 10, "throughput_rps": 10.0, "routes": {"GET /rooms/{code}/state": route}}
+
+
+def test_percentile_uses_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile(values, 99) == 99
+    assert percentile([], 95) == 0.0
+
+
+def test_regressions_are_reported_against_the_baseline():
+    baseline = _report(p95_ms=10.0, queries=2.0)
+
+    assert print_report(_report(p95_ms=14.0, queries=2.0), baseline, tolerance=0.5) == []
+    assert len(print_report(_report(p95_ms=16.0, queries=2.0), baseline, tolerance=0.5)) == 1
+    # Une requête SQL de plus par appel est une régression, même sans perte de latence
+    assert len(print_report(_report(p95_ms=10.0, queries=3.0), baseline, tolerance=0.5)) == 1
+
+
+def test_recorded_baseline_covers_the_scenario_routes():
+    baseline = json.loads(BASELINE.read_text())
+
+    assert baseline["config"]["rooms"] and baseline["config"]["participants"]
+    for route in ("POST /rooms/{code}/vote", "GET /rooms/{code}/state", "POST /rooms/{code}/next-round"):
+        assert route in baseline["routes"]
@@ -0,0 +1,24 @@
+# tests/test_metrics.py
+import pytest
+
+from conftest import create_room
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_metrics_report_routes_votes_and_rooms(client):
+    code, members = await create_room(client)
+    await client.get(f"/rooms/{code}/random-track")
+    await client.post(f"/rooms/{code}/vote", params={"spotify_id": members[0]})
+
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+
+    body = response.text
+    # Latence par gabarit de route, pas par chemin réel
+    assert 'http_request_duration_seconds_count{method="POST",route="/rooms/{code}/vote"}' in body
+    assert f"/rooms/{code}/vote" not in body
+    assert 'party_votes_total{is_like="true"}' in body
+    assert 'spotify_requests_total{method="GET"' in body
+    assert "party_active_rooms " in body
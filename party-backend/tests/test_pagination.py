@@ -0,0 +1,71 @@
+# tests/test_pagination.py
+import pytest
+
+from conftest import create_room
+
+pytestmark = pytest.mark.anyio
+
+
+async def _all_pages(client, url: str, key: str, **params) -> list[list[dict]]:
+    pages, cursor = [], None
+    while True:
+        response = await client.get(url, params={**params, **({"after": cursor} if cursor else {})})
+        assert response.status_code == 200, response.text
+        body = response.json()
+        pages.append(body[key])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+async def test_rooms_keyset_pages_cover_every_room_once(client):
+    codes = [(await create_room(client))[0] for _ in range(5)]
+
+    pages = await _all_pages(client, "/rooms/", "rooms", limit=2)
+    listed = [room["code"] for page in pages for room in page]
+
+    assert all(len(page) <= 2 for page in pages)
+    assert len(listed) == len(set(listed))
+    assert set(codes) <= set(listed)
+    # Plus récentes d'abord
+    assert [code for code in listed if code in codes] == codes[::-1]
+
+    single = (await client.get("/rooms/", params={"limit": 200})).json()
+    assert [room["code"] for room in single["rooms"]] == listed
+
+
+async def test_rooms_filter_and_participant_count(client):
+    code, _ = await create_room(client, participants=3)
+
+    rooms = (await client.get("/rooms/", params={"active": "true", "limit": 200})).json()["rooms"]
+    room = next(r for r in rooms if r["code"] == code)
+    assert room["participant_count"] == 3
+
+    inactive = (await client.get("/rooms/", params={"active": "false", "limit": 200})).json()["rooms"]
+    assert code not in {r["code"] for r in inactive}
+
+
+async def test_rooms_invalid_cursor(client):
+    response = await client.get("/rooms/", params={"after": "pas-un-curseur"})
+    assert response.status_code == 400
+
+
+async def test_participants_keyset_pages(client):
+    code, members = await create_room(client, participants=7)
+
+    pages = await _all_pages(client, f"/rooms/{code}/participants", "participants", limit=3)
+
+    assert [len(page) for page in pages] == [3, 3, 1]
+    # Ordre d'arrivée : l'hôte d'abord
+    assert [p["spotify_id"] for page in pages for p in page] == members
+
+
+async def test_participants_unpaged_and_count_only(client):
+    code, members = await create_room(client, participants=4)
+
+    body = (await client.get(f"/rooms/{code}/participants")).json()
+    assert [p["spotify_id"] for p in body["participants"]] == members
+    assert body["next_cursor"] is None
+
+    count = (await client.get(f"/rooms/{code}/participants", params={"count_only": "true"})).json()
+    assert count == {"room_code": code, "count": 4}
@@ -0,0 +1,97 @@
+# tests/test_playback.py
+import asyncio
+import json
+
+import pytest
+
+from conftest import create_room
+
+pytestmark = pytest.mark.anyio
+
+
+async def _wait_idle(timeout: float = 5) -> None:
+    from app.services import playback
+
+    async with asyncio.timeout(timeout):
+        while playback._queues:
+            await asyncio.sleep(0.01)
+
+
+async def test_superseded_commands_are_coalesced(client, spotify):
+    from app.services import playback
+
+    code, _ = await create_room(client)
+    spotify.player_delay = 0.1
+    coalesced = playback.queue_stats()["coalesced"]
+
+    def play(i: int) -> dict:
+        return playback.enqueue_playback(code, "device-coalesce", "bench-token", "play", f"spotify:track:t{i}")
+
+    # Le premier part ; les suivants s'accumulent pendant son envoi et seul
+    # le dernier reste
+    results = [play(0)]
+    await asyncio.sleep(0.02)
+    results += [play(i) for i in range(1, 5)]
+    assert [r["status"] for r in results] == ["queued"] * 5
+    await _wait_idle()
+
+    sent = [json.loads(r.content)["uris"][0] for r in spotify.player_calls()]
+    assert sent == ["spotify:track:t0", "spotify:track:t4"]
+    assert playback.queue_stats()["coalesced"] - coalesced == 3
+
+    state = await playback.playback_state(code)
+    assert state["command_id"] == results[-1]["command_id"]
+    assert state["track_uri"] == "spotify:track:t4"
+
+
+async def test_devices_have_independent_queues(client, spotify):
+    from app.services import playback
+
+    code, _ = await create_room(client)
+    spotify.player_delay = 0.05
+
+    playback.enqueue_playback(code, "device-a", "bench-token", "play", "spotify:track:a")
+    playback.enqueue_playback(code, "device-b", "bench-token", "play", "spotify:track:b")
+    await _wait_idle()
+
+    devices = sorted(r.url.params["device_id"] for r in spotify.player_calls())
+    assert devices == ["device-a", "device-b"]
+
+
+async def test_play_route_reports_the_applied_state(client, spotify):
+    code, _ = await create_room(client)
+    track_uri = (await client.get(f"/rooms/{code}/random-track")).json()["track"]["track_uri"]
+    version = (await client.get(f"/rooms/{code}/state")).json()["room"]["version"]
+
+    queued = (await client.post(f"/rooms/{code}/play", params={"device_id": "device-route"})).json()
+    assert queued["status"] == "queued"
+    await _wait_idle()
+
+    # Pause : garde le morceau lancé par le dernier play
+    await client.post(f"/rooms/{code}/pause", params={"device_id": "device-route"})
+    await _wait_idle()
+
+    state = (await client.get(f"/rooms/{code}/state")).json()
+    assert state["playback"]["action"] == "pause"
+    assert state["playback"]["track_uri"] == track_uri
+    assert state["room"]["version"] == version + 2
+
+
+async def test_pause_without_host_token_is_refused(client, spotify):
+    from sqlmodel import update
+
+    from app.db.session import async_session
+    from app.models.user import SpotifyUser
+    from app.services.room_cache import room_cache
+
+    code, members = await create_room(client)
+    async with async_session() as session:
+        await session.exec(update(SpotifyUser).where(SpotifyUser.spotify_id == members[0]).values(access_token=""))
+        await session.commit()
+    room_cache.invalidate(code)
+
+    for action in ("pause", "resume"):
+        response = await client.post(f"/rooms/{code}/{action}", params={"device_id": "device-none"})
+        assert response.status_code == 500
+        assert response.json()["detail"] == "Pas de token Spotify"
+    assert spotify.player_calls() == []
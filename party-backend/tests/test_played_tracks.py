@@ -0,0 +1,69 @@
+# tests/test_played_tracks.py
+import pytest
+from sqlmodel import select
+
+from conftest import create_room
+
+pytestmark = pytest.mark.anyio
+
+
+def test_played_tracks_is_bounded_and_ordered():
+    from app.services.played_tracks import PlayedTracks
+
+    played = PlayedTracks(max_size=3)
+    for uri in ("a", "b", "c", "d"):
+        played.add(uri)
+
+    assert len(played) == 3
+    assert "a" not in played
+    assert all(uri in played for uri in ("b", "c", "d"))
+
+    # Rejoué : repasse en dernier, c'est "c" qui sort ensuite
+    played.add("b")
+    played.add("e")
+    assert "c" not in played
+    assert all(uri in played for uri in ("b", "d", "e"))
+
+
+def test_played_tracks_default_bound(monkeypatch):
+    from app.core.config import settings
+    from app.services.played_tracks import PlayedTracks
+
+    monkeypatch.setattr(settings, "PLAYED_TRACKS_MAX", 5)
+    played = PlayedTracks(f"spotify:track:{i}" for i in range(20))
+    assert len(played) == 5
+    assert "spotify:track:19" in played and "spotify:track:14" not in played
+
+
+async def test_room_history_is_trimmed_in_the_database(client, monkeypatch):
+    from app.core.config import settings
+    from app.db.session import async_session
+    from app.models import Room, RoomPlayedTrack
+    from app.services.played_tracks import played_tracks_for
+
+    monkeypatch.setattr(settings, "PLAYED_TRACKS_MAX", 4)
+    code, _ = await create_room(client)
+
+    played = [(await client.get(f"/rooms/{code}/random-track")).json()["track"]["track_uri"]]
+    for _ in range(6):
+        played.append((await client.post(f"/rooms/{code}/next-round")).json()["track"]["track_uri"])
+
+    async with async_session() as session:
+        room = (await session.exec(select(Room).where(Room.code == code))).one()
+        rows = (await session.exec(
+            select(RoomPlayedTrack.track_uri)
+            .where(RoomPlayedTrack.room_id == room.id)
+            .order_by(RoomPlayedTrack.id)
+        )).all()
+        history = await played_tracks_for(session, room)
+
+    assert rows == played[-4:]
+    assert len(history) == 4
+    assert all(uri in history for uri in played[-4:])
+
+
+def test_played_tracks_max_keeps_at_least_one(monkeypatch):
+    from app.core.config import Settings
+
+    monkeypatch.setenv("PLAYED_TRACKS_MAX", "0")
+    assert Settings().PLAYED_TRACKS_MAX == 1
@@ -0,0 +1,74 @@
+# tests/test_prefetch.py
+import time
+
+import pytest
+from sqlmodel import select
+
+from conftest import create_room
+
+pytestmark = pytest.mark.anyio
+
+
+async def _room_and_user(code: str, spotify_id: str):
+    from app.db.session import async_session
+    from app.models.room import Room
+    from app.models.user import SpotifyUser
+
+    async with async_session() as session:
+        room_id = (await session.exec(select(Room.id).where(Room.code == code))).one()
+        user_id = (await session.exec(select(SpotifyUser.id).where(SpotifyUser.spotify_id == spotify_id))).one()
+    return room_id, user_id
+
+
+async def _take(room_id: int, code: str):
+    from app.db.session import async_session
+    from app.services.prefetch import take_candidate
+
+    async with async_session() as session:
+        return await take_candidate(session, room_id, code)
+
+
+def _offer(code: str, user_id: int, age: float = 0.0) -> dict:
+    from app.services import prefetch
+
+    track = {"track_uri": "spotify:track:prefetched"}
+    prefetch._candidates[code] = {"user_id": user_id, "track": track, "prefetched_at": time.monotonic() - age}
+    return track
+
+
+async def test_fresh_candidate_is_taken_once(client):
+    code, members = await create_room(client)
+    room_id, user_id = await _room_and_user(code, members[0])
+
+    track = _offer(code, user_id)
+    assert await _take(room_id, code) == track
+    assert await _take(room_id, code) is None
+
+
+async def test_expired_candidate_is_dropped(client):
+    from app.core.config import settings
+
+    code, members = await create_room(client)
+    room_id, user_id = await _room_and_user(code, members[0])
+
+    _offer(code, user_id, age=settings.PREFETCH_TTL_SECONDS + 1)
+    assert await _take(room_id, code) is None
+
+
+async def test_expired_candidate_is_prefetched_again(client):
+    from fastapi import BackgroundTasks
+
+    from app.core.config import settings
+    from app.services.prefetch import schedule_prefetch
+
+    code, members = await create_room(client)
+    _, user_id = await _room_and_user(code, members[0])
+
+    tasks = BackgroundTasks()
+    _offer(code, user_id)
+    schedule_prefetch(tasks, code)
+    assert tasks.tasks == []
+
+    _offer(code, user_id, age=settings.PREFETCH_TTL_SECONDS + 1)
+    schedule_prefetch(tasks, code)
+    assert len(tasks.tasks) == 1
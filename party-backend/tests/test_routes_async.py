@@ -0,0 +1,61 @@
+# tests/test_routes_async.py
+"""
+Garde-fou : les routes sont `async def`, une Session synchrone y bloquerait
+la boucle d'événements pour toutes les requêtes en cours. Seuls les scripts
+(check_users.py) ont droit au moteur synchrone.
+"""
+import inspect
+import typing
+
+from fastapi.routing import APIRoute
+from sqlalchemy import orm
+
+
+def _routers():
+    from app.api.routes.auth import router as auth_router
+    from app.api.routes.debug import router as debug_router
+    from app.api.routes.metrics import router as metrics_router
+    from app.api.routes.rooms import router as rooms_router
+
+    # Tous les routers, même ceux que la config n'inclut pas dans l'app
+    return [auth_router, rooms_router, debug_router, metrics_router]
+
+
+def _calls(dependant):
+    yield dependant.call
+    for sub in dependant.dependencies:
+        yield from _calls(sub)
+
+
+def _is_sync_session(annotation) -> bool:
+    return inspect.isclass(annotation) and issubclass(annotation, orm.Session)
+
+
+def test_routes_never_receive_a_sync_session():
+    offenders = []
+    for router in _routers():
+        for route in router.routes:
+            if not isinstance(route, APIRoute):
+                continue
+            for call in _calls(route.dependant):
+                hints = typing.get_type_hints(call)
+                if any(_is_sync_session(hint) for hint in hints.values()):
+                    offenders.append(f"{route.path} -> {call.__qualname__}")
+    assert offenders == []
+
+
+def test_session_dependency_is_async():
+    from app.db.session import get_session
+
+    assert inspect.isasyncgenfunction(get_session)
+
+
+def test_route_modules_do_not_use_the_sync_engine():
+    from app.db.session import engine
+
+    for router in _routers():
+        modules = {inspect.getmodule(route.endpoint) for route in router.routes if isinstance(route, APIRoute)}
+        for module in modules:
+            for name, value in vars(module).items():
+                assert value is not engine, f"{module.__name__}.{name}"
+                assert not _is_sync_session(value), f"{module.__name__}.{name}"
@@ -0,0 +1,188 @@
+# tests/test_shared_state.py
+"""
+État partagé entre workers (services/shared_state.py) sur un vrai Redis.
+
+Deux SharedRoomState, chacun avec son hub d'événements et son cache de
+contexte, jouent deux workers. Ignoré si redis-server n'est pas installé.
+"""
+import asyncio
+import shutil
+import socket
+import subprocess
+import time
+import uuid
+
+import pytest
+
+pytestmark = [
+    pytest.mark.anyio,
+    pytest.mark.skipif(shutil.which("redis-server") is None, reason="redis-server absent"),
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class RedisServer:
+    def __init__(self) -> None:
+        self.port = _free_port()
+        self.process = None
+
+    @property
+    def url(self) -> str:
+        return f"redis://127.0.0.1:{self.port}/0"
+
+    def start(self) -> None:
+        self.process = subprocess.Popen(
+            ["redis-server", "--port", str(self.port), "--save", "", "--appendonly", "no"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(("127.0.0.1", self.port), timeout=0.2).close()
+                return
+            except OSError:
+                time.sleep(0.05)
+        raise RuntimeError("redis-server ne démarre pas")
+
+    def stop(self) -> None:
+        self.process.terminate()
+        self.process.wait(timeout=10)
+
+
+@pytest.fixture
+def redis_server():
+    pytest.importorskip("redis")
+    server = RedisServer()
+    server.start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+async def workers(redis_server, monkeypatch):
+    from app.core.config import settings
+    from app.services.events import RoomEventHub
+    from app.services.room_cache import RoomContextCache
+    from app.services.shared_state import SharedRoomState
+
+    monkeypatch.setattr(settings, "REDIS_URL", redis_server.url)
+    monkeypatch.setattr(settings, "REDIS_KEY_PREFIX", f"test-{uuid.uuid4().hex[:8]}")
+
+    started = []
+    for _ in range(2):
+        state = SharedRoomState()
+        await state.start(RoomEventHub(), RoomContextCache(max_size=100, ttl_seconds=60))
+        assert state.enabled
+        started.append(state)
+    # Les deux abonnements doivent être actifs avant le premier message
+    await _wait_until(lambda: _relayed(started), timeout=5)
+    yield started
+    for state in started:
+        await state.stop()
+
+
+async def _wait_until(predicate, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        result = predicate()
+        if asyncio.iscoroutine(result):
+            result = await result
+        if result:
+            return
+        if time.monotonic() > deadline:
+            raise AssertionError("condition non atteinte à temps")
+        await asyncio.sleep(0.05)
+
+
+async def _relayed(workers) -> bool:
+    """
+    Vrai quand un événement publié par le premier worker atteint le second.
+    """
+    queue = workers[1]._hub.subscribe("PING00")
+    try:
+        workers[0]._hub.publish("PING00", "ping", {})
+        await asyncio.wait_for(queue.get(), timeout=0.2)
+        return True
+    except asyncio.TimeoutError:
+        return False
+    finally:
+        workers[1]._hub.unsubscribe("PING00", queue)
+
+
+def _context(code: str):
+    from app.services.room_cache import RoomContext
+
+    return RoomContext(
+        room_id=1, code=code, like_threshold=1, is_active=True,
+        current_track_uri=None, current_track_name=None,
+        host_user_id=1, host_spotify_id="host", host_access_token=None, host_token_expires_at=None,
+    )
+
+
+async def test_events_fan_out_to_other_workers(workers):
+    first, second = workers
+    local = first._hub.subscribe("ROOM01")
+    remote = second._hub.subscribe("ROOM01")
+
+    first._hub.publish("ROOM01", "vote", {"likes": 1})
+
+    for queue in (local, remote):
+        event = await asyncio.wait_for(queue.get(), timeout=2)
+        assert (event["type"], event["data"]) == ("vote", {"likes": 1})
+    # L'émetteur ne reçoit pas son propre message une seconde fois
+    await asyncio.sleep(0.2)
+    assert local.empty()
+
+
+async def test_invalidations_are_relayed(workers):
+    first, second = workers
+    second._cache.put(_context("ROOM02"))
+
+    first._cache.invalidate("ROOM02")
+
+    await _wait_until(lambda: second._cache.get("ROOM02") is None, timeout=2)
+
+
+async def test_cache_is_cleared_when_the_listener_reconnects(workers, redis_server):
+    _, second = workers
+    second._cache.put(_context("ROOM03"))
+
+    # Coupure : des invalidations ont pu être perdues pendant ce temps
+    redis_server.stop()
+    redis_server.start()
+
+    await _wait_until(lambda: second._cache.get("ROOM03") is None, timeout=10)
+    await _wait_until(lambda: _relayed(workers), timeout=10)
+
+
+async def test_track_and_members_are_shared(workers):
+    first, second = workers
+
+    await first.set_track("ROOM04", "spotify:track:a", "A")
+    await first.add_member("ROOM04", "alice", 12)
+
+    assert await second.current_track("ROOM04") == "spotify:track:a"
+    assert await second.member("ROOM04", "alice") == 12
+    assert await second.member("ROOM04", "bob") is None
+
+    # Room fermée : plus rien pour personne
+    await second.drop_room("ROOM04")
+    assert await first.current_track("ROOM04") is None
+    assert await first.member("ROOM04", "alice") is None
+
+
+async def test_periodic_task_lease_has_one_holder(workers):
+    first, second = workers
+
+    assert await first.acquire_lease("room_sweeper", 60)
+    # Le détenteur le garde, l'autre worker attend son expiration
+    assert await first.acquire_lease("room_sweeper", 60)
+    assert not await second.acquire_lease("room_sweeper", 60)
+    # Bail indépendant par tâche
+    assert await second.acquire_lease("token_refresher", 60)
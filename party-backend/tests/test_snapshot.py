@@ -0,0 +1,77 @@
+# tests/test_snapshot.py
+import asyncio
+import time
+
+import pytest
+
+from conftest import create_room
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_snapshot_etag_and_304(client):
+    code, members = await create_room(client, participants=2)
+
+    response = await client.get(f"/rooms/{code}/snapshot")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    body = response.json()
+    assert etag == f'"{code}-{body["version"]}"'
+    assert [p["spotify_id"] for p in body["participants"]] == members
+
+    response = await client.get(f"/rooms/{code}/snapshot", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.content == b""
+
+    # Comparaison faible : W/ ignoré
+    response = await client.get(f"/rooms/{code}/snapshot", headers={"If-None-Match": f"W/{etag}"})
+    assert response.status_code == 304
+
+
+async def test_snapshot_etag_changes_with_the_room(client):
+    code, _ = await create_room(client)
+    etag = (await client.get(f"/rooms/{code}/snapshot")).headers["etag"]
+
+    guest = (await create_room(client))[1][0]
+    await client.post(f"/rooms/{code}/join", json={"spotify_id": guest})
+
+    response = await client.get(f"/rooms/{code}/snapshot", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+async def test_snapshot_long_poll_returns_on_change(client):
+    code, members = await create_room(client)
+    await client.get(f"/rooms/{code}/random-track")
+    etag = (await client.get(f"/rooms/{code}/snapshot")).headers["etag"]
+
+    async def vote_later():
+        await asyncio.sleep(0.2)
+        await client.post(f"/rooms/{code}/vote", params={"spotify_id": members[0]})
+
+    started = time.perf_counter()
+    response, _ = await asyncio.gather(
+        client.get(f"/rooms/{code}/snapshot", params={"wait": 5}, headers={"If-None-Match": etag}),
+        vote_later(),
+    )
+
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()["state"]["likes"] == 1
+    assert time.perf_counter() - started < 4
+
+
+async def test_snapshot_long_poll_times_out_with_304(client):
+    code, _ = await create_room(client)
+    etag = (await client.get(f"/rooms/{code}/snapshot")).headers["etag"]
+
+    started = time.perf_counter()
+    response = await client.get(f"/rooms/{code}/snapshot", params={"wait": 0.3}, headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert time.perf_counter() - started >= 0.3
+
+
+async def test_snapshot_unknown_room(client):
+    assert (await client.get("/rooms/NOPE00/snapshot")).status_code == 404
@@ -0,0 +1,67 @@
+# tests/test_spotify_gateway.py
+import httpx
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+API_URL = "https://api.spotify.com/v1/me"
+TOKEN_URL = "https://accounts.spotify.com/api/token"
+
+
+@pytest.fixture
+def gateway(monkeypatch):
+    import app.services.http_client as http_client
+    from app.core.config import settings
+    from app.services.spotify_gateway import SpotifyGateway
+
+    monkeypatch.setattr(settings, "SPOTIFY_BACKOFF_BASE_SECONDS", 0.0)
+    monkeypatch.setattr(settings, "SPOTIFY_MAX_RETRIES", 3)
+    monkeypatch.setattr(settings, "SPOTIFY_BREAKER_FAILURES", 2)
+
+    gateway = SpotifyGateway()
+    gateway.status_code = 500
+    gateway.calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        gateway.calls.append(request)
+        return httpx.Response(gateway.status_code, json={})
+
+    monkeypatch.setattr(http_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    return gateway
+
+
+async def test_retries_count_as_a_single_breaker_failure(gateway):
+    response = await gateway.get(API_URL)
+
+    assert response.status_code == 500
+    assert len(gateway.calls) == 4
+    assert gateway.breaker.failures == 1
+    assert gateway.breaker.state == "closed"
+
+    await gateway.get(API_URL)
+    assert gateway.breaker.state == "open"
+
+
+async def test_token_endpoint_has_its_own_breaker(gateway):
+    await gateway.post(TOKEN_URL, data={})
+    await gateway.post(TOKEN_URL, data={})
+
+    assert gateway.accounts_breaker.state == "open"
+    assert gateway.breaker.state == "closed"
+
+    gateway.status_code = 200
+    assert (await gateway.get(API_URL)).status_code == 200
+    assert (await gateway.post(TOKEN_URL, data={})).status_code == 503
+
+
+async def test_half_open_breaker_lets_one_probe_through(gateway):
+    breaker = gateway.breaker
+    breaker.state, breaker.opened_at = "open", 0.0
+
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.end_probe()
+
+    gateway.status_code = 200
+    assert (await gateway.get(API_URL)).status_code == 200
+    assert breaker.state == "closed"
@@ -0,0 +1,111 @@
+# tests/test_spotify_sampling.py
+"""
+Tirage direct dans la bibliothèque Spotify (sample_user_tracks) : bornes et
+uniformité par morceau, sur un faux Spotify aux playlists de tailles inégales.
+"""
+from collections import Counter
+
+import httpx
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+# Playlist -> nombre de morceaux ; "b" contient un morceau supprimé, "c"
+# n'annonce pas son total
+PLAYLISTS = {"a": 1, "b": 10, "c": 250}
+REMOVED = ("b", 5)
+
+
+def _library(request: httpx.Request) -> httpx.Response:
+    params = dict(request.url.params)
+    if request.url.path.endswith("/me/playlists"):
+        items = [
+            {"id": pid, "name": pid, "tracks": {} if pid == "c" else {"total": total}}
+            for pid, total in PLAYLISTS.items()
+        ]
+        return httpx.Response(200, json={"items": items, "total": len(items), "next": None})
+
+    playlist_id = request.url.path.split("/")[-2]
+    if params.get("fields") == "total":
+        return httpx.Response(200, json={"total": PLAYLISTS[playlist_id]})
+
+    offset, limit = int(params.get("offset", 0)), int(params.get("limit", 100))
+    items = [
+        {"track": None if (playlist_id, i) == REMOVED else {
+            "id": f"{playlist_id}{i}",
+            "uri": f"spotify:track:{playlist_id}{i}",
+            "name": f"Track {i}",
+            "artists": [{"name": "Artist"}],
+            "album": {"name": "Album", "images": []},
+        }}
+        for i in range(offset, min(offset + limit, PLAYLISTS[playlist_id]))
+    ]
+    return httpx.Response(200, json={"items": items})
+
+
+@pytest.fixture
+async def library():
+    import app.services.http_client as http_client
+
+    previous = http_client._client
+    http_client._client = httpx.AsyncClient(transport=httpx.MockTransport(_library))
+    yield
+    await http_client._client.aclose()
+    http_client._client = previous
+
+
+async def test_sample_is_bounded_and_distinct(library):
+    from app.services.spotify import sample_user_tracks
+
+    tracks = await sample_user_tracks("token", 5)
+    assert len(tracks) == 5
+    assert len({t["track_uri"] for t in tracks}) == 5
+
+    # Plus que la bibliothèque : tous les morceaux utilisables, une fois chacun
+    everything = await sample_user_tracks("token", 1000)
+    usable = sum(PLAYLISTS.values()) - 1
+    assert len(everything) == usable
+    assert len({t["track_uri"] for t in everything}) == usable
+    assert "spotify:track:b5" not in {t["track_uri"] for t in everything}
+
+
+async def test_sample_is_uniform_per_track(library):
+    from app.services.spotify import sample_user_tracks
+
+    draws = 2000
+    per_playlist = Counter()
+    for _ in range(draws):
+        (track,) = await sample_user_tracks("token", 1)
+        per_playlist[track["playlist"]["id"]] += 1
+
+    # Chaque morceau a la même chance : une playlist pèse son nombre de morceaux
+    usable = {"a": 1, "b": 9, "c": 250}
+    total = sum(usable.values())
+    for playlist_id, count in usable.items():
+        expected = draws * count / total
+        assert abs(per_playlist[playlist_id] - expected) <= 5 * (expected ** 0.5) + 2
+
+
+async def test_playlists_without_total_read_each_page_once():
+    import app.services.http_client as http_client
+    from app.services.spotify import list_user_playlists
+
+    offsets = []
+
+    def pages(request: httpx.Request) -> httpx.Response:
+        offset = int(request.url.params["offset"])
+        offsets.append(offset)
+        items = [{"id": f"p{i}", "name": f"p{i}"} for i in range(offset, min(offset + 2, 5))]
+        # Pas de "total" : seul le lien `next` indique la suite
+        return httpx.Response(200, json={"items": items, "next": "more" if offset + 2 < 5 else None})
+
+    previous = http_client._client
+    http_client._client = httpx.AsyncClient(transport=httpx.MockTransport(pages))
+    try:
+        playlists = await list_user_playlists("token", concurrency=2, page_size=2)
+    finally:
+        await http_client._client.aclose()
+        http_client._client = previous
+
+    assert [p["id"] for p in playlists] == ["p0", "p1", "p2", "p3", "p4"]
+    assert offsets == [0, 2, 4]
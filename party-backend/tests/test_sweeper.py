@@ -0,0 +1,63 @@
+# tests/test_sweeper.py
+from datetime import datetime, timedelta
+
+import pytest
+from sqlmodel import func, select, update
+
+from conftest import create_room, seed_users
+
+pytestmark = pytest.mark.anyio
+
+
+async def _make_idle(code: str) -> None:
+    from app.core.config import settings
+    from app.db.session import async_session
+    from app.models.room import Room
+
+    idle_since = datetime.utcnow() - timedelta(seconds=settings.ROOM_IDLE_TIMEOUT_SECONDS + 60)
+    async with async_session() as session:
+        await session.exec(update(Room).where(Room.code == code).values(last_activity_at=idle_since))
+        await session.commit()
+
+
+async def _participants(code: str) -> int:
+    from app.db.session import async_session
+    from app.models.room import Room
+    from app.models.room_participant import RoomParticipant
+
+    async with async_session() as session:
+        room_id = (await session.exec(select(Room.id).where(Room.code == code))).one()
+        return (await session.exec(
+            select(func.count(RoomParticipant.id)).where(RoomParticipant.room_id == room_id)
+        )).one()
+
+
+async def test_idle_room_is_closed_and_purged(client):
+    from app.services.sweeper import sweep_inactive_rooms
+
+    code, members = await create_room(client, participants=3)
+    await client.get(f"/rooms/{code}/random-track")
+    await client.post(f"/rooms/{code}/vote", params={"spotify_id": members[0]})
+    await _make_idle(code)
+
+    report = await sweep_inactive_rooms()
+    assert report["rooms_deactivated"] >= 1
+    assert await _participants(code) == 0
+
+    state = (await client.get(f"/rooms/{code}/state")).json()
+    assert state["room"]["is_active"] is False
+    # La manche en cours a rejoint l'historique avant la purge
+    assert (await client.get(f"/rooms/{code}/rounds")).json()["rounds"][0]["likes"] == 1
+
+    newcomer = (await seed_users(1))[0]
+    response = await client.post(f"/rooms/{code}/join", json={"spotify_id": newcomer})
+    assert response.status_code == 410
+
+
+async def test_active_room_is_kept(client):
+    from app.services.sweeper import sweep_inactive_rooms
+
+    code, _ = await create_room(client, participants=2)
+    await sweep_inactive_rooms()
+
+    assert await _participants(code) == 2
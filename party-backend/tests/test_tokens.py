@@ -0,0 +1,71 @@
+# tests/test_tokens.py
+import pytest
+from sqlmodel import select
+
+from conftest import create_room
+
+pytestmark = pytest.mark.anyio
+
+
+async def _set_user(spotify_id: str, **values) -> None:
+    from app.db.session import async_session
+    from app.models.user import SpotifyUser
+
+    async with async_session() as session:
+        user = (await session.exec(select(SpotifyUser).where(SpotifyUser.spotify_id == spotify_id))).one()
+        for key, value in values.items():
+            setattr(user, key, value)
+        session.add(user)
+        await session.commit()
+
+
+async def _get_user(spotify_id: str):
+    from app.db.session import async_session
+    from app.models.user import SpotifyUser
+
+    async with async_session() as session:
+        return (await session.exec(select(SpotifyUser).where(SpotifyUser.spotify_id == spotify_id))).one()
+
+
+async def test_token_without_expiry_is_refreshed_once(client):
+    from app.services import tokens
+
+    _, members = await create_room(client)
+    await _set_user(members[0], access_token="stale-token", refresh_token="refresh-1", expires_at=None)
+
+    assert await tokens.refresh_expiring_tokens() == 1
+    user = await _get_user(members[0])
+    assert user.access_token == "bench-token"
+    assert user.expires_at is not None
+
+    # Date d'expiration renseignée : plus rien à faire au passage suivant
+    assert await tokens.refresh_expiring_tokens() == 0
+
+
+async def test_refused_refresh_token_backs_off(client, monkeypatch):
+    from app.services import tokens
+
+    _, members = await create_room(client)
+    await _set_user(members[0], refresh_token="refresh-refused", expires_at=None)
+
+    sent = []
+
+    async def refuse(refresh_token):
+        sent.append(refresh_token)
+        return {"error": "refresh_failed", "status_code": 400}
+
+    monkeypatch.setattr(tokens, "refresh_access_token", refuse)
+
+    assert await tokens.refresh_expiring_tokens() == 1
+    # Essai suivant repoussé : le token refusé n'est pas renvoyé à Spotify
+    assert await tokens.refresh_expiring_tokens() == 0
+    assert sent == ["refresh-refused"]
+
+
+def test_token_expiry_defaults_to_spotify_lifetime():
+    from datetime import datetime, timedelta
+
+    from app.services.tokens import token_expires_at
+
+    expires_at = token_expires_at(None)
+    assert timedelta(minutes=59) < expires_at - datetime.utcnow() <= timedelta(hours=1)
@@ -0,0 +1,45 @@
+# tests/test_tracing.py
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+def test_statement_shape_collapses_literals_and_in_lists():
+    from app.services.tracing import statement_shape
+
+    first = statement_shape("SELECT * FROM votes WHERE room_id = 12 AND track_uri = 'spotify:track:a' AND id IN (?, ?, ?)")
+    second = statement_shape("SELECT *  FROM votes\nWHERE room_id = 7 AND track_uri = 'it''s' AND id IN (?, ?)")
+    assert first == second == "SELECT * FROM votes WHERE room_id = ? AND track_uri = ? AND id IN (?)"
+
+
+def test_repeated_statement_is_flagged_as_n_plus_one():
+    from app.core.config import settings
+    from app.services.tracing import Trace
+
+    trace = Trace("GET", "/rooms/ABC123", "/rooms/{code}", sampled=False)
+    trace.shapes["SELECT x FROM t WHERE id = ?"] = settings.TRACE_N_PLUS_ONE_THRESHOLD + 1
+    trace.shapes["SELECT y FROM u"] = 1
+
+    assert [shape["statement"] for shape in trace.n_plus_one()] == ["SELECT x FROM t WHERE id = ?"]
+
+
+async def test_created_task_runs_outside_the_current_trace():
+    from app.services import tracing
+
+    trace = tracing.Trace("POST", "/rooms/ABC123/play", "/rooms/{code}/play", sampled=True)
+    token = tracing._current_trace.set(trace)
+    try:
+        inside = await tracing.create_task(_current_trace_of(tracing))
+    finally:
+        tracing._current_trace.reset(token)
+
+    assert inside is None
+
+
+async def _current_trace_of(tracing):
+    return tracing._current_trace.get()
+
+
+async def test_debug_routes_are_not_mounted_without_a_token(client):
+    response = await client.get("/debug/spotify")
+    assert response.status_code == 404
@@ -0,0 +1,194 @@
+# tests/test_votes.py
+import pytest
+from sqlmodel import func, select, update
+
+from conftest import create_room, seed_users
+
+pytestmark = pytest.mark.anyio
+
+
+async def _vote(client, code: str, spotify_id: str, is_like: bool = True):
+    return await client.post(f"/rooms/{code}/vote", params={"spotify_id": spotify_id, "is_like": str(is_like).lower()})
+
+
+async def test_votes_are_counted_until_threshold(client):
+    code, members = await create_room(client, participants=4, like_threshold=2)
+    track_uri = (await client.get(f"/rooms/{code}/random-track")).json()["track"]["track_uri"]
+
+    first = (await _vote(client, code, members[0])).json()
+    assert (first["likes"], first["dislikes"], first["play"]) == (1, 0, False)
+    assert first["track_uri"] == track_uri
+
+    await _vote(client, code, members[1], is_like=False)
+    last = (await _vote(client, code, members[2])).json()
+    assert (last["likes"], last["dislikes"], last["play"]) == (2, 1, True)
+
+    state = (await client.get(f"/rooms/{code}/state")).json()
+    assert (state["likes"], state["dislikes"]) == (2, 1)
+
+
+async def test_vote_requires_a_track_and_a_participant(client):
+    code, members = await create_room(client)
+    assert (await _vote(client, code, members[0])).status_code == 400
+
+    await client.get(f"/rooms/{code}/random-track")
+    outsider = (await seed_users(1))[0]
+    assert (await _vote(client, code, outsider)).status_code == 403
+    assert (await _vote(client, "NOPE00", members[0])).status_code == 404
+
+
+async def test_next_round_archives_the_round(client):
+    code, members = await create_room(client, participants=3)
+    first_track = (await client.get(f"/rooms/{code}/random-track")).json()["track"]["track_uri"]
+    await _vote(client, code, members[0])
+    await _vote(client, code, members[1])
+    await _vote(client, code, members[2], is_like=False)
+
+    response = (await client.post(f"/rooms/{code}/next-round")).json()
+    assert response["status"] == "next_round_started"
+    assert response["track"]["track_uri"] != first_track
+
+    state = (await client.get(f"/rooms/{code}/state")).json()
+    assert (state["likes"], state["dislikes"]) == (0, 0)
+    assert state["room"]["round"] == 2
+
+    rounds = (await client.get(f"/rooms/{code}/rounds")).json()["rounds"]
+    assert len(rounds) == 1
+    archived = rounds[0]
+    assert archived["round_number"] == 1
+    assert archived["track_uri"] == first_track
+    assert (archived["likes"], archived["dislikes"], archived["voters"]) == (2, 1, 3)
+
+
+async def test_failed_pick_keeps_the_round(client, monkeypatch):
+    import app.api.routes.rooms as rooms
+    from app.services import prefetch
+
+    code, members = await create_room(client)
+    track_uri = (await client.get(f"/rooms/{code}/random-track")).json()["track"]["track_uri"]
+    await _vote(client, code, members[0])
+
+    async def no_track(*args, **kwargs):
+        return {"error": "no_tracks_in_playlist"}
+
+    monkeypatch.setattr(rooms, "pick_track_for_user", no_track)
+    prefetch.invalidate_candidate(code)
+
+    response = (await client.post(f"/rooms/{code}/next-round")).json()
+    assert response == {"status": "error", "room_code": code, "error": "no_tracks_in_playlist"}
+
+    state = (await client.get(f"/rooms/{code}/state")).json()
+    assert state["current_track"]["uri"] == track_uri
+    assert state["likes"] == 1
+    assert state["room"]["round"] == 1
+    assert (await client.get(f"/rooms/{code}/rounds")).json()["rounds"] == []
+
+
+async def _room_votes(code: str) -> int:
+    from app.db.session import async_session
+    from app.models.room import Room
+    from app.models.vote import Vote
+
+    async with async_session() as session:
+        room_id = (await session.exec(select(Room.id).where(Room.code == code))).one()
+        return (await session.exec(select(func.count(Vote.id)).where(Vote.room_id == room_id))).one()
+
+
+async def _change_room_behind_the_cache(code: str, **values) -> None:
+    from app.db.session import async_session
+    from app.models.room import Room
+
+    # Changement de morceau ou de manche sans passer par les routes (autre worker)
+    async with async_session() as session:
+        await session.exec(update(Room).where(Room.code == code).values(**values))
+        await session.commit()
+
+
+async def test_vote_on_a_changed_track_is_rejected(client):
+    code, members = await create_room(client)
+    await client.get(f"/rooms/{code}/random-track")
+    assert (await _vote(client, code, members[0])).status_code == 200
+
+    await _change_room_behind_the_cache(code, current_track_uri="spotify:track:other")
+
+    response = await _vote(client, code, members[0])
+    assert response.status_code == 409
+    assert await _room_votes(code) == 1
+
+
+@pytest.fixture
+def write_behind(monkeypatch):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "VOTE_WRITE_BEHIND", True)
+    # Pas de flush périodique pendant le test : on le déclenche à la main
+    monkeypatch.setattr(settings, "VOTE_FLUSH_INTERVAL_MS", 60_000)
+
+
+async def test_write_behind_votes_are_written_on_flush(write_behind, client):
+    from app.services import vote_writer
+
+    code, members = await create_room(client, participants=2, like_threshold=2)
+    await client.get(f"/rooms/{code}/random-track")
+    await _vote(client, code, members[0])
+    last = (await _vote(client, code, members[1], is_like=False)).json()
+    assert (last["likes"], last["dislikes"]) == (1, 1)
+    assert await _room_votes(code) == 0
+
+    assert await vote_writer.flush_votes() == 2
+    assert await _room_votes(code) == 2
+
+
+async def test_write_behind_drops_votes_for_a_replaced_track(write_behind, client):
+    from app.services import vote_writer
+
+    code, members = await create_room(client)
+    await client.get(f"/rooms/{code}/random-track")
+    assert (await _vote(client, code, members[0])).status_code == 200
+
+    # Vote acquitté, puis le morceau change avant l'écriture
+    await _change_room_behind_the_cache(code, current_track_uri="spotify:track:other")
+    dropped_before = vote_writer.dropped_votes
+
+    assert await vote_writer.flush_votes() == 0
+    assert vote_writer.dropped_votes == dropped_before + 1
+    assert await _room_votes(code) == 0
+
+
+async def test_write_behind_drops_votes_of_a_closed_round(write_behind, client):
+    from app.models.room import Room
+    from app.services import vote_writer
+
+    code, members = await create_room(client)
+    await client.get(f"/rooms/{code}/random-track")
+    assert (await _vote(client, code, members[0])).status_code == 200
+
+    # Même morceau, mais la manche a été close entre-temps
+    await _change_room_behind_the_cache(code, current_round=Room.current_round + 1)
+    dropped_before = vote_writer.dropped_votes
+
+    assert await vote_writer.flush_votes() == 0
+    assert vote_writer.dropped_votes == dropped_before + 1
+
+
+async def test_write_behind_votes_are_archived_by_next_round(write_behind, client):
+    code, members = await create_room(client, participants=2)
+    await client.get(f"/rooms/{code}/random-track")
+    await _vote(client, code, members[0])
+    await _vote(client, code, members[1], is_like=False)
+
+    assert (await client.post(f"/rooms/{code}/next-round")).json()["status"] == "next_round_started"
+
+    archived = (await client.get(f"/rooms/{code}/rounds")).json()["rounds"][0]
+    assert (archived["likes"], archived["dislikes"], archived["voters"]) == (1, 1, 2)
+
+
+async def test_write_behind_is_refused_with_redis(write_behind, monkeypatch):
+    from app.core.config import settings
+    from app.services import vote_writer
+
+    # Compteurs par process : incompatibles avec plusieurs workers
+    monkeypatch.setattr(settings, "REDIS_URL", "redis://127.0.0.1:1/0")
+    vote_writer.start_vote_writer()
+
+    assert not vote_writer.is_enabled()
@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
-import { roomService } from '../services/api';
+import { roomService, subscribeToRoom } from '../services/api';
 import SpotifyPlayer from '../components/SpotifyPlayer';
 
 export default function Room({ user }) {
@@ -27,11 +27,13 @@ export default function Room({ user }) {
     if (!code || code === 'undefined') return;
     
     try {
-      const state = await roomService.getRoomState(code);
-      const participantsData = await roomService.getParticipants(code);
+      const { snapshot } = await roomService.getRoomSnapshot(code);
       
-      setRoomState(state);
-      setParticipants(participantsData.participants || []);
+      setRoomState(snapshot.state);
+      setParticipants(snapshot.participants || []);
+      if (snapshot.state?.playback) {
+        setIsPlaying(snapshot.state.playback.status === 'playing');
+      }
       setLoading(false);
       setError('');
     } catch (err) {
@@ -41,6 +43,44 @@ export default function Room({ user }) {
     }
   };
 
+  // Applique un événement temps réel sans refaire de requête
+  const applyRoomEvent = ({ type, data }) => {
+    switch (type) {
+      case 'snapshot':
+        setRoomState(data.state);
+        setParticipants(data.participants || []);
+        setLoading(false);
+        setError('');
+        break;
+      case 'participant_joined':
+        setParticipants((prev) =>
+          prev.some((p) => p.user_id === data.user_id) ? prev : [...prev, data]
+        );
+        break;
+      case 'vote':
+        setRoomState((prev) =>
+          prev && prev.current_track?.uri === data.track_uri
+            ? { ...prev, likes: data.likes, dislikes: data.dislikes }
+            : prev
+        );
+        break;
+      case 'track_changed':
+        setRoomState(data);
+        break;
+      case 'playback':
+        setIsPlaying(data.status === 'playing');
+        break;
+      case 'room_closed':
+        // Room fermée par le serveur (inactivité) : on la quitte
+        setHasJoined(false);
+        alert('🧹 Cette room a été fermée pour inactivité.');
+        navigate('/');
+        break;
+      default:
+        break;
+    }
+  };
+
   const handleJoinRoom = async () => {
     if (!user || !code || code === 'undefined') return;
     
@@ -91,7 +131,8 @@ export default function Room({ user }) {
     try {
       console.log('🎵 Lancement de la musique sur device:', deviceId);
       const result = await roomService.playTrack(code, deviceId);
-      if (result.status === 'playing') {
+      // La commande part en file : l'état réel arrive par l'événement "playback"
+      if (result.status === 'queued') {
         setIsPlaying(true);
         console.log('✅ Musique lancée !');
       } else {
@@ -125,9 +166,38 @@ export default function Room({ user }) {
 
   useEffect(() => {
     if (user && hasJoined && code && code !== 'undefined') {
-      fetchRoomData();
-      const interval = setInterval(fetchRoomData, 3000);
-      return () => clearInterval(interval);
+      let stopped = false;
+      let polling = false;
+
+      // Ni WebSocket ni SSE : long-poll sur /snapshot (304 tant que rien ne change)
+      const longPoll = async () => {
+        if (polling) return;
+        polling = true;
+        let etag = null;
+        while (!stopped) {
+          try {
+            const result = await roomService.getRoomSnapshot(code, etag, 25);
+            if (result) {
+              etag = result.etag;
+              if (result.snapshot.state?.room?.is_active === false) {
+                stopped = true;
+                applyRoomEvent({ type: 'room_closed', data: { reason: 'inactive' } });
+                break;
+              }
+              applyRoomEvent({ type: 'snapshot', data: result.snapshot });
+            }
+          } catch (err) {
+            console.error('Erreur long-poll:', err);
+            await new Promise((resolve) => setTimeout(resolve, 3000));
+          }
+        }
+      };
+
+      const unsubscribe = subscribeToRoom(code, applyRoomEvent, longPoll);
+      return () => {
+        stopped = true;
+        unsubscribe();
+      };
     }
   }, [code, user, hasJoined]);
 
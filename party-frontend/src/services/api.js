@@ -31,8 +31,11 @@ export const roomService = {
     return response.data;
   },
   
-  listRooms: async () => {
-    const response = await api.get('/rooms/');
+  // Renvoie { rooms, next_cursor } : passer next_cursor en `after` pour la page suivante
+  listRooms: async ({ active = true, limit = 50, after = null } = {}) => {
+    const params = { active, limit };
+    if (after) params.after = after;
+    const response = await api.get('/rooms/', { params });
     return response.data;
   },
   
@@ -58,6 +61,18 @@ export const roomService = {
     return response.data;
   },
   
+  // État + participants en une requête. Avec `etag`, renvoie null si rien
+  // n'a changé (304) ; `wait` (s) retient la réponse jusqu'au prochain changement.
+  getRoomSnapshot: async (code, etag = null, wait = 0) => {
+    const response = await api.get(`/rooms/${code}/snapshot`, {
+      params: wait ? { wait } : {},
+      headers: etag ? { 'If-None-Match': etag } : {},
+      validateStatus: (status) => (status >= 200 && status < 300) || status === 304,
+    });
+    if (response.status === 304) return null;
+    return { etag: response.headers.etag, snapshot: response.data };
+  },
+  
   getRandomTrack: async (code) => {
     const response = await api.get(`/rooms/${code}/random-track`);
     return response.data;
@@ -95,4 +110,53 @@ export const roomService = {
   }
 };
 
+// ===== TEMPS RÉEL =====
+const ROOM_EVENT_TYPES = ['snapshot', 'vote', 'participant_joined', 'track_changed', 'playback', 'room_closed'];
+
+// S'abonne aux événements d'une room : WebSocket d'abord, SSE sinon.
+// `onFallback` est appelé si aucun des deux n'est disponible (→ polling).
+// Renvoie une fonction de désabonnement.
+// Sur `room_closed`, l'abonnement se ferme de lui-même (pas de reconnexion).
+export const subscribeToRoom = (code, onEvent, onFallback) => {
+  let closed = false;
+  let ws = null;
+  let source = null;
+
+  const unsubscribe = () => {
+    closed = true;
+    if (ws) ws.close();
+    if (source) source.close();
+  };
+
+  const handleMessage = (event) => {
+    if (event.type === 'room_closed') unsubscribe();
+    onEvent(event);
+  };
+
+  const startEventSource = () => {
+    if (closed) return;
+    if (typeof EventSource === 'undefined') {
+      onFallback();
+      return;
+    }
+    source = new EventSource(`${API_BASE_URL}/rooms/${code}/events`);
+    const handleEvent = (e) => handleMessage(JSON.parse(e.data));
+    ROOM_EVENT_TYPES.forEach((type) => source.addEventListener(type, handleEvent));
+    source.onerror = () => {
+      // CONNECTING = reconnexion automatique en cours, CLOSED = abandon
+      if (source.readyState === EventSource.CLOSED && !closed) onFallback();
+    };
+  };
+
+  if (typeof WebSocket === 'undefined') {
+    startEventSource();
+  } else {
+    ws = new WebSocket(`${API_BASE_URL.replace(/^http/, 'ws')}/rooms/${code}/ws`);
+    ws.onmessage = (e) => handleMessage(JSON.parse(e.data));
+    ws.onclose = () => startEventSource();
+  }
+
+  return unsubscribe;
+};
+
 export default api;
\ No newline at end of file